@@ -1,53 +1,2986 @@
+import time
+STARTUP_T0 = time.perf_counter()
 import os
+import re
 import sys
 import json
-import io
-import traceback
-import contextlib
-import webbrowser
-import subprocess
+import codecs
+import bisect
+import heapq
+from array import array
+from cestudio import (
+    USER_DIR, CESTUDIO_FOLDER, CURRENT_USER_FILE, RUN_FOLDER, STARTUP_LOG_FILE, SESSION_FILE_NAME,
+    BUFFER_CACHE_NAME, LANGUAGE_EXTENSIONS, EXTENSION_LANGUAGES, WEB_LANGUAGES, CLASS_NAME_PATTERNS,
+    load_settings, save_settings, iter_directory, collect_source_files, program_name, python_executable,
+    can_run, run_limits, run_file, run_source, run_python_file, format_run_stats, kill_process_tree,
+    ToolchainError, InterpreterPool, SearchIndex, can_check, check_file, check_python
+)
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QLineEdit,
-    QMessageBox, QHBoxLayout, QDialog, QTextEdit, QComboBox, QFileDialog,
-    QTreeWidget, QTreeWidgetItem, QInputDialog, QSplitter
+    QMessageBox, QHBoxLayout, QDialog, QComboBox, QFileDialog,
+    QTreeWidget, QTreeWidgetItem, QInputDialog, QSplitter, QTextEdit, QPlainTextEdit, QTabWidget,
+    QTableWidget, QTableWidgetItem, QAbstractItemView, QAbstractScrollArea, QStackedWidget,
+    QCheckBox, QListWidget, QShortcut, QTabBar, QPlainTextDocumentLayout, QScrollArea
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QFileSystemWatcher, QTimer, QEvent, QProcess, pyqtSignal
+from PyQt5.QtGui import QTextCursor, QTextDocument, QColor, QFont, QPainter, QKeySequence, QSyntaxHighlighter, QTextCharFormat
+
+try:
+    import pty
+except ImportError:  # Windows
+    pty = None
+
+# ======================================================
+#  FIXED — USER DATA SAVES IN AppData/Roaming
+# ======================================================
+os.makedirs(USER_DIR, exist_ok=True)
+
+# ======================================================
+# BACKGROUND FOLDER SCANNING
+# ======================================================
+SCAN_BATCH_SIZE = 256
+SCAN_MAX_PENDING = 8  # batches waiting for the GUI; caps scanner memory
+SCAN_SORT_LIMIT = 20000
+WATCH_DEBOUNCE_MS = 150
+SESSION_VALIDATE_MS = 500
+
+
+class ScanSignals(QObject):
+    batch = pyqtSignal(int, str, object)
+    finished = pyqtSignal(int, str, int)
+
+
+class FolderScanner(QRunnable):
+    def __init__(self, generation, path, excludes):
+        import threading
+        super().__init__()
+        self.generation = generation
+        self.path = path
+        self.excludes = list(excludes)
+        self.signals = ScanSignals()
+        self.pending = threading.Semaphore(SCAN_MAX_PENDING)
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def batch_done(self):
+        self.pending.release()
+
+    def emit_batch(self, batch):
+        while not self.pending.acquire(timeout=0.1):
+            if self.cancelled:
+                return False
+        self.signals.batch.emit(self.generation, self.path, batch)
+        return True
+
+    def run(self):
+        count = 0
+        batch = []
+        for entry in iter_directory(self.path, self.excludes):
+            if self.cancelled:
+                return
+            batch.append(entry)
+            if len(batch) >= SCAN_BATCH_SIZE:
+                if not self.emit_batch(batch):
+                    return
+                count += len(batch)
+                batch = []
+        if batch:
+            if not self.emit_batch(batch):
+                return
+            count += len(batch)
+        if not self.cancelled:
+            self.signals.finished.emit(self.generation, self.path, count)
+
+# ======================================================
+# TERMINAL SESSION
+# ======================================================
+OUTPUT_FLUSH_MS = 30
+TERMINAL_MAX_BLOCKS = 5000
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07]*\x07|\x1b[()][0-9A-B]")
+
+
+class OutputBatcher(QObject):
+    # Collects streamed text and appends it in one go per flush interval,
+    # so a flood of output costs one repaint instead of one per line
+    def __init__(self, widget):
+        super().__init__(widget)
+        self.widget = widget
+        self.chunks = []
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(OUTPUT_FLUSH_MS)
+        self.timer.timeout.connect(self.flush)
+
+    def write(self, text):
+        self.chunks.append(text)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        if not self.chunks:
+            return
+        text = "".join(self.chunks)
+        self.chunks = []
+        cursor = QTextCursor(self.widget.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        scrollbar = self.widget.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
+
+class TerminalSession(QObject):
+    output = pyqtSignal(str)
+    exited = pyqtSignal(int)
+
+    def __init__(self, cwd, parent=None):
+        super().__init__(parent)
+        self.cwd = cwd
+        self.pid = None
+        self.fd = None
+        self.proc = None
+        # A pty shell echoes input itself; the pipe fallback does not
+        self.echoes = pty is not None
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def start(self):
+        import subprocess
+        import threading
+        env = dict(os.environ, TERM="dumb")
+        if pty is not None:
+            shell = os.environ.get("SHELL", "/bin/sh")
+            pid, fd = pty.fork()
+            if pid == 0:
+                try:
+                    os.chdir(self.cwd)
+                    os.execvpe(shell, [shell, "-i"], env)
+                finally:
+                    os._exit(127)
+            self.pid, self.fd = pid, fd
+            reader = self.read_pty
+        else:
+            shell = os.environ.get("COMSPEC", "cmd.exe")
+            self.proc = subprocess.Popen(
+                [shell], cwd=self.cwd, env=env,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
+            )
+            reader = self.read_pipe
+        threading.Thread(target=reader, daemon=True).start()
+
+    def emit_output(self, data):
+        text = self.decoder.decode(data)
+        text = ANSI_ESCAPE.sub("", text).replace("\r\n", "\n").replace("\r", "")
+        if text:
+            self.output.emit(text)
+
+    def read_pty(self):
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError:
+                break
+            if not data:
+                break
+            self.emit_output(data)
+        try:
+            _, status = os.waitpid(self.pid, 0)
+            code = os.waitstatus_to_exitcode(status)
+        except ChildProcessError:
+            code = 0
+        self.exited.emit(code)
+
+    def read_pipe(self):
+        while True:
+            data = self.proc.stdout.read1(65536)
+            if not data:
+                break
+            self.emit_output(data)
+        self.exited.emit(self.proc.wait())
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        try:
+            if self.fd is not None:
+                os.write(self.fd, data)
+            else:
+                self.proc.stdin.write(data)
+                self.proc.stdin.flush()
+        except OSError:
+            pass
+
+    def interrupt(self):
+        import signal
+        if self.fd is not None:
+            # The pty line discipline turns ^C into SIGINT for the foreground job
+            self.write("\x03")
+        elif self.proc is not None:
+            self.proc.send_signal(signal.CTRL_BREAK_EVENT)
+
+    def close(self):
+        import signal
+        try:
+            if self.pid is not None:
+                os.kill(self.pid, signal.SIGHUP)
+                os.close(self.fd)
+            elif self.proc is not None:
+                self.proc.kill()
+        except OSError:
+            pass
+        self.fd = None
+
+
+# ======================================================
+# RUNNING CODE
+# ======================================================
+class RunSignals(QObject):
+    output = pyqtSignal(str, bool)
+    finished = pyqtSignal(dict)
+
+
+class CodeRunner(QRunnable):
+    # With a history the run is recorded there once it finishes; profiled
+    # runs skip the warm pool and bring their samples back in stats
+    def __init__(self, lang, snapshot, cwd, settings, pool=None, history=None, profile=False, digest=None):
+        super().__init__()
+        self.lang = lang
+        self.snapshot = snapshot
+        self.cwd = cwd
+        self.pool = pool
+        self.settings = settings
+        self.history = history
+        self.profile = profile
+        self.digest = digest
+        self.signals = RunSignals()
+        self.proc = None
+        self.stopped = False
+        self.output = []
+        self.output_size = 0
+
+    def stop(self):
+        self.stopped = True
+        if self.proc is not None:
+            kill_process_tree(self.proc)
+
+    def started(self, proc):
+        self.proc = proc
+        if self.stopped:
+            kill_process_tree(proc)
+
+    def write(self, text, is_err):
+        if self.output_size < HISTORY_OUTPUT_LIMIT:
+            self.output.append(text[:HISTORY_OUTPUT_LIMIT - self.output_size])
+        self.output_size += len(text)
+        self.signals.output.emit(text, is_err)
+
+    def run(self):
+        import shutil
+        import tempfile
+        started = time.time()
+        os.makedirs(RUN_FOLDER, exist_ok=True)
+        work_dir = tempfile.mkdtemp(dir=RUN_FOLDER)
+        try:
+            name = program_name(self.lang, self.snapshot.text()) if self.lang in CLASS_NAME_PATTERNS else "main"
+            source = os.path.join(work_dir, name + LANGUAGE_EXTENSIONS[self.lang])
+            self.snapshot.write_to(source)
+            if self.profile:
+                profile_file = os.path.join(work_dir, "profile.json")
+                stats = run_python_file(
+                    source, self.cwd or work_dir, run_limits(self.settings), self.settings["run_timeout"],
+                    self.write, self.started, profile_file
+                )
+                try:
+                    with open(profile_file, "r", encoding="utf-8") as f:
+                        stats["profile"] = json.load(f)
+                except (OSError, ValueError):
+                    pass
+            else:
+                stats = run_source(
+                    self.lang, source, work_dir, self.cwd or work_dir, self.settings, self.pool,
+                    self.write, self.started
+                )
+            stats["stopped"] = self.stopped
+        except ToolchainError as e:
+            stats = {"error": str(e)}
+        except Exception as e:
+            stats = {"error": f"Failed to run: {e}"}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if self.history is not None:
+            self.record(started, stats)
+        self.signals.finished.emit(stats)
+
+    def record(self, started, stats):
+        import sqlite3
+        entry = {
+            "started": started,
+            "lang": self.lang,
+            "mode": "profile" if self.profile else "run",
+            "digest": self.digest or self.snapshot.digest(),
+            "wall_time": stats.get("wall_time"),
+            "cpu_time": stats.get("cpu_time"),
+            "peak_rss": stats.get("peak_rss"),
+            "shared_rss": stats.get("shared_rss"),
+            "exit_code": stats.get("exit_code"),
+            "status": run_status(stats),
+            "output": "".join(self.output) + (stats.get("error") or ""),
+            "truncated": int(self.output_size > HISTORY_OUTPUT_LIMIT),
+            "profile": stats.get("profile"),
+        }
+        try:
+            entry["id"] = self.history.record(entry)
+        except (OSError, sqlite3.Error):
+            return
+        stats["history"] = entry
+
+
+# ======================================================
+# RUN MATRIX
+# ======================================================
+class MatrixSignals(QObject):
+    started = pyqtSignal(int)
+    result = pyqtSignal(dict)
+    finished = pyqtSignal(int, float)
+
+
+class RunMatrix(QRunnable):
+    # Runs many files at once; each worker thread just waits on its own
+    # child process, so the real parallelism is one process per core
+    def __init__(self, paths, settings, pool=None):
+        import threading
+        super().__init__()
+        self.paths = paths
+        self.settings = settings
+        self.pool = pool
+        self.signals = MatrixSignals()
+        self.cancelled = False
+        self.procs = set()
+        self.lock = threading.Lock()
+
+    def cancel(self):
+        self.cancelled = True
+        with self.lock:
+            for proc in self.procs:
+                kill_process_tree(proc)
+
+    def run_one(self, path, lang):
+        if self.cancelled:
+            return
+        started = []
+
+        def start(proc):
+            started.append(proc)
+            with self.lock:
+                self.procs.add(proc)
+            if self.cancelled:
+                kill_process_tree(proc)
+
+        try:
+            result = run_file(path, lang, self.settings, self.pool, start)
+        finally:
+            with self.lock:
+                self.procs.difference_update(started)
+        self.signals.result.emit(result)
+
+    def run(self):
+        start = time.perf_counter()
+        files = collect_source_files(self.paths, self.settings["explorer_excludes"], can_run)
+        self.signals.started.emit(len(files))
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+            for path, lang in files:
+                executor.submit(self.run_one, path, lang)
+        self.signals.finished.emit(len(files), time.perf_counter() - start)
+
+
+class RunMatrixDialog(QDialog):
+    def __init__(self, parent, matrix, root):
+        super().__init__(parent)
+        self.setWindowTitle("Run Results")
+        self.resize(900, 600)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.matrix = matrix
+        self.root = root
+        self.total = 0
+        self.done_count = 0
+        self.failed = 0
+
+        layout = QVBoxLayout()
+        self.summary = QLabel("Collecting files...")
+        layout.addWidget(self.summary)
+
+        splitter = QSplitter(Qt.Vertical)
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Status", "File", "Exit", "Duration (s)", "Output"])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(1, 260)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(0, Qt.AscendingOrder)  # FAIL sorts before PASS
+        self.table.itemSelectionChanged.connect(self.show_output)
+        splitter.addWidget(self.table)
+
+        self.output = QPlainTextEdit()
+        self.output.setReadOnly(True)
+        self.output.setStyleSheet("background-color: #111; font-family: Consolas; font-size: 12px;")
+        splitter.addWidget(self.output)
+        layout.addWidget(splitter)
+
+        close = QPushButton("Close")
+        close.clicked.connect(self.accept)
+        layout.addWidget(close)
+        self.setLayout(layout)
+
+        matrix.signals.started.connect(self.set_total)
+        matrix.signals.result.connect(self.add_result)
+        matrix.signals.finished.connect(self.show_finished)
+        self.finished.connect(lambda _: matrix.cancel())
+
+    def set_total(self, total):
+        self.total = total
+        self.update_summary()
+
+    def update_summary(self, elapsed=None):
+        text = f"{self.done_count}/{self.total} files"
+        if self.failed:
+            text += f", {self.failed} failed"
+        if elapsed is not None:
+            text += f" in {elapsed:.2f}s on {os.cpu_count() or 1} workers"
+        self.summary.setText(text)
+
+    def add_result(self, result):
+        self.done_count += 1
+        if not result["passed"]:
+            self.failed += 1
+
+        status = QTableWidgetItem("PASS" if result["passed"] else "FAIL")
+        status.setForeground(QColor("#4caf50" if result["passed"] else "#f44336"))
+        status.setData(Qt.UserRole, result["output"])
+        exit_item = QTableWidgetItem()
+        if result["exit_code"] is None:
+            exit_item.setText("-")
+        else:
+            exit_item.setData(Qt.DisplayRole, result["exit_code"])
+        duration = QTableWidgetItem()
+        duration.setData(Qt.DisplayRole, round(result["wall_time"], 3))
+        lines = result["output"].strip().splitlines()
+
+        # Sorting is paused while the row is filled in, then re-applied
+        self.table.setSortingEnabled(False)
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        self.table.setItem(row, 0, status)
+        self.table.setItem(row, 1, QTableWidgetItem(os.path.relpath(result["path"], self.root)))
+        self.table.setItem(row, 2, exit_item)
+        self.table.setItem(row, 3, duration)
+        self.table.setItem(row, 4, QTableWidgetItem(lines[-1] if lines else ""))
+        self.table.setSortingEnabled(True)
+        self.update_summary()
+
+    def show_finished(self, total, elapsed):
+        if total == 0:
+            self.summary.setText("No runnable files in the selection.")
+        else:
+            self.update_summary(elapsed)
+
+    def show_output(self):
+        rows = self.table.selectionModel().selectedRows()
+        if rows:
+            self.output.setPlainText(self.table.item(rows[0].row(), 0).data(Qt.UserRole))
+
+
+# ======================================================
+# RUN HISTORY
+# ======================================================
+# Every Run from the editor is recorded in USER_DIR/<user>/history.sqlite
+# with the hash of the code, its stats and the start of its output. With
+# "Reuse cached results" on, a successful run whose code, language and mode
+# match is shown from the history instead of being run again.
+HISTORY_FILE_NAME = "history.sqlite"
+HISTORY_OUTPUT_LIMIT = 32 * 1024
+HISTORY_MAX_RUNS = 2000
+HISTORY_SHOWN = 200
+PROFILE_MAX_STACKS = 5000
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY, started REAL, lang TEXT, mode TEXT, digest TEXT,
+    wall_time REAL, cpu_time REAL, peak_rss INTEGER, exit_code INTEGER,
+    status TEXT, output TEXT, truncated INTEGER, profile TEXT, shared_rss INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_code ON runs (digest, lang, mode);
+"""
+HISTORY_SUMMARY = "id, started, lang, mode, digest, wall_time, cpu_time, peak_rss, exit_code, status"
+
+
+def run_status(stats):
+    if stats.get("error"):
+        return "error"
+    if stats.get("build_failed"):
+        return "build failed"
+    if stats["timed_out"]:
+        return "timed out"
+    if stats.get("stopped"):
+        return "stopped"
+    return f"exit {stats['exit_code']}"
+
+
+class RunHistory:
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        import sqlite3
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(HISTORY_SCHEMA)
+        if "shared_rss" not in {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}:
+            # Histories from before warm runs noted their shared memory
+            conn.execute("ALTER TABLE runs ADD COLUMN shared_rss INTEGER")
+        return conn
+
+    def record(self, entry):
+        profile = entry.get("profile")
+        if profile is not None:
+            # Keep the heaviest stacks; the rest only add noise to the graph
+            stacks = heapq.nlargest(PROFILE_MAX_STACKS, profile["stacks"], key=lambda s: s[1])
+            profile = json.dumps(dict(profile, stacks=stacks))
+        conn = self.connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO runs (started, lang, mode, digest, wall_time, cpu_time, peak_rss, exit_code,"
+                    " status, output, truncated, profile, shared_rss) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (entry["started"], entry["lang"], entry["mode"], entry["digest"], entry["wall_time"],
+                     entry["cpu_time"], entry["peak_rss"], entry["exit_code"], entry["status"],
+                     entry["output"], entry["truncated"], profile, entry["shared_rss"])
+                )
+                run_id = cursor.lastrowid
+                if run_id % 100 == 0:
+                    conn.execute("DELETE FROM runs WHERE id <= ?", (run_id - HISTORY_MAX_RUNS,))
+        finally:
+            conn.close()
+        return run_id
+
+    def recent(self, limit=HISTORY_SHOWN):
+        conn = self.connect()
+        try:
+            rows = conn.execute(f"SELECT {HISTORY_SUMMARY} FROM runs ORDER BY id DESC LIMIT ?", (limit,))
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def get(self, run_id):
+        conn = self.connect()
+        try:
+            row = conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        finally:
+            conn.close()
+        return self.load_entry(row)
+
+    def cached(self, lang, digest, mode):
+        conn = self.connect()
+        try:
+            row = conn.execute(
+                "SELECT * FROM runs WHERE digest = ? AND lang = ? AND mode = ? AND status = 'exit 0'"
+                " AND truncated = 0 ORDER BY id DESC LIMIT 1", (digest, lang, mode)
+            ).fetchone()
+        finally:
+            conn.close()
+        return self.load_entry(row)
+
+    def load_entry(self, row):
+        if row is None:
+            return None
+        entry = dict(row)
+        if entry["profile"]:
+            entry["profile"] = json.loads(entry["profile"])
+        return entry
+
+
+def entry_stats(entry):
+    # The stats dict format_run_stats expects, rebuilt from a history entry
+    return {
+        "wall_time": entry["wall_time"] or 0.0,
+        "cpu_time": entry["cpu_time"],
+        "peak_rss": entry["peak_rss"],
+        "shared_rss": entry["shared_rss"],
+        "exit_code": entry["exit_code"],
+        "timed_out": entry["status"] == "timed out",
+        "stopped": entry["status"] == "stopped",
+        "build_failed": entry["status"] == "build failed",
+    }
+
+
+def profile_functions(profile):
+    # Per function: CPU time spent in the function itself, and time where it
+    # was anywhere on the stack (counted once even when recursive)
+    total = 0.0
+    functions = {}
+    for stack, spent in profile["stacks"]:
+        total += spent
+        for frame in {tuple(frame) for frame in stack}:
+            functions.setdefault(frame, [0.0, 0.0])[1] += spent
+        if stack:
+            functions[tuple(stack[-1])][0] += spent
+    return total, functions
+
+
+class FlameNode:
+    def __init__(self, frame, parent=None):
+        self.frame = frame
+        self.parent = parent
+        self.spent = 0.0
+        self.children = {}
+
+
+def profile_tree(profile):
+    root = FlameNode(("all", "", 0))
+    for stack, spent in profile["stacks"]:
+        # Samplers without setitimer credit CPU time, which is 0 while the
+        # program sleeps or blocks; those stacks have no width to draw
+        if spent <= 0:
+            continue
+        node = root
+        node.spent += spent
+        for frame in stack:
+            frame = tuple(frame)
+            child = node.children.get(frame)
+            if child is None:
+                child = node.children[frame] = FlameNode(frame, node)
+            child.spent += spent
+            node = child
+    return root
+
+
+def flame_layout(node, x, width, depth, max_depth):
+    # (node, x, width, depth) for node and the callees below it that are at
+    # least a pixel wide, down to max_depth
+    boxes = []
+    pending = [(node, x, width, depth)]
+    while pending:
+        node, x, width, depth = pending.pop()
+        if width < 1 or depth > max_depth:
+            continue
+        boxes.append((node, x, width, depth))
+        if node.spent <= 0:
+            continue
+        for child in sorted(node.children.values(), key=lambda c: -c.spent):
+            child_width = width * child.spent / node.spent
+            pending.append((child, x, child_width, depth + 1))
+            x += child_width
+    return boxes
+
+
+class FlameGraph(QWidget):
+    # Icicle layout: callers on top, each callee below its caller with a
+    # width proportional to its CPU time. Click a frame to zoom into it,
+    # right-click to zoom back out.
+    ROW_HEIGHT = 20
+
+    def __init__(self, root, depth):
+        super().__init__()
+        self.root = root
+        self.path = [root]
+        self.boxes = []
+        self.setMouseTracking(True)
+        self.setMinimumHeight((depth + 1) * self.ROW_HEIGHT)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#111"))
+        self.boxes = []
+        # Zoomed-in frames keep their ancestors as full-width rows on top
+        for depth, node in enumerate(self.path[:-1]):
+            self.draw_box(painter, node, 0, self.width(), depth)
+        max_depth = self.height() // self.ROW_HEIGHT
+        for node, x, width, depth in flame_layout(self.path[-1], 0.0, float(self.width()), len(self.path) - 1, max_depth):
+            self.draw_box(painter, node, x, width, depth)
+
+    def draw_box(self, painter, node, x, width, depth):
+        import hashlib
+        name = node.frame[0]
+        top = depth * self.ROW_HEIGHT
+        hue = int(hashlib.md5(name.encode("utf-8")).hexdigest()[:4], 16) % 50
+        box = (int(x), top, max(1, int(x + width) - int(x) - 1), self.ROW_HEIGHT - 1)
+        painter.fillRect(*box, QColor.fromHsv(hue, 200, 230))
+        if width > 30:
+            painter.setPen(QColor("#000"))
+            label = painter.fontMetrics().elidedText(name, Qt.ElideRight, int(width) - 6)
+            painter.drawText(int(x) + 3, top, int(width) - 6, self.ROW_HEIGHT - 1, Qt.AlignVCenter, label)
+        self.boxes.append((box, node))
+
+    def node_at(self, pos):
+        for (x, y, w, h), node in self.boxes:
+            if x <= pos.x() <= x + w and y <= pos.y() <= y + h:
+                return node
+        return None
+
+    def mouseMoveEvent(self, event):
+        node = self.node_at(event.pos())
+        if node is None:
+            self.setToolTip("")
+            return
+        name, filename, line = node.frame
+        share = node.spent / self.root.spent * 100 if self.root.spent else 0
+        where = f"\n{filename}:{line}" if filename else ""
+        self.setToolTip(f"{name}{where}\n{node.spent * 1000:,.1f} ms ({share:.1f}%)")
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.RightButton:
+            if len(self.path) > 1:
+                self.path.pop()
+        else:
+            node = self.node_at(event.pos())
+            if node in self.path:
+                del self.path[self.path.index(node) + 1:]
+            elif node is not None:
+                chain = []
+                while node is not self.path[-1]:
+                    chain.append(node)
+                    node = node.parent
+                self.path.extend(reversed(chain))
+        self.update()
+
+
+class ProfileDialog(QDialog):
+    def __init__(self, parent, profile, title):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(1000, 650)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+
+        total, functions = profile_functions(profile)
+        depth = max((len(stack) for stack, _ in profile["stacks"]), default=0)
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(
+            f"{total * 1000:,.0f} ms of CPU time in the program, sampled every {profile['interval'] * 1000:g} ms"
+        ))
+
+        tabs = QTabWidget()
+        table = QTableWidget(0, 6)
+        table.setHorizontalHeaderLabels(["Function", "Location", "Self (ms)", "Self %", "Total (ms)", "Total %"])
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.horizontalHeader().setStretchLastSection(True)
+        table.setColumnWidth(0, 220)
+        table.setColumnWidth(1, 300)
+        table.setRowCount(len(functions))
+        share = 100 / total if total else 0
+        for row, ((name, filename, line), (own, inclusive)) in enumerate(functions.items()):
+            location = f"{os.path.basename(filename)}:{line}" if filename else ""
+            values = [
+                round(own * 1000, 1), round(own * share, 1),
+                round(inclusive * 1000, 1), round(inclusive * share, 1),
+            ]
+            table.setItem(row, 0, QTableWidgetItem(name))
+            location_item = QTableWidgetItem(location)
+            location_item.setToolTip(filename)
+            table.setItem(row, 1, location_item)
+            for column, value in enumerate(values, 2):
+                item = QTableWidgetItem()
+                item.setData(Qt.DisplayRole, value)
+                table.setItem(row, column, item)
+        table.setSortingEnabled(True)
+        table.sortByColumn(2, Qt.DescendingOrder)
+        tabs.addTab(table, "Hot Functions")
+
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(FlameGraph(profile_tree(profile), depth))
+        tabs.addTab(scroll, "Flame Graph")
+        layout.addWidget(tabs)
+
+        close = QPushButton("Close")
+        close.clicked.connect(self.accept)
+        layout.addWidget(close)
+        self.setLayout(layout)
+
+# ======================================================
+# CODE EDITOR
+# ======================================================
+# The editor mirrors every document change into a piece table, so Run and
+# Save can take an immutable snapshot (a tuple of string slices) without
+# copying the whole document on the UI thread.
+PIECE_COALESCE_CHARS = 4096
+PIECE_COMPACT_COUNT = 2048
+SNAPSHOT_CHUNK_CHARS = 64 * 1024
+# Rough cost of a loaded document (QTextDocument's UTF-16 text and per-block
+# layout data plus the piece table), used for the editor tabs' memory budget
+DOCUMENT_BYTES_PER_CHAR = 3
+DOCUMENT_BYTES_PER_LINE = 140
+# Qt positions count UTF-16 units, Python counts code points; they only
+# disagree on characters outside the BMP.
+WIDE_CHARS = re.compile("[\U00010000-\U0010ffff]")
+
+
+def count_wide(text):
+    return 0 if text.isascii() else len(WIDE_CHARS.findall(text))
+
+
+class BufferSnapshot:
+    def __init__(self, pieces, length):
+        self.pieces = pieces
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def chunks(self):
+        for text, start, end in self.pieces:
+            for i in range(start, end, SNAPSHOT_CHUNK_CHARS):
+                yield text[i:min(i + SNAPSHOT_CHUNK_CHARS, end)]
+
+    def text(self):
+        return "".join(self.chunks())
+
+    def write_to(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for chunk in self.chunks():
+                f.write(chunk)
+
+    def digest(self):
+        import hashlib
+        digest = hashlib.sha256()
+        for chunk in self.chunks():
+            digest.update(chunk.encode("utf-8"))
+        return digest.hexdigest()
+
+
+class PieceTable:
+    def __init__(self, text=""):
+        self.reset(text)
+
+    def reset(self, text):
+        self.pieces = [(text, 0, len(text))] if text else []
+        self.length = len(text)
+        self.wide = count_wide(text)
+        # (piece index, document position after it) of the last insert, so
+        # typing extends one piece instead of adding a piece per keystroke
+        self.last_insert = None
+
+    def __len__(self):
+        return self.length
+
+    def snapshot(self):
+        return BufferSnapshot(tuple(self.pieces), self.length)
+
+    def locate(self, position):
+        offset = 0
+        for i, (_, start, end) in enumerate(self.pieces):
+            if position < offset + end - start:
+                return i, position - offset
+            offset += end - start
+        return len(self.pieces), 0
+
+    def insert(self, position, text):
+        if not text:
+            return
+        self.length += len(text)
+        self.wide += count_wide(text)
+        if self.last_insert is not None and self.last_insert[1] == position:
+            index = self.last_insert[0]
+            old, start, end = self.pieces[index]
+            if end - start + len(text) <= PIECE_COALESCE_CHARS:
+                merged = old[start:end] + text
+                self.pieces[index] = (merged, 0, len(merged))
+                self.last_insert = (index, position + len(text))
+                return
+        index, offset = self.locate(position)
+        if offset:
+            old, start, end = self.pieces[index]
+            self.pieces[index:index + 1] = [(old, start, start + offset), (old, start + offset, end)]
+            index += 1
+        self.pieces.insert(index, (text, 0, len(text)))
+        self.last_insert = (index, position + len(text))
+        if len(self.pieces) > PIECE_COMPACT_COUNT:
+            self.reset(self.snapshot().text())
+
+    def delete(self, position, count):
+        if count <= 0:
+            return
+        self.last_insert = None
+        first, offset = self.locate(position)
+        index = first
+        kept = []
+        remaining = count
+        while remaining > 0 and index < len(self.pieces):
+            text, start, end = self.pieces[index]
+            cut = min(end - start, offset + remaining)
+            if offset:
+                kept.append((text, start, start + offset))
+            if self.wide:
+                self.wide -= count_wide(text[start + offset:start + cut])
+            if start + cut < end:
+                kept.append((text, start + cut, end))
+            remaining -= cut - offset
+            offset = 0
+            index += 1
+        self.pieces[first:index] = kept
+        self.length -= count - remaining
+
+
+# Per-language tokens. "blocks" are delimiters that may span lines; the
+# index of the open block is kept as the QTextBlock state.
+SYNTAX_COLORS = {
+    "keyword": "#569cd6",
+    "extra": "#c586c0",
+    "string": "#ce9178",
+    "comment": "#6a9955",
+    "number": "#b5cea8",
+}
+
+C_KEYWORDS = (
+    "auto break case char const continue default do double else enum extern float for goto if inline int "
+    "long register return short signed sizeof static struct switch typedef union unsigned void volatile while"
+)
+JS_KEYWORDS = (
+    "async await break case catch class const continue debugger default delete do else export extends false "
+    "finally for function if import in instanceof let new null of return super switch this throw true try "
+    "typeof undefined var void while with yield"
+)
+PREPROCESSOR = r"^\s*#\s*\w+"
+
+LANGUAGE_SYNTAX = {
+    "Python": {
+        "keywords": "False None True and as assert async await break class continue def del elif else except "
+                    "finally for from global if import in is lambda nonlocal not or pass raise return try while "
+                    "with yield self",
+        "comment": ["#"], "quotes": "\"'", "extra": r"@[\w.]+",
+        "blocks": [('"""', '"""', "string"), ("'''", "'''", "string")],
+    },
+    "JavaScript": {
+        "keywords": JS_KEYWORDS, "comment": ["//"], "quotes": "\"'",
+        "blocks": [("/*", "*/", "comment"), ("`", "`", "string")],
+    },
+    "TypeScript": {
+        "keywords": JS_KEYWORDS + " abstract any as boolean declare enum implements interface keyof namespace "
+                                  "number private protected public readonly string type",
+        "comment": ["//"], "quotes": "\"'",
+        "blocks": [("/*", "*/", "comment"), ("`", "`", "string")],
+    },
+    "HTML": {
+        "keywords": "", "comment": [], "quotes": "\"'", "extra": r"</?[A-Za-z][\w-]*|/?>",
+        "blocks": [("<!--", "-->", "comment")],
+    },
+    "CSS": {
+        "keywords": "", "comment": [], "quotes": "\"'", "extra": r"@[\w-]+|[\w-]+(?=\s*:[^:])",
+        "blocks": [("/*", "*/", "comment")],
+    },
+    "C": {
+        "keywords": C_KEYWORDS + " NULL", "comment": ["//"], "quotes": "\"'", "extra": PREPROCESSOR,
+        "blocks": [("/*", "*/", "comment")],
+    },
+    "C++": {
+        "keywords": C_KEYWORDS + " bool catch class constexpr delete false namespace new nullptr operator "
+                                 "override private protected public template this throw true try typename "
+                                 "using virtual",
+        "comment": ["//"], "quotes": "\"'", "extra": PREPROCESSOR,
+        "blocks": [("/*", "*/", "comment")],
+    },
+    "C#": {
+        "keywords": "abstract as async await base bool break case catch char class const continue decimal "
+                    "default delegate do double else enum event false finally float for foreach if in int "
+                    "interface internal is lock long namespace new null object out override params private "
+                    "protected public readonly ref return sealed short static string struct switch this throw "
+                    "true try typeof using var virtual void while",
+        "comment": ["//"], "quotes": "\"'", "extra": PREPROCESSOR,
+        "blocks": [("/*", "*/", "comment")],
+    },
+    "Java": {
+        "keywords": "abstract boolean break byte case catch char class continue default do double else enum "
+                    "extends false final finally float for if implements import instanceof int interface long "
+                    "new null package private protected public return short static super switch this throw "
+                    "throws true try var void while",
+        "comment": ["//"], "quotes": "\"'", "extra": r"@\w+",
+        "blocks": [("/*", "*/", "comment")],
+    },
+    "Go": {
+        "keywords": "break case chan const continue default defer else fallthrough false for func go goto if "
+                    "import interface map nil package range return select struct switch true type var",
+        "comment": ["//"], "quotes": "\"'",
+        "blocks": [("/*", "*/", "comment"), ("`", "`", "string")],
+    },
+    "Rust": {
+        "keywords": "as async await break const continue crate dyn else enum extern false fn for if impl in let "
+                    "loop match mod move mut pub ref return self Self static struct super trait true type "
+                    "unsafe use where while",
+        "comment": ["//"], "quotes": "\"", "extra": r"\b\w+!",
+        "blocks": [("/*", "*/", "comment")],
+    },
+    "Kotlin": {
+        "keywords": "as break class continue data do else false for fun if import in interface is null object "
+                    "override package private public return super this throw true try typealias val var when "
+                    "while",
+        "comment": ["//"], "quotes": "\"'",
+        "blocks": [("/*", "*/", "comment"), ('"""', '"""', "string")],
+    },
+    "Scala": {
+        "keywords": "abstract case catch class def do else extends false final finally for if implicit import "
+                    "lazy match new null object override package private protected return sealed super this "
+                    "throw trait true try type val var while with yield",
+        "comment": ["//"], "quotes": "\"'",
+        "blocks": [("/*", "*/", "comment"), ('"""', '"""', "string")],
+    },
+    "Ruby": {
+        "keywords": "BEGIN END alias and begin break case class def do else elsif end ensure false for if in "
+                    "module next nil not or redo rescue retry return self super then true undef unless until "
+                    "when while yield",
+        "comment": ["#"], "quotes": "\"'",
+        "blocks": [("=begin", "=end", "comment")],
+    },
+    "PHP": {
+        "keywords": "abstract and array as break case catch class clone const continue declare default do echo "
+                    "else elseif empty extends false final finally fn for foreach function global if implements "
+                    "include instanceof interface isset list namespace new null or print private protected "
+                    "public require return static switch throw trait true try unset use var while",
+        "comment": ["//", "#"], "quotes": "\"'", "extra": r"\$\w+",
+        "blocks": [("/*", "*/", "comment")],
+    },
+    "Perl": {
+        "keywords": "else elsif for foreach if last local my next our package print redo require return sub "
+                    "undef unless until use while",
+        "comment": ["#"], "quotes": "\"'", "extra": r"[$@%]\w+",
+        "blocks": [],
+    },
+    "Lua": {
+        "keywords": "and break do else elseif end false for function goto if in local nil not or repeat return "
+                    "then true until while",
+        "comment": ["--"], "quotes": "\"'",
+        "blocks": [("--[[", "]]", "comment")],
+    },
+}
+
+HIGHLIGHT_BUDGET_BLOCKS = 300
+HIGHLIGHT_DEFERRED = -2
+
+compiled_syntaxes = {}
+
+
+def compiled_syntax(lang):
+    spec = LANGUAGE_SYNTAX.get(lang)
+    if spec is None:
+        return None
+    if lang not in compiled_syntaxes:
+        parts = [f"(?P<block{i}>{re.escape(opener)})" for i, (opener, _, _) in enumerate(spec["blocks"])]
+        if spec["comment"]:
+            parts.append(f"(?P<comment>(?:{'|'.join(map(re.escape, spec['comment']))}).*)")
+        for quote in spec["quotes"]:
+            parts.append(f"(?P<string{len(parts)}>{quote}(?:[^{quote}\\\\]|\\\\.)*{quote}?)")
+        if spec.get("extra"):
+            parts.append(f"(?P<extra>{spec['extra']})")
+        if spec["keywords"]:
+            parts.append(f"(?P<keyword>\\b(?:{'|'.join(spec['keywords'].split())})\\b)")
+        parts.append(r"(?P<number>\b(?:0[xX][0-9a-fA-F_]+|\d[\d_]*(?:\.\d+)?(?:[eE][+-]?\d+)?)\b)")
+        compiled_syntaxes[lang] = {"pattern": re.compile("|".join(parts)), "blocks": spec["blocks"]}
+    return compiled_syntaxes[lang]
+
+
+class CodeHighlighter(QSyntaxHighlighter):
+    # Qt only calls highlightBlock for edited lines, and for the lines after
+    # them while their block state keeps changing. Each event loop turn gets
+    # HIGHLIGHT_BUDGET_BLOCKS lines. Past that, lines that are new or changed
+    # (a whole file on load, every line on a language switch) are only marked
+    # deferred, and a cascade from an edit (opening a block comment changes
+    # every following line) is cut. Both resume on the next turn, so a file
+    # opens with its first screen highlighted and the rest fills in after.
+    def __init__(self, document):
+        super().__init__(None)
+        document.contentsChange.connect(self.note_change)
+        self.setDocument(document)
+        self.syntax = None
+        self.wide_text = None
+        self.edit_end = 0
+        self.highlighted = 0
+        self.deferring = False
+        self.pending = []
+        self.formats = {}
+        for kind, color in SYNTAX_COLORS.items():
+            text_format = QTextCharFormat()
+            text_format.setForeground(QColor(color))
+            if kind == "comment":
+                text_format.setFontItalic(True)
+            self.formats[kind] = text_format
+
+    def set_language(self, lang, rehighlight=True):
+        syntax = compiled_syntax(lang)
+        if syntax is not self.syntax:
+            self.syntax = syntax
+            if rehighlight:
+                self.edit_end = sys.maxsize
+                self.highlighted = 0
+                self.deferring = False
+                self.rehighlight()
+
+    def note_change(self, position, removed, added):
+        self.edit_end = position + added
+        self.deferring = False
+
+    def resume(self):
+        self.highlighted = 0
+        self.edit_end = 0
+        cursors, self.pending = self.pending, []
+        for cursor in cursors:
+            self.deferring = False
+            self.rehighlightBlock(cursor.block())
+
+    def highlightBlock(self, text):
+        if not self.highlighted:
+            QTimer.singleShot(0, self.resume)
+        self.highlighted += 1
+        old_state = self.currentBlockState()
+        if self.highlighted > HIGHLIGHT_BUDGET_BLOCKS and self.defer(old_state):
+            return
+        self.deferring = False
+        self.tokenize(text)
+        if self.highlighted > HIGHLIGHT_BUDGET_BLOCKS and self.currentBlockState() != old_state:
+            self.pending.append(QTextCursor(self.currentBlock()))
+            self.setCurrentBlockState(old_state)
+
+    def defer(self, old_state):
+        # Lines never highlighted (-1) or already waiting keep their state,
+        # which ends Qt's cascade; changed lines are marked as waiting. A run
+        # of them resumes from its first line. This runs for every line of a
+        # big load, so it stays short.
+        if old_state not in (-1, HIGHLIGHT_DEFERRED):
+            if self.currentBlock().position() >= self.edit_end:
+                return False
+            self.setCurrentBlockState(HIGHLIGHT_DEFERRED)
+        if not self.deferring:
+            self.pending.append(QTextCursor(self.currentBlock()))
+            self.deferring = True
+        return True
+
+    def tokenize(self, text):
+        self.setCurrentBlockState(0)
+        if self.syntax is None:
+            return
+        self.wide_text = text if WIDE_CHARS.search(text) else None
+        position = 0
+        state = self.previousBlockState()
+        if 0 < state <= len(self.syntax["blocks"]):
+            position = self.close_block(text, state - 1, 0, 0)
+        search = self.syntax["pattern"].search
+        while position >= 0:
+            match = search(text, position)
+            if match is None:
+                return
+            kind = match.lastgroup
+            if kind.startswith("block"):
+                position = self.close_block(text, int(kind[5:]), match.start(), match.end())
+            else:
+                self.apply(match.start(), match.end(), "string" if kind.startswith("string") else kind)
+                position = max(match.end(), match.start() + 1)
+
+    def close_block(self, text, index, start, search_from):
+        _, closer, kind = self.syntax["blocks"][index]
+        end = text.find(closer, search_from)
+        if end < 0:
+            self.apply(start, len(text), kind)
+            self.setCurrentBlockState(index + 1)
+            return -1
+        end += len(closer)
+        self.apply(start, end, kind)
+        return end
+
+    def apply(self, start, end, kind):
+        if self.wide_text is not None:
+            start = len(self.wide_text[:start].encode("utf-16-le")) // 2
+            end = len(self.wide_text[:end].encode("utf-16-le")) // 2
+        self.setFormat(start, end - start, self.formats[kind])
+
+
+class EditorDocument:
+    # The text behind one editor tab: a QTextDocument mirrored into a piece
+    # table, with its own highlighter and undo stack. CodeEditor swaps these.
+    def __init__(self, text="", lang=None):
+        self.document = QTextDocument()
+        self.document.setDocumentLayout(QPlainTextDocumentLayout(self.document))
+        self.buffer = PieceTable()
+        self.mirroring = True
+        self.highlighter = CodeHighlighter(self.document)
+        self.version = 0
+        self.document.contentsChange.connect(self.mirror_change)
+        self.load_text(text, lang)
+
+    def load_text(self, text, lang=None):
+        self.highlighter.set_language(lang, rehighlight=False)
+        self.set_text(text)
+        self.document.setModified(False)
+
+    def set_text(self, text):
+        self.mirroring = False
+        try:
+            self.document.setPlainText(text)
+        finally:
+            self.mirroring = True
+        self.buffer.reset(text)
+        if len(self.buffer) + self.buffer.wide != self.document.characterCount() - 1:
+            self.resync()
+
+    def memory(self):
+        return len(self.buffer) * DOCUMENT_BYTES_PER_CHAR + self.document.blockCount() * DOCUMENT_BYTES_PER_LINE
+
+    def snapshot(self):
+        return self.buffer.snapshot()
+
+    def resync(self):
+        self.buffer.reset(self.document.toPlainText())
+
+    def mirror_change(self, position, removed, added):
+        self.version += 1
+        if not self.mirroring:
+            return
+        buffer = self.buffer
+        new_length = self.document.characterCount() - 1
+        if buffer.wide:
+            self.resync()
+            return
+        # Qt counts the document's final block separator in some changes
+        # (e.g. the first edit after setPlainText); clamp to the buffer.
+        removed = min(removed, len(buffer) - position)
+        added = new_length - len(buffer) + removed
+        if removed < 0 or added < 0:
+            self.resync()
+            return
+        cursor = QTextCursor(self.document)
+        cursor.setPosition(position)
+        cursor.setPosition(position + added, QTextCursor.KeepAnchor)
+        text = cursor.selectedText().replace("\u2029", "\n")
+        buffer.delete(position, removed)
+        buffer.insert(position, text)
+        if buffer.wide or len(buffer) != new_length:
+            self.resync()
+
+
+class CodeEditor(QPlainTextEdit):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.set_model(EditorDocument())
+
+    def set_model(self, model):
+        # The widget does not take ownership; the tab keeps its model alive
+        self.model = model
+        model.document.setDefaultFont(self.font())
+        self.setDocument(model.document)
+
+    def load_text(self, text, lang=None):
+        self.model.load_text(text, lang)
+
+    def setPlainText(self, text):
+        self.model.set_text(text)
+
+    def set_language(self, lang):
+        self.model.highlighter.set_language(lang)
+
+    def snapshot(self):
+        return self.model.snapshot()
+
+    def goto_line(self, line, start=0, end=0):
+        block = self.document().findBlockByNumber(line - 1)
+        cursor = QTextCursor(block)
+        cursor.setPosition(block.position() + min(start, block.length() - 1))
+        cursor.setPosition(block.position() + min(end, block.length() - 1), QTextCursor.KeepAnchor)
+        self.setTextCursor(cursor)
+        self.centerCursor()
+        self.setFocus()
+
+
+# ======================================================
+# LARGE FILE VIEWER
+# ======================================================
+# Files above large_file_mb (or that are not valid UTF-8) are mmapped and
+# shown read-only. A background thread records the start offset of every
+# CHECKPOINT_ROWS-th row, so any row is at most that many short scans away
+# and only the visible rows are ever decoded.
+ROW_BYTES = 4096
+CHECKPOINT_ROWS = 256
+INDEX_PUBLISH_ROWS = 4096
+SEARCH_CHUNK = 4 * 1024 * 1024
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class LargeFileView(QAbstractScrollArea):
+    progress = pyqtSignal(int, bool)
+    found = pyqtSignal(int, int, int, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.file = None
+        self.mm = None
+        self.size = 0
+        self.generation = 0
+        self.checkpoints = array("Q", [0])
+        self.row_count = 0
+        self.indexing_done = True
+        self.match = None
+        self.match_end = 0
+        font = QFont("Consolas")
+        font.setStyleHint(QFont.Monospace)
+        font.setPixelSize(14)
+        self.setFont(font)
+        self.setStyleSheet("background-color: #1e1e1e; color: #ffffff;")
+        self.index_timer = QTimer(self)
+        self.index_timer.setInterval(100)
+        self.index_timer.timeout.connect(self.update_scrollbars)
+
+    def open(self, path):
+        import threading
+        self.close_file()
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        if self.size:
+            import mmap
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.checkpoints = array("Q", [0])
+        self.row_count = 0
+        self.indexing_done = self.mm is None
+        self.match = None
+        self.verticalScrollBar().setValue(0)
+        self.horizontalScrollBar().setValue(0)
+        if self.mm is not None:
+            threading.Thread(target=self.build_index, args=(self.generation, self.mm, self.checkpoints),
+                             daemon=True).start()
+        self.index_timer.start()
+        self.update_scrollbars()
+
+    def close_file(self):
+        self.generation += 1
+        self.index_timer.stop()
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.size = 0
+        self.row_count = 0
+        self.match = None
+        self.viewport().update()
+
+    def build_index(self, generation, mm, checkpoints):
+        find = mm.find
+        size = self.size
+        offset = 0
+        rows = 0
+        try:
+            while offset < size:
+                end = min(offset + ROW_BYTES, size)
+                newline = find(b"\n", offset, end)
+                offset = end if newline == -1 else newline + 1
+                rows += 1
+                if rows % CHECKPOINT_ROWS == 0:
+                    checkpoints.append(offset)
+                    if rows % INDEX_PUBLISH_ROWS == 0:
+                        if generation != self.generation:
+                            return
+                        self.row_count = rows
+        except ValueError:  # mmap closed under us by open()/close_file()
+            return
+        if generation == self.generation:
+            self.row_count = rows
+            self.indexing_done = True
+
+    def next_row(self, offset):
+        end = min(offset + ROW_BYTES, self.size)
+        newline = self.mm.find(b"\n", offset, end)
+        return end if newline == -1 else newline + 1
+
+    def row_start(self, row):
+        offset = self.checkpoints[row // CHECKPOINT_ROWS]
+        for _ in range(row % CHECKPOINT_ROWS):
+            offset = self.next_row(offset)
+        return offset
+
+    def row_of(self, offset):
+        index = bisect.bisect_right(self.checkpoints, offset) - 1
+        row = index * CHECKPOINT_ROWS
+        start = self.checkpoints[index]
+        while True:
+            end = self.next_row(start)
+            if end > offset or end >= self.size:
+                return row, start
+            row += 1
+            start = end
+
+    def decode(self, start, end):
+        data = self.mm[start:end]
+        if data.endswith(b"\n"):
+            data = data[:-1]
+            if data.endswith(b"\r"):
+                data = data[:-1]
+        return data.decode("utf-8", errors="replace").expandtabs(4)
+
+    def visible_rows(self):
+        return max(1, self.viewport().height() // self.fontMetrics().height())
+
+    def update_scrollbars(self):
+        rows = self.visible_rows()
+        vbar = self.verticalScrollBar()
+        vbar.setRange(0, max(0, self.row_count - rows))
+        vbar.setPageStep(rows)
+        hbar = self.horizontalScrollBar()
+        hbar.setRange(0, max(0, ROW_BYTES * self.fontMetrics().averageCharWidth() - self.viewport().width()))
+        hbar.setPageStep(self.viewport().width())
+        if self.indexing_done:
+            self.index_timer.stop()
+        self.progress.emit(self.row_count, self.indexing_done)
+        self.viewport().update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scrollbars()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(event.rect(), QColor("#1e1e1e"))
+        if self.mm is None:
+            return
+        painter.setFont(self.font())
+        metrics = self.fontMetrics()
+        height = metrics.height()
+        x = 4 - self.horizontalScrollBar().value()
+        first = self.verticalScrollBar().value()
+        if first >= self.row_count:
+            return
+        offset = self.row_start(first)
+        painter.setPen(QColor("#ffffff"))
+        for i in range(self.visible_rows() + 1):
+            row = first + i
+            if row >= self.row_count or offset >= self.size:
+                break
+            end = self.next_row(offset)
+            text = self.decode(offset, end)
+            y = i * height
+            if self.match and self.match[0] == row:
+                _, column, length = self.match
+                left = x + metrics.horizontalAdvance(text[:column])
+                painter.fillRect(left, y, metrics.horizontalAdvance(text[column:column + length]), height,
+                                 QColor("#806000"))
+            painter.drawText(x, y + metrics.ascent(), text)
+            offset = end
+
+    def find_next(self, text, match_case):
+        import threading
+        if self.mm is None or not text:
+            return
+        flags = 0 if match_case else re.IGNORECASE
+        pattern = re.compile(re.escape(text.encode("utf-8")), flags)
+        start = self.match_end if self.match else self.row_start(self.verticalScrollBar().value())
+        threading.Thread(target=self.search, args=(self.generation, pattern, start, len(text.encode("utf-8"))),
+                         daemon=True).start()
+
+    def search(self, generation, pattern, start, needle_bytes):
+        # Regex scans hold the GIL, so search in chunks to let the UI paint.
+        overlap = needle_bytes - 1
+        try:
+            for begin, stop in ((start, self.size), (0, min(start + overlap, self.size))):
+                pos = begin
+                while pos < stop:
+                    if generation != self.generation:
+                        return
+                    match = pattern.search(self.mm, pos, min(pos + SEARCH_CHUNK + overlap, stop))
+                    if match:
+                        while not self.indexing_done and self.checkpoints[-1] <= match.start():
+                            time.sleep(0.05)
+                        if generation != self.generation:
+                            return
+                        row, row_offset = self.row_of(match.start())
+                        column = len(self.decode(row_offset, match.start()))
+                        length = len(self.mm[match.start():match.end()].decode("utf-8", errors="replace"))
+                        self.found.emit(generation, row, column, length)
+                        self.match_end = match.end()
+                        return
+                    pos += SEARCH_CHUNK
+        except ValueError:  # file closed while searching
+            return
+        self.found.emit(generation, -1, 0, 0)
+
+    def show_match(self, generation, row, column, length):
+        if generation != self.generation:
+            return
+        if row < 0:
+            self.match = None
+        else:
+            self.match = (row, column, length)
+            self.update_scrollbars()
+            self.verticalScrollBar().setValue(max(0, row - self.visible_rows() // 3))
+            left = column * self.fontMetrics().averageCharWidth()
+            hbar = self.horizontalScrollBar()
+            if not hbar.value() <= left < hbar.value() + self.viewport().width() - 40:
+                hbar.setValue(max(0, left - self.viewport().width() // 2))
+        self.viewport().update()
+
+
+class LargeFileViewer(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.path = None
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.info = QLabel()
+        self.info.setStyleSheet("color: #aaaaaa; font-size: 12px;")
+        layout.addWidget(self.info)
+
+        self.view = LargeFileView()
+        self.view.progress.connect(self.show_progress)
+        self.view.found.connect(self.show_match)
+        layout.addWidget(self.view)
+
+        find_row = QHBoxLayout()
+        self.find_input = QLineEdit()
+        self.find_input.setPlaceholderText("Find in file")
+        self.find_input.returnPressed.connect(self.find_next)
+        self.find_input.textChanged.connect(self.reset_find)
+        find_row.addWidget(self.find_input)
+        self.match_case = QCheckBox("Match case")
+        self.match_case.toggled.connect(self.reset_find)
+        find_row.addWidget(self.match_case)
+        find_button = QPushButton("Find Next")
+        find_button.clicked.connect(self.find_next)
+        find_row.addWidget(find_button)
+        self.find_status = QLabel()
+        self.find_status.setStyleSheet("color: #aaaaaa; font-size: 12px;")
+        find_row.addWidget(self.find_status)
+        layout.addLayout(find_row)
+
+    def open(self, path):
+        self.path = path
+        self.find_status.clear()
+        self.view.open(path)
+
+    def close_file(self):
+        self.path = None
+        self.view.close_file()
+
+    def show_progress(self, rows, done):
+        if self.path is None:
+            return
+        state = f"{rows:,} rows" if done else f"indexing... {rows:,} rows"
+        self.info.setText(f"{os.path.basename(self.path)} — {format_size(self.view.size)}, read-only, {state}")
+
+    def reset_find(self):
+        self.view.match = None
+        self.find_status.clear()
+        self.view.viewport().update()
+
+    def find_next(self):
+        self.find_status.setText("Searching...")
+        self.view.find_next(self.find_input.text(), self.match_case.isChecked())
+
+    def show_match(self, generation, row, column, length):
+        self.view.show_match(generation, row, column, length)
+        if generation == self.view.generation:
+            self.find_status.setText("Not found" if row < 0 else f"Row {row + 1:,}")
+
+
+# ======================================================
+# SEARCH INDEX
+# ======================================================
+INDEX_UPDATE_MS = 1000
+SEARCH_DEBOUNCE_MS = 250
+
+
+class IndexSignals(QObject):
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(str)
+    path_index = pyqtSignal(object)
+    paths_changed = pyqtSignal(object, object)
+
+
+class IndexJob(QRunnable):
+    def __init__(self, index, folders=None):
+        super().__init__()
+        self.index = index
+        self.folders = folders
+        self.cancelled = False
+        self.signals = IndexSignals()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report(self, done, total):
+        self.signals.progress.emit(f"Indexing {done:,} / {total:,} files...")
+
+    def publish_paths(self, added, removed):
+        # The path list is ready as soon as the walk is done, long before
+        # the contents are indexed
+        if removed is None:
+            self.signals.path_index.emit(PathIndex(added))
+        elif added or removed:
+            self.signals.paths_changed.emit(added, removed)
+
+    def run(self):
+        import sqlite3
+        start = time.time()
+        try:
+            changed, removed = self.index.update(self.folders, lambda: self.cancelled, self.report, self.publish_paths)
+        except (OSError, sqlite3.Error) as e:
+            self.signals.finished.emit(f"Indexing failed: {e}")
+            return
+        if self.folders is None or changed or removed:
+            self.signals.finished.emit(
+                f"Index up to date: {changed:,} updated, {removed:,} removed in {time.time() - start:.1f}s"
+            )
+
+
+class SearchSignals(QObject):
+    hits = pyqtSignal(int, object)
+    finished = pyqtSignal(int, str)
+
+
+class SearchJob(QRunnable):
+    def __init__(self, generation, index, query, is_regex, match_case):
+        super().__init__()
+        self.generation = generation
+        self.index = index
+        self.query = query
+        self.is_regex = is_regex
+        self.match_case = match_case
+        self.cancelled = False
+        self.signals = SearchSignals()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def emit_hits(self, hits):
+        self.signals.hits.emit(self.generation, hits)
+
+    def run(self):
+        import sqlite3
+        start = time.time()
+        try:
+            if self.query.startswith("@"):
+                hits = self.index.find_symbols(self.query[1:])
+                self.emit_hits(hits)
+                total = len(hits)
+            else:
+                total = self.index.search(self.query, self.is_regex, self.match_case, self.emit_hits,
+                                          lambda: self.cancelled)
+            message = f"{total:,} results in {(time.time() - start) * 1000:.0f} ms"
+        except re.error as e:
+            message = f"Invalid regex: {e}"
+        except (OSError, sqlite3.Error) as e:
+            message = f"Search failed: {e}"
+        self.signals.finished.emit(self.generation, message)
+
+
+# ======================================================
+# QUICK OPEN
+# ======================================================
+# Ctrl+P matches the query as a subsequence of every file path. A character
+# bitmask per path rejects most non-matches before any regex runs, and a
+# query that extends an earlier one only re-checks that query's matches.
+# Each keystroke gets QUICK_OPEN_SLICE_MS of matching; broad queries keep
+# refining their top results in further slices between events.
+QUICK_OPEN_RESULTS = 50
+QUICK_OPEN_SLICE_MS = 6
+QUICK_OPEN_FILTER_CHUNK = 1024
+QUICK_OPEN_NAME_WINDOW = 1024 * 1024
+QUICK_OPEN_CACHE_SIZE = 64
+QUICK_OPEN_REBUILD_CHANGES = 2000
+PATH_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789._-/"
+PATH_CHAR_BITS = {c: 1 << i for i, c in enumerate(PATH_CHARS)}
+OTHER_CHAR_BIT = 1 << len(PATH_CHARS)
+PATH_BOUNDARIES = "/_-. "
+
+
+def char_mask(text):
+    mask = 0
+    for c in set(text):
+        mask |= PATH_CHAR_BITS.get(c, OTHER_CHAR_BIT)
+    return mask
+
+
+def score_path(key, name_start, pattern, length):
+    # Higher is better: a match inside the file name beats one spread over
+    # folders, then tight and boundary-aligned matches, then shorter paths
+    match = pattern.search(key, name_start)
+    score = 1000
+    if match is None:
+        match = pattern.search(key)
+        if match is None:
+            return None
+        score = 0
+    start, end = match.span()
+    score -= (end - start - length) * 8
+    if end - start == length:
+        score += 100
+    if start == name_start:
+        score += 100
+    elif start == 0 or key[start - 1] in PATH_BOUNDARIES:
+        score += 60
+    return score - len(key)
+
+
+class PathIndex:
+    def __init__(self, paths):
+        # Shorter paths first, so the ones scored within the budget are the
+        # likeliest picks
+        self.paths = sorted(paths, key=lambda p: (len(p), p))
+        self.keys = [p.lower().replace(os.sep, "/") for p in self.paths]
+        self.name_starts = [key.rfind("/") + 1 for key in self.keys]
+        segment_masks = {}
+        self.masks = []
+        for key in self.keys:
+            mask = PATH_CHAR_BITS["/"] if "/" in key else 0
+            for segment in key.split("/"):
+                segment_mask = segment_masks.get(segment)
+                if segment_mask is None:
+                    segment_mask = segment_masks[segment] = char_mask(segment)
+                mask |= segment_mask
+            self.masks.append(mask)
+        self.name_offsets = array("I")
+        offset = 0
+        for key, start in zip(self.keys, self.name_starts):
+            self.name_offsets.append(offset)
+            offset += len(key) - start + 1
+        self.names_blob = "\n".join(key[start:] for key, start in zip(self.keys, self.name_starts))
+        self.added = {}
+        self.removed = set()
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.paths) + len(self.added) - len(self.removed)
+
+    def all_paths(self):
+        return [p for p in self.paths if p not in self.removed] + list(self.added)
+
+    def apply(self, added, removed):
+        # Small changes are layered over the built index; a rebuild happens
+        # once they pile up
+        for path in removed:
+            if self.added.pop(path, None) is None:
+                self.removed.add(path)
+        for path in added:
+            if path in self.removed:
+                self.removed.discard(path)
+            else:
+                key = path.lower().replace(os.sep, "/")
+                self.added[path] = (key, key.rfind("/") + 1)
+        self.cache = {}
+        if len(self.added) + len(self.removed) > QUICK_OPEN_REBUILD_CHANGES:
+            return PathIndex(self.all_paths())
+        return self
+
+    def source_for(self, query):
+        for end in range(len(query) - 1, 0, -1):
+            search = self.cache.get(query[:end])
+            if search is not None and search.done:
+                return search.matches
+        return range(len(self.paths))
+
+    def search(self, text):
+        query = text.lower().replace(" ", "").replace("\\", "/")
+        search = self.cache.pop(query, None)
+        if search is None:
+            search = PathSearch(self, query, self.source_for(query))
+            if len(self.cache) >= QUICK_OPEN_CACHE_SIZE:
+                del self.cache[next(iter(self.cache))]
+        self.cache[query] = search
+        return search
+
+
+class PathSearch:
+    def __init__(self, index, query, source):
+        self.index = index
+        self.query = query
+        self.pattern = re.compile(".*?".join(map(re.escape, query)))
+        self.mask = char_mask(query)
+        self.source = source
+        self.position = 0
+        self.name_position = 0
+        self.named = set()
+        self.matches = array("I")
+        self.heap = []
+        self.done = not query
+        for path, (key, name_start) in index.added.items():
+            score = score_path(key, name_start, self.pattern, len(query))
+            if score is not None:
+                self.heap.append((score, path))
+        self.heap = heapq.nlargest(QUICK_OPEN_RESULTS, self.heap)
+        heapq.heapify(self.heap)
+
+    def push(self, score, i):
+        entry = (score, self.index.paths[i])
+        if len(self.heap) < QUICK_OPEN_RESULTS:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def step(self, deadline):
+        index = self.index
+        keys = index.keys
+        name_starts = index.name_starts
+        pattern = self.pattern
+        length = len(self.query)
+
+        # File names containing the query as is come first, so the first
+        # slice already shows the likeliest picks
+        blob = index.names_blob
+        offsets = index.name_offsets
+        while not self.done and self.name_position < len(blob) and len(self.named) < QUICK_OPEN_RESULTS * 4:
+            end = self.name_position + QUICK_OPEN_NAME_WINDOW
+            found = blob.find(self.query, self.name_position, end + length - 1)
+            if found < 0:
+                self.name_position = end
+                if time.perf_counter() >= deadline:
+                    return False
+                continue
+            i = bisect.bisect_right(offsets, found) - 1
+            self.named.add(i)
+            self.push(score_path(keys[i], name_starts[i], pattern, length), i)
+            self.name_position = offsets[i + 1] if i + 1 < len(offsets) else len(blob)
+
+        masks = index.masks
+        mask = self.mask
+        source = self.source
+        while not self.done:
+            chunk = source[self.position:self.position + QUICK_OPEN_FILTER_CHUNK]
+            for i in [i for i in chunk if masks[i] & mask == mask]:
+                if i in self.named:
+                    self.matches.append(i)
+                    continue
+                score = score_path(keys[i], name_starts[i], pattern, length)
+                if score is not None:
+                    self.matches.append(i)
+                    self.push(score, i)
+            self.position += QUICK_OPEN_FILTER_CHUNK
+            self.done = self.position >= len(source)
+            if time.perf_counter() >= deadline:
+                break
+        return self.done
+
+    def top(self):
+        if not self.query:
+            return self.index.all_paths()[:QUICK_OPEN_RESULTS]
+        removed = self.index.removed
+        return [path for _, path in sorted(self.heap, reverse=True) if path not in removed]
+
+
+class QuickOpenDialog(QDialog):
+    def __init__(self, parent, index, on_open):
+        super().__init__(parent)
+        self.index = index
+        self.on_open = on_open
+        self.setWindowTitle("Go to File")
+        self.resize(640, 420)
+        layout = QVBoxLayout(self)
+
+        self.query = QLineEdit()
+        self.query.setPlaceholderText(f"Search {len(index):,} files by name")
+        self.query.setStyleSheet("padding: 6px; font-size: 14px;")
+        self.query.textChanged.connect(self.update_results)
+        self.query.returnPressed.connect(self.open_selected)
+        self.query.installEventFilter(self)
+        layout.addWidget(self.query)
+
+        self.results = QListWidget()
+        self.results.setUniformItemSizes(True)
+        self.results.itemActivated.connect(self.open_selected)
+        layout.addWidget(self.results)
+
+        self.status = QLabel()
+        self.status.setStyleSheet("color: #aaaaaa; font-size: 11px;")
+        layout.addWidget(self.status)
+        self.update_results("")
+
+    def update_results(self, text):
+        self.search = self.index.search(text)
+        self.started = time.perf_counter()
+        self.shown = None
+        self.continue_search()
+
+    def continue_search(self):
+        search = self.search
+        search.step(time.perf_counter() + QUICK_OPEN_SLICE_MS / 1000)
+        paths = search.top()
+        if paths != self.shown:
+            self.shown = paths
+            self.results.clear()
+            self.results.addItems(paths)
+            if paths:
+                self.results.setCurrentRow(0)
+        if search.done:
+            elapsed = (time.perf_counter() - self.started) * 1000
+            count = f"{len(search.matches):,} matches" if search.query else f"{len(self.index):,} files"
+            self.status.setText(f"{count} in {elapsed:.1f} ms")
+        else:
+            self.status.setText("Searching...")
+            QTimer.singleShot(0, lambda: self.search is search and self.continue_search())
+
+    def eventFilter(self, obj, event):
+        if obj is self.query and event.type() == QEvent.KeyPress and \
+                event.key() in (Qt.Key_Up, Qt.Key_Down, Qt.Key_PageUp, Qt.Key_PageDown):
+            QApplication.sendEvent(self.results, event)
+            return True
+        return super().eventFilter(obj, event)
+
+    def open_selected(self, *args):
+        item = self.results.currentItem()
+        if item is not None:
+            self.accept()
+            self.on_open(item.text())
+
+
+# ======================================================
+# LIVE PREVIEW
+# ======================================================
+# HTML/CSS/JS runs are served from 127.0.0.1 instead of a temp file. Pages
+# get a small script that listens on PREVIEW_EVENTS (server-sent events):
+# a changed stylesheet is swapped in place, anything else reloads the page.
+# Unsaved tabs are served from memory, so the preview follows the editor.
+# Requests must name the server by its loopback address: a page on another
+# site that rebinds its own hostname to 127.0.0.1 reaches the same socket
+# but sends its own Host, so it can't read the project's files.
+PREVIEW_EVENTS = "/__cestudio/events"
+PREVIEW_SCRATCH = "/__cestudio/scratch"
+PREVIEW_KEEPALIVE_S = 15
+PREVIEW_DEBOUNCE_MS = 50
+PREVIEW_SCRIPT = b"""<script>
+(function () {
+  var source = new EventSource("/__cestudio/events");
+  source.onmessage = function (event) {
+    var change = JSON.parse(event.data);
+    if (change.type === "css") {
+      var links = document.querySelectorAll('link[rel="stylesheet"]');
+      var swapped = false;
+      for (var i = 0; i < links.length; i++) {
+        var url = new URL(links[i].href);
+        if (url.pathname === change.path) {
+          url.searchParams.set("v", Date.now());
+          links[i].href = url.href;
+          swapped = true;
+        }
+      }
+      if (swapped) return;
+    }
+    location.reload();
+  };
+})();
+</script>
+"""
+SCRATCH_PAGES = {
+    "HTML": "{code}",
+    "CSS": '<link rel="stylesheet" href="/__cestudio/scratch.css">\n'
+           "<h1>Heading</h1>\n<h2>Subheading</h2>\n<p>Paragraph with a <a href=\"#\">link</a> "
+           "and <strong>bold</strong> text.</p>\n<ul><li>First</li><li>Second</li></ul>\n"
+           "<button>Button</button> <input placeholder=\"Input\">\n",
+    "JavaScript": '<script src="/__cestudio/scratch.js"></script>\n',
+}
+
+
+class PreviewHandler:
+    # Mixed into BaseHTTPRequestHandler when the server starts; http.server
+    # is slow to import and most sessions never preview anything
+    def do_GET(self):
+        from urllib.parse import urlsplit, unquote
+        port = self.server.server_address[1]
+        if self.headers.get("Host") not in (f"127.0.0.1:{port}", f"localhost:{port}"):
+            self.send_error(403)
+            return
+        path = unquote(urlsplit(self.path).path)
+        preview = self.server.preview
+        if path == PREVIEW_EVENTS:
+            self.stream_events(preview)
+            return
+        found = preview.resolve(path)
+        if found is None:
+            self.send_error(404)
+            return
+        data, etag, content_type = found
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        if content_type == "text/html":
+            end = data.rfind(b"</body>")
+            data = data[:end] + PREVIEW_SCRIPT + data[end:] if end >= 0 else data + PREVIEW_SCRIPT
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        # Always revalidated, so unchanged files cost a 304
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def stream_events(self, preview):
+        import queue
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        events = preview.subscribe()
+        try:
+            self.wfile.flush()
+            while True:
+                try:
+                    event = events.get(timeout=PREVIEW_KEEPALIVE_S)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    if event is None:
+                        break
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            preview.unsubscribe(events)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PreviewServer:
+    def __init__(self, root):
+        import threading
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        self.root = root
+        self.lock = threading.Lock()
+        self.overlays = {}
+        self.scratch = {}
+        self.clients = []
+        handler = type("PreviewRequestHandler", (PreviewHandler, BaseHTTPRequestHandler), {})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.preview = self
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        from urllib.parse import quote
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{quote(path)}"
+
+    def resolve(self, path):
+        import hashlib
+        import mimetypes
+        with self.lock:
+            data = self.scratch.get(path)
+            if data is None:
+                data = self.overlays.get(path)
+        if data is not None:
+            etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+        else:
+            if self.root is None:
+                return None
+            file_path = os.path.normpath(os.path.join(self.root, path.lstrip("/")))
+            if os.path.isdir(file_path):
+                file_path = os.path.join(file_path, "index.html")
+                path = path.rstrip("/") + "/index.html"
+            if file_path != self.root and not file_path.startswith(self.root + os.sep):
+                return None
+            try:
+                with open(file_path, "rb") as f:
+                    stat = os.fstat(f.fileno())
+                    data = f.read()
+            except OSError:
+                return None
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if path == PREVIEW_SCRATCH:
+            content_type = "text/html"
+        else:
+            content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return data, etag, content_type
+
+    def set_overlays(self, overlays):
+        with self.lock:
+            self.overlays = overlays
+
+    def set_scratch(self, lang, code):
+        page = SCRATCH_PAGES[lang].format(code=code) if lang == "HTML" else SCRATCH_PAGES[lang]
+        page = f'<!DOCTYPE html>\n<html>\n<head><meta charset="UTF-8"></head>\n<body>\n{page}</body>\n</html>\n'
+        with self.lock:
+            self.scratch = {
+                PREVIEW_SCRATCH: page.encode("utf-8"),
+                PREVIEW_SCRATCH + ".css": code.encode("utf-8") if lang == "CSS" else b"",
+                PREVIEW_SCRATCH + ".js": code.encode("utf-8") if lang == "JavaScript" else b"",
+            }
+
+    def notify(self, path):
+        event = {"type": "css" if path.endswith(".css") else "reload", "path": path}
+        with self.lock:
+            clients = list(self.clients)
+        for events in clients:
+            events.put(event)
+
+    def has_clients(self):
+        with self.lock:
+            return bool(self.clients)
+
+    def subscribe(self):
+        import queue
+        events = queue.Queue()
+        with self.lock:
+            self.clients.append(events)
+        return events
+
+    def unsubscribe(self, events):
+        with self.lock:
+            if events in self.clients:
+                self.clients.remove(events)
+
+    def close(self):
+        with self.lock:
+            clients, self.clients = self.clients, []
+        for events in clients:
+            events.put(None)
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
 
 # ======================================================
-#  FIXED — USER DATA SAVES IN AppData/Roaming
+# DIAGNOSTICS
 # ======================================================
+# Edited tabs are checked DIAGNOSTICS_DEBOUNCE_MS after typing stops, on the
+# diagnostics pool. Results are cached by language and content hash, so text
+# that was checked before is never checked again, and a newer edit kills
+# the check still running for the old text.
+DIAGNOSTICS_DEBOUNCE_MS = 400
+DIAGNOSTICS_CACHE_SIZE = 256
+WORD_PATTERN = re.compile(r"\w+")
+DIAGNOSTIC_COLORS = {"error": "#f14c4c", "warning": "#cca700"}
 
-APPDATA = os.getenv("APPDATA")
-CESTUDIO_FOLDER = os.path.join(APPDATA, "CEStudio")
-USER_DIR = os.path.join(CESTUDIO_FOLDER, "Users")
-CURRENT_USER_FILE = os.path.join(CESTUDIO_FOLDER, "current_user.json")
 
-os.makedirs(USER_DIR, exist_ok=True)
+class DiagnosticsSignals(QObject):
+    finished = pyqtSignal(object, str, str, object)  # tab, language, digest, diagnostics
+
+
+class DiagnosticsJob(QRunnable):
+    def __init__(self, tab, lang, snapshot, digest):
+        super().__init__()
+        self.tab = tab
+        self.lang = lang
+        self.snapshot = snapshot
+        self.digest = digest
+        self.folder = os.path.dirname(tab.path) if tab.path else os.getcwd()
+        self.name = os.path.basename(tab.path) if tab.path else "untitled" + LANGUAGE_EXTENSIONS.get(lang, "")
+        self.proc = None
+        self.cancelled = False
+        self.signals = DiagnosticsSignals()
+
+    def cancel(self):
+        self.cancelled = True
+        if self.proc is not None:
+            kill_process_tree(self.proc)
+
+    def started(self, proc):
+        self.proc = proc
+        if self.cancelled:
+            kill_process_tree(proc)
+
+    def run(self):
+        import subprocess
+        if self.cancelled:
+            return
+        try:
+            diagnostics = self.check()
+        except (OSError, subprocess.SubprocessError):
+            diagnostics = None
+        if not self.cancelled:
+            self.signals.finished.emit(self.tab, self.lang, self.digest, diagnostics)
+
+    def check(self):
+        import shutil
+        import tempfile
+        if self.lang == "Python":
+            return check_python(self.snapshot.text(), self.name)
+        os.makedirs(RUN_FOLDER, exist_ok=True)
+        work_dir = tempfile.mkdtemp(dir=RUN_FOLDER)
+        try:
+            source = os.path.join(work_dir, self.name)
+            self.snapshot.write_to(source)
+            diagnostics = check_file(self.lang, source, self.folder, self.started)
+            return None if self.cancelled else diagnostics
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
 
 # ======================================================
-# LANGUAGE CONFIG
-# ======================================================
-LANGUAGE_EXTENSIONS = {
-    "Python": ".py",
-    "JavaScript": ".js",
-    "HTML": ".html",
-    "CSS": ".css",
-    "Java": ".java",
-    "C": ".c",
-    "C++": ".cpp",
-    "C#": ".cs",
-    "Go": ".go",
-    "Rust": ".rs",
-    "Kotlin": ".kt",
-    "Ruby": ".rb",
-    "PHP": ".php",
-    "TypeScript": ".ts",
-    "Scala": ".scala",
-    "Perl": ".pl",
-    "Lua": ".lua",
-}
+# EXTENSIONS
+# ======================================================
+# An extension is a folder under CESTUDIO_FOLDER/extensions with an
+# extension.json manifest. Only the manifests are read at startup. An
+# extension's code is imported the first time one of its activationEvents
+# fires ("onStartup", "onLanguage:<language>" or "onCommand:<command>").
+# It is imported in a separate host process that talks JSON lines over its
+# stdin/stdout, so a slow or crashing extension never blocks the editor.
+EXTENSIONS_FOLDER = os.path.join(CESTUDIO_FOLDER, "extensions")
+EXTENSION_MANIFEST = "extension.json"
+EXTENSION_NAME = re.compile(r"[A-Za-z0-9][\w.-]*")
+EXTENSION_COMMAND_TIMEOUT = 30
+EXTENSION_HOST_RESTARTS = 3
+
+# Runs in the host process. print() from an extension goes to stderr,
+# which the editor shows as the extension log.
+EXTENSION_HOST = """
+import os, sys, json, time, traceback, importlib.util
+protocol = sys.stdout
+sys.stdout = sys.stderr
+commands = {}
+modules = {}
+
+def send(message):
+    protocol.write(json.dumps(message) + "\\n")
+    protocol.flush()
+
+class Context:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+
+    def register_command(self, command, callback):
+        commands[command] = callback
+
+    def show_message(self, text):
+        send({"type": "message", "name": self.name, "text": str(text)})
+
+def activate(message):
+    name = message["name"]
+    start = time.perf_counter()
+    error = None
+    try:
+        sys.path.insert(0, message["path"])
+        spec = importlib.util.spec_from_file_location(
+            "cestudio_extension_" + name.replace(".", "_").replace("-", "_"),
+            os.path.join(message["path"], message["main"])
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        if hasattr(module, "activate"):
+            module.activate(Context(name, message["path"]))
+        modules[name] = module
+    except BaseException:
+        error = traceback.format_exc()
+    send({"type": "activated", "name": name, "ms": (time.perf_counter() - start) * 1000, "error": error})
+
+def run_command(message):
+    reply = {"type": "result", "id": message["id"]}
+    try:
+        callback = commands.get(message["command"])
+        if callback is None:
+            raise LookupError("No extension registered " + message["command"])
+        value = callback(message.get("args") or {})
+        reply["value"] = None if value is None else str(value)
+    except BaseException:
+        reply["error"] = traceback.format_exc()
+    send(reply)
+
+send({"type": "ready", "ms": (time.time() - float(sys.argv[1])) * 1000})
+for line in sys.stdin:
+    message = json.loads(line)
+    if message["type"] == "activate":
+        activate(message)
+    elif message["type"] == "command":
+        run_command(message)
+for module in modules.values():
+    try:
+        if hasattr(module, "deactivate"):
+            module.deactivate()
+    except BaseException:
+        traceback.print_exc()
+"""
+
+
+class ExtensionError(Exception):
+    pass
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, EXTENSION_MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except OSError:
+        raise ExtensionError(f"{path} has no {EXTENSION_MANIFEST}")
+    except ValueError as e:
+        raise ExtensionError(f"{EXTENSION_MANIFEST} is not valid JSON: {e}")
+    name = manifest.get("name")
+    if not isinstance(name, str) or not EXTENSION_NAME.fullmatch(name):
+        raise ExtensionError("The manifest needs a name made of letters, digits, '.', '-' or '_'")
+    manifest.setdefault("version", "0.0.0")
+    manifest.setdefault("description", "")
+    manifest.setdefault("main", "main.py")
+    manifest.setdefault("activationEvents", [])
+    manifest.setdefault("commands", [])
+    if not os.path.isfile(os.path.join(path, manifest["main"])):
+        raise ExtensionError(f"{name}: {manifest['main']} is missing")
+    manifest["path"] = path
+    return manifest
+
+
+def installed_extensions():
+    extensions = {}
+    try:
+        entries = list(os.scandir(EXTENSIONS_FOLDER))
+    except OSError:
+        return extensions
+    for entry in entries:
+        if entry.is_dir() and not entry.name.startswith("."):
+            try:
+                manifest = read_manifest(entry.path)
+            except ExtensionError:
+                continue
+            extensions[manifest["name"]] = manifest
+    return extensions
+
+
+def unpack_extension(source, scratch):
+    # A folder is used as is; a .zip is extracted first, and may hold the
+    # extension either at its root or inside a single top folder
+    if os.path.isdir(source):
+        return source
+    import zipfile
+    try:
+        with zipfile.ZipFile(source) as archive:
+            archive.extractall(scratch)
+    except (OSError, zipfile.BadZipFile) as e:
+        raise ExtensionError(f"Could not unpack {source}: {e}")
+    entries = os.listdir(scratch)
+    if EXTENSION_MANIFEST not in entries and len(entries) == 1:
+        return os.path.join(scratch, entries[0])
+    return scratch
+
+
+def install_extension(source):
+    import shutil
+    import tempfile
+    os.makedirs(EXTENSIONS_FOLDER, exist_ok=True)
+    scratch = tempfile.mkdtemp(dir=EXTENSIONS_FOLDER, prefix=".unpack-")
+    staged = None
+    try:
+        manifest = read_manifest(unpack_extension(source, scratch))
+        staged = tempfile.mkdtemp(dir=EXTENSIONS_FOLDER, prefix=".install-")
+        shutil.copytree(manifest["path"], staged, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns("__pycache__", ".git"))
+        target = os.path.join(EXTENSIONS_FOLDER, manifest["name"])
+        # Swapped in with renames, so a failed install leaves the old version
+        old = None
+        if os.path.exists(target):
+            old = tempfile.mkdtemp(dir=EXTENSIONS_FOLDER, prefix=".old-")
+            os.replace(target, os.path.join(old, "extension"))
+        os.replace(staged, target)
+        staged = None
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+    except OSError as e:
+        raise ExtensionError(f"Install failed: {e}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if staged is not None:
+            shutil.rmtree(staged, ignore_errors=True)
+    return read_manifest(target)
+
+
+def uninstall_extension(name):
+    import shutil
+    import tempfile
+    trash = tempfile.mkdtemp(dir=EXTENSIONS_FOLDER, prefix=".old-")
+    os.replace(os.path.join(EXTENSIONS_FOLDER, name), os.path.join(trash, "extension"))
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+def read_extension_index(path):
+    # index.json: {"extensions": [{"name", "version", "description", "source"}]}
+    # where source is a folder or .zip relative to the index
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ExtensionError(f"Could not read the extension index: {e}")
+    entries = []
+    for entry in data.get("extensions", []):
+        if isinstance(entry, dict) and entry.get("name") and entry.get("source"):
+            entry = dict(entry)
+            entry["source"] = os.path.join(os.path.dirname(path), entry["source"])
+            entries.append(entry)
+    return entries
+
+
+def version_key(version):
+    return tuple(int(part) if part.isdigit() else 0 for part in str(version).split("."))
+
+
+class ExtensionHost(QObject):
+    ready = pyqtSignal(float)
+    activated = pyqtSignal(str, float, str)
+    message = pyqtSignal(str, str)
+    result = pyqtSignal(int, str, str)
+    log = pyqtSignal(str)
+    stopped = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.buffer = b""
+        self.process = QProcess(self)
+        self.process.readyReadStandardOutput.connect(self.read_messages)
+        self.process.readyReadStandardError.connect(self.read_log)
+        self.process.finished.connect(lambda code, status: self.stopped.emit(code))
+        self.process.start(python_executable(), ["-u", "-c", EXTENSION_HOST, repr(time.time())])
+
+    def send(self, message):
+        self.process.write((json.dumps(message) + "\n").encode("utf-8"))
+
+    def read_messages(self):
+        self.buffer += bytes(self.process.readAllStandardOutput())
+        *lines, self.buffer = self.buffer.split(b"\n")
+        for line in lines:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            kind = message.get("type")
+            if kind == "ready":
+                self.ready.emit(message["ms"])
+            elif kind == "activated":
+                self.activated.emit(message["name"], message["ms"], message.get("error") or "")
+            elif kind == "message":
+                self.message.emit(message["name"], message["text"])
+            elif kind == "result":
+                self.result.emit(message["id"], message.get("value") or "", message.get("error") or "")
+
+    def read_log(self):
+        self.log.emit(bytes(self.process.readAllStandardError()).decode("utf-8", "replace"))
+
+    def close(self):
+        if self.process.state() != QProcess.NotRunning:
+            self.process.closeWriteChannel()
+            if not self.process.waitForFinished(1000):
+                self.process.kill()
+                self.process.waitForFinished(1000)
+
+
+class MarketplaceDialog(QDialog):
+    def __init__(self, parent, app):
+        super().__init__(parent)
+        self.setWindowTitle("CE Studio Marketplace")
+        self.resize(850, 500)
+        self.app = app
+        self.index_entries = []
+
+        layout = QVBoxLayout()
+        index_row = QHBoxLayout()
+        self.index_label = QLabel("")
+        self.index_label.setWordWrap(True)
+        index_row.addWidget(self.index_label, 1)
+        index_btn = QPushButton("Choose Index...")
+        index_btn.clicked.connect(self.choose_index)
+        index_row.addWidget(index_btn)
+        layout.addLayout(index_row)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Name", "Version", "Status", "Activation", "Description"])
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 180)
+        self.table.setColumnWidth(3, 160)
+        layout.addWidget(self.table)
+
+        self.status = QLabel("")
+        self.status.setStyleSheet("color: #aaa; font-size: 11px;")
+        layout.addWidget(self.status)
+
+        buttons = QHBoxLayout()
+        install = QPushButton("Install / Update")
+        install.clicked.connect(self.install_selected)
+        buttons.addWidget(install)
+        uninstall = QPushButton("Uninstall")
+        uninstall.clicked.connect(self.uninstall_selected)
+        buttons.addWidget(uninstall)
+        from_folder = QPushButton("Install from Folder...")
+        from_folder.clicked.connect(self.install_from_folder)
+        buttons.addWidget(from_folder)
+        close = QPushButton("Close")
+        close.clicked.connect(self.accept)
+        buttons.addWidget(close)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.load_index()
+
+    def load_index(self):
+        path = self.app.settings["extension_index"]
+        self.index_entries = []
+        if path:
+            try:
+                self.index_entries = read_extension_index(path)
+                self.index_label.setText(f"Index: {path}")
+            except ExtensionError as e:
+                self.index_label.setText(str(e))
+        else:
+            self.index_label.setText("No extension index chosen; extensions can still be installed from a folder.")
+        self.refresh()
+
+    def refresh(self):
+        rows = {}
+        for entry in self.index_entries:
+            rows[entry["name"]] = [entry["name"], str(entry.get("version", "")), "Available", "",
+                                   entry.get("description", ""), entry]
+        for name, manifest in self.app.extensions.items():
+            status = "Installed"
+            available = rows.get(name)
+            if available and version_key(available[1]) > version_key(manifest["version"]):
+                status = f"Update to {available[1]}"
+            rows[name] = [name, manifest["version"], status, self.app.extension_activation_text(name),
+                          manifest["description"], available[5] if available else None]
+        self.table.setRowCount(0)
+        for name in sorted(rows):
+            values = rows[name]
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            for column, value in enumerate(values[:5]):
+                item = QTableWidgetItem(value)
+                if column == 0:
+                    item.setData(Qt.UserRole, values[5])
+                self.table.setItem(row, column, item)
+        if self.app.extension_host_ms is not None:
+            self.status.setText(f"Extension host started in {self.app.extension_host_ms:.0f} ms")
+
+    def selected_row(self):
+        rows = self.table.selectionModel().selectedRows()
+        return rows[0].row() if rows else None
+
+    def install_selected(self):
+        row = self.selected_row()
+        entry = None if row is None else self.table.item(row, 0).data(Qt.UserRole)
+        if entry is None:
+            self.status.setText("Select an extension from the index first.")
+            return
+        self.install(entry["source"])
+
+    def install_from_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Extension Folder")
+        if folder:
+            self.install(folder)
+
+    def install(self, source):
+        try:
+            manifest = install_extension(source)
+        except ExtensionError as e:
+            self.status.setText(str(e))
+            return
+        self.app.restart_extensions()
+        self.status.setText(f"Installed {manifest['name']} {manifest['version']}")
+        self.refresh()
+
+    def uninstall_selected(self):
+        row = self.selected_row()
+        name = None if row is None else self.table.item(row, 0).text()
+        if name not in self.app.extensions:
+            self.status.setText("Select an installed extension first.")
+            return
+        try:
+            uninstall_extension(name)
+        except OSError as e:
+            self.status.setText(f"Uninstall failed: {e}")
+            return
+        self.app.restart_extensions()
+        self.status.setText(f"Uninstalled {name}")
+        self.refresh()
+
+    def choose_index(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Extension Index", "", "*.json")
+        if path:
+            self.app.settings["extension_index"] = path
+            save_settings(self.app.settings)
+            self.load_index()
+
+
+# ======================================================
+# STARTUP PROFILING
+# ======================================================
+# `--profile-startup` prints the time spent in each startup phase up to the
+# first paint and appends it to STARTUP_LOG_FILE, so runs can be compared.
+class StartupProfile:
+    def __init__(self, enabled):
+        self.pending = enabled
+        self.last = STARTUP_T0
+        self.phases = []
+
+    def mark(self, phase):
+        if self.pending:
+            now = time.perf_counter()
+            self.phases.append((phase, (now - self.last) * 1000))
+            self.last = now
+
+    def report(self):
+        self.pending = False
+        total = (self.last - STARTUP_T0) * 1000
+        for phase, ms in self.phases:
+            print(f"startup: {phase:<14} {ms:8.1f} ms", file=sys.stderr)
+        print(f"startup: {'total':<14} {total:8.1f} ms", file=sys.stderr)
+        entry = {"time": time.time(), "total_ms": round(total, 1),
+                 "phases": {phase: round(ms, 1) for phase, ms in self.phases}}
+        try:
+            with open(STARTUP_LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+
+
+STARTUP_PROFILE = StartupProfile("--profile-startup" in sys.argv)
+
+
+# ======================================================
+# EDITOR TABS
+# ======================================================
+class EditorTab:
+    def __init__(self, path=None, lang=None):
+        self.path = path
+        self.lang = lang
+        self.model = None
+        self.large = False
+        self.cache = None
+        self.cursor = 0
+        self.anchor = 0
+        self.scroll = 0
+        self.used = 0
+        self.diagnostics = []
+
+    def title(self):
+        return os.path.basename(self.path) if self.path else "Untitled"
+
+    def dirty(self):
+        return self.model is not None and self.model.document.isModified() or \
+            self.model is None and self.cache is not None
+
+
+# ======================================================
+# SAVING
+# ======================================================
+# Files are written on the save pool: the text goes to a temp file in the
+# same folder, is fsynced and then renamed over the target, so a crash
+# leaves either the old or the new file, never a truncated one.
+SAVE_THREADS = 4
+# Read once while the app is still single threaded; os.umask can only be
+# read by setting it, which would race with the save threads
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def atomic_write(path, chunks):
+    import shutil
+    import tempfile
+    folder = os.path.dirname(path) or os.curdir
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            size = os.fstat(f.fileno()).st_size
+            os.fsync(f.fileno())
+        try:
+            shutil.copymode(path, temp_path)
+        except FileNotFoundError:
+            # mkstemp creates 0600; a new file gets what open() would give it
+            os.chmod(temp_path, 0o666 & ~UMASK)
+        except OSError:
+            pass
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        # The rename itself is only durable once the folder is synced
+        dir_fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    return size
+
+
+class SaveSignals(QObject):
+    saved = pyqtSignal(str, int, str)  # path, bytes written, error
+
+
+class SaveJob(QRunnable):
+    def __init__(self, path, snapshot):
+        super().__init__()
+        self.path = path
+        self.snapshot = snapshot
+        self.signals = SaveSignals()
+
+    def run(self):
+        try:
+            size = atomic_write(self.path, self.snapshot.chunks())
+        except OSError as e:
+            self.signals.saved.emit(self.path, 0, str(e))
+            return
+        self.signals.saved.emit(self.path, size, "")
+
+
+# ======================================================
+# ACCOUNTS
+# ======================================================
+# Every account is a row in one SQLite file keyed by username. Passwords
+# are stored as salted scrypt hashes, or PBKDF2-SHA256 where hashlib has
+# no scrypt. The cost is calibrated once so a check takes about
+# password_hash_ms on this machine. Hashes made at another cost are
+# redone on the next successful login. The old plaintext
+# Users/<name>/account.json files are moved in by a one-time background
+# migration, and each file is deleted once its hash is stored. Hashing is
+# slow on purpose, so sign-ups and logins run on the account pool too.
+ACCOUNTS_FILE = os.path.join(CESTUDIO_FOLDER, "accounts.sqlite")
+LEGACY_ACCOUNT_NAME = "account.json"
+SALT_BYTES = 16
+HASH_BYTES = 32
+SCRYPT_MAX_MEMORY = 64 * 1024 * 1024
+MIGRATION_BATCH = 100
+MIGRATION_THREADS = 4
+
+ACCOUNTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (username TEXT PRIMARY KEY, password TEXT, created REAL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class AccountExists(Exception):
+    pass
+
+
+def derive_key(password, kdf, params, salt):
+    import hashlib
+    if kdf == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                              maxmem=2 * SCRYPT_MAX_MEMORY, dklen=HASH_BYTES)
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, params[0], dklen=HASH_BYTES)
+
+
+def hash_password(password, kdf, params):
+    import base64
+    salt = os.urandom(SALT_BYTES)
+    key = derive_key(password, kdf, params, salt)
+    encoded = [base64.b64encode(salt).decode("ascii"), base64.b64encode(key).decode("ascii")]
+    return "$".join([kdf] + [str(value) for value in params] + encoded)
+
+
+def parse_password_hash(stored):
+    import base64
+    kdf, *params, salt, key = stored.split("$")
+    return kdf, tuple(int(value) for value in params), base64.b64decode(salt), base64.b64decode(key)
+
+
+def check_password(password, stored):
+    import hmac
+    kdf, params, salt, key = parse_password_hash(stored)
+    return hmac.compare_digest(derive_key(password, kdf, params, salt), key)
+
+
+def calibrate_kdf(target_ms):
+    import hashlib
+    target = target_ms / 1000
+
+    def timed(kdf, params):
+        start = time.perf_counter()
+        derive_key("calibration", kdf, params, bytes(SALT_BYTES))
+        return time.perf_counter() - start
+
+    if hasattr(hashlib, "scrypt"):
+        n, r = 2 ** 14, 8
+        spent = timed("scrypt", (n, r, 1))
+        while spent < target / 2 and 128 * r * n * 2 <= SCRYPT_MAX_MEMORY:
+            n *= 2
+            spent = timed("scrypt", (n, r, 1))
+        # Past the memory cap, parallelism adds time without adding memory
+        return "scrypt", (n, r, max(1, round(target / spent)))
+    iterations = 100000
+    spent = timed("pbkdf2_sha256", (iterations,))
+    return "pbkdf2_sha256", (max(iterations, int(iterations * target / spent)),)
+
+
+def legacy_account_path(username):
+    return os.path.join(USER_DIR, username, LEGACY_ACCOUNT_NAME)
+
+
+def read_legacy_account(username):
+    try:
+        with open(legacy_account_path(username), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("password"), str):
+        return None
+    return data
+
+
+def remove_legacy_account(username):
+    try:
+        os.remove(legacy_account_path(username))
+    except FileNotFoundError:
+        pass
+
+
+class AccountStore:
+    def __init__(self, path, target_ms):
+        import threading
+        self.path = path
+        self.target_ms = target_ms
+        self.kdf = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        import sqlite3
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(ACCOUNTS_SCHEMA)
+        return conn
+
+    def cost(self, conn):
+        # Calibrated once per target and machine, then kept in the database
+        import hashlib
+        with self.lock:
+            if self.kdf is not None:
+                return self.kdf
+            row = conn.execute("SELECT value FROM meta WHERE key = 'kdf'").fetchone()
+            saved = json.loads(row[0]) if row else {}
+            if saved.get("target_ms") == self.target_ms and (saved.get("kdf") == "scrypt") == hasattr(hashlib, "scrypt"):
+                self.kdf = saved["kdf"], tuple(saved["params"])
+            else:
+                kdf, params = calibrate_kdf(self.target_ms)
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO meta VALUES ('kdf', ?)", (json.dumps(
+                        {"target_ms": self.target_ms, "kdf": kdf, "params": params}
+                    ),))
+                self.kdf = kdf, params
+            return self.kdf
+
+    def create(self, username, password):
+        import sqlite3
+        conn = self.connect()
+        try:
+            stored = hash_password(password, *self.cost(conn))
+            try:
+                with conn:
+                    conn.execute("INSERT INTO accounts VALUES (?, ?, ?)", (username, stored, time.time()))
+            except sqlite3.IntegrityError:
+                raise AccountExists(username)
+        finally:
+            conn.close()
+
+    def verify(self, username, password):
+        # True or False, or None when there is no such account
+        conn = self.connect()
+        try:
+            row = conn.execute("SELECT password FROM accounts WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                legacy = read_legacy_account(username)
+                if legacy is None:
+                    return None
+                if legacy["password"] != password:
+                    return False
+                self.store_migrated(conn, [(username, hash_password(password, *self.cost(conn)))])
+                return True
+            if not check_password(password, row[0]):
+                return False
+            current = self.cost(conn)
+            if parse_password_hash(row[0])[:2] != current:
+                with conn:
+                    conn.execute("UPDATE accounts SET password = ? WHERE username = ?",
+                                 (hash_password(password, *current), username))
+            return True
+        finally:
+            conn.close()
+
+    def store_migrated(self, conn, hashed):
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO accounts VALUES (?, ?, ?)",
+                             [(username, stored, time.time()) for username, stored in hashed])
+        for username, _ in hashed:
+            remove_legacy_account(username)
+
+    def migrate(self, progress=None):
+        conn = self.connect()
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone():
+                return 0
+            legacy = []
+            with os.scandir(USER_DIR) as entries:
+                for entry in entries:
+                    if entry.is_dir() and os.path.exists(os.path.join(entry.path, LEGACY_ACCOUNT_NAME)):
+                        data = read_legacy_account(entry.name)
+                        if data is not None:
+                            legacy.append((entry.name, data["password"]))
+            if legacy:
+                kdf, params = self.cost(conn)
+                from concurrent.futures import ThreadPoolExecutor
+                # hashlib drops the GIL while hashing, so threads hash in parallel
+                with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, MIGRATION_THREADS)) as executor:
+                    for start in range(0, len(legacy), MIGRATION_BATCH):
+                        batch = legacy[start:start + MIGRATION_BATCH]
+                        hashes = executor.map(lambda account: hash_password(account[1], kdf, params), batch)
+                        self.store_migrated(conn, [(name, stored) for (name, _), stored in zip(batch, hashes)])
+                        if progress:
+                            progress(start + len(batch), len(legacy))
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('migrated', ?)", (str(time.time()),))
+            return len(legacy)
+        finally:
+            conn.close()
+
+
+class MigrationSignals(QObject):
+    failed = pyqtSignal(str)
+
+
+class AccountSignals(QObject):
+    finished = pyqtSignal(str, object, object)
+
+
+class AccountJob(QRunnable):
+    # Runs store.create or store.verify; finished carries the username, the
+    # result and the exception, if any
+    def __init__(self, work, username, password):
+        super().__init__()
+        self.work = work
+        self.username = username
+        self.password = password
+        self.signals = AccountSignals()
+
+    def run(self):
+        try:
+            result, error = self.work(self.username, self.password), None
+        except Exception as e:
+            result, error = None, e
+        self.signals.finished.emit(self.username, result, error)
+
+
+class AccountMigration(QRunnable):
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.signals = MigrationSignals()
+
+    def run(self):
+        import sqlite3
+        try:
+            self.store.migrate()
+        except (OSError, sqlite3.Error) as e:
+            self.signals.failed.emit(f"Account migration failed: {e}")
 
-WEB_LANGUAGES = ["HTML", "CSS", "JavaScript"]
 
 # ======================================================
 # MAIN CLASS
@@ -60,6 +2993,108 @@ class CEStudioApp(QWidget):
         self.setGeometry(300, 200, 1200, 700)
         self.setStyleSheet("background-color: #1e1e1e; color: white; font-family: Arial;")
 
+        self.settings = load_settings()
+        STARTUP_PROFILE.mark("settings")
+        self.current_user = None
+        self.editor_open = False
+        self.terminal_session = None
+        self.run_pool = QThreadPool(self)
+        self.active_run = None
+        self.interpreter_pool = None
+
+        self.scan_pool = QThreadPool(self)
+        self.scan_pool.setMaxThreadCount(4)
+        self.scan_generation = 0
+        self.active_scans = {}
+        self.folder_items = {}
+        self.scanned_entries = 0
+
+        # Only folders that are listed in the explorer are watched; changes are
+        # coalesced per folder and applied by re-listing just that folder
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.queue_explorer_refresh)
+        self.pending_refresh = set()
+        self.refresh_state = {}
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(WATCH_DEBOUNCE_MS)
+        self.refresh_timer.timeout.connect(self.flush_explorer_refresh)
+
+        # Find-in-files: the index is kept in sync in the background and
+        # queries stream their hits back in batches
+        self.search_pool = QThreadPool(self)
+        self.search_pool.setMaxThreadCount(2)
+        self.search_index = None
+        self.index_job = None
+        self.search_job = None
+        self.search_generation = 0
+        self.search_file_items = {}
+        self.path_index = None
+        self.pending_index = set()
+        self.index_timer = QTimer(self)
+        self.index_timer.setSingleShot(True)
+        self.index_timer.setInterval(INDEX_UPDATE_MS)
+        self.index_timer.timeout.connect(self.flush_index_update)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.start_search)
+        self.save_pool = QThreadPool(self)
+        self.save_pool.setMaxThreadCount(SAVE_THREADS)
+        self.saving = {}
+        self.pending_saves = {}
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.timeout.connect(self.autosave)
+        self.preview_server = None
+        self.preview_published = {}
+        self.preview_scratch = None
+        self.preview_opened = set()
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DEBOUNCE_MS)
+        self.preview_timer.timeout.connect(self.refresh_preview)
+        self.diagnostics_pool = QThreadPool(self)
+        self.diagnostics_pool.setMaxThreadCount(2)
+        self.diagnostics_jobs = {}
+        self.diagnostics_cache = {}
+        self.pending_diagnostics = set()
+        self.diagnostics_timer = QTimer(self)
+        self.diagnostics_timer.setSingleShot(True)
+        self.diagnostics_timer.setInterval(DIAGNOSTICS_DEBOUNCE_MS)
+        self.diagnostics_timer.timeout.connect(self.run_diagnostics)
+        self.accounts = AccountStore(ACCOUNTS_FILE, self.settings["password_hash_ms"])
+        self.account_pool = QThreadPool(self)
+        self.account_job = None
+        migration = AccountMigration(self.accounts)
+        migration.signals.failed.connect(self.show_message)
+        self.account_pool.start(migration)
+        # Only the manifests are read here; the host process starts on the
+        # first activation event
+        self.extensions = installed_extensions()
+        self.extension_host = None
+        self.extension_host_ms = None
+        self.extension_restarts = 0
+        self.extension_times = {}
+        self.extension_errors = {}
+        self.extension_events = []
+        self.extension_requests = {}
+        self.extension_request_id = 0
+        quick_open = QShortcut(QKeySequence("Ctrl+P"), self)
+        quick_open.activated.connect(self.show_quick_open)
+        command_palette = QShortcut(QKeySequence("Ctrl+Shift+P"), self)
+        command_palette.activated.connect(self.show_command_palette)
+        STARTUP_PROFILE.mark("services")
+
+        # Screens are built the first time they are shown and then kept;
+        # navigating only switches the stack
+        self.screens = {}
+        self.stack = QStackedWidget()
+        root_layout = QVBoxLayout()
+        root_layout.setContentsMargins(0, 0, 0, 0)
+        root_layout.addWidget(self.stack)
+        self.setLayout(root_layout)
+
         # Try auto-login
         if os.path.exists(CURRENT_USER_FILE):
             try:
@@ -67,21 +3102,25 @@ class CEStudioApp(QWidget):
                     data = json.load(f)
                     username = data.get("username")
                     if username and os.path.exists(os.path.join(USER_DIR, username)):
-                        self.open_studio()
+                        self.start_session(username)
+                        STARTUP_PROFILE.mark("screen")
                         return
             except:
                 pass
 
         # Show login if not logged in
         self.init_login_screen()
+        STARTUP_PROFILE.mark("screen")
 
     # ======================================================
     # LOGIN / SIGNUP
     # ======================================================
 
     def init_login_screen(self):
-        self.clear_layout()
+        if not self.show_screen("login", self.build_login_screen):
+            self.password_input.clear()
 
+    def build_login_screen(self):
         layout = QVBoxLayout()
         layout.setAlignment(Qt.AlignCenter)
 
@@ -101,21 +3140,26 @@ class CEStudioApp(QWidget):
         self.password_input.setStyleSheet(self.input_style())
         layout.addWidget(self.password_input)
 
-        login_btn = QPushButton("Login")
-        login_btn.setStyleSheet(self.button_style())
-        login_btn.clicked.connect(self.login)
-        layout.addWidget(login_btn)
+        self.login_button = QPushButton("Login")
+        self.login_button.setStyleSheet(self.button_style())
+        self.login_button.clicked.connect(self.login)
+        layout.addWidget(self.login_button)
 
         signup_btn = QPushButton("Sign Up")
         signup_btn.setStyleSheet(self.button_style(True))
         signup_btn.clicked.connect(self.init_signup_screen)
         layout.addWidget(signup_btn)
 
-        self.setLayout(layout)
+        screen = QWidget()
+        screen.setLayout(layout)
+        return screen
 
     def init_signup_screen(self):
-        self.clear_layout()
+        if not self.show_screen("signup", self.build_signup_screen):
+            self.new_username.clear()
+            self.new_password.clear()
 
+    def build_signup_screen(self):
         layout = QVBoxLayout()
         layout.setAlignment(Qt.AlignCenter)
 
@@ -129,76 +3173,425 @@ class CEStudioApp(QWidget):
         self.new_username.setStyleSheet(self.input_style())
         layout.addWidget(self.new_username)
 
-        self.new_password = QLineEdit()
-        self.new_password.setPlaceholderText("Choose Password")
-        self.new_password.setEchoMode(QLineEdit.Password)
-        self.new_password.setStyleSheet(self.input_style())
-        layout.addWidget(self.new_password)
+        self.new_password = QLineEdit()
+        self.new_password.setPlaceholderText("Choose Password")
+        self.new_password.setEchoMode(QLineEdit.Password)
+        self.new_password.setStyleSheet(self.input_style())
+        layout.addWidget(self.new_password)
+
+        self.create_button = QPushButton("Create Account")
+        self.create_button.setStyleSheet(self.button_style())
+        self.create_button.clicked.connect(self.create_account)
+        layout.addWidget(self.create_button)
+
+        back_btn = QPushButton("Back to Login")
+        back_btn.setStyleSheet(self.button_style(True))
+        back_btn.clicked.connect(self.init_login_screen)
+        layout.addWidget(back_btn)
+
+        screen = QWidget()
+        screen.setLayout(layout)
+        return screen
+
+    def create_account(self):
+        username = self.new_username.text().strip()
+        password = self.new_password.text().strip()
+
+        if not username or not password:
+            self.show_message("Please enter both username and password.")
+            return
+
+        if os.path.exists(os.path.join(USER_DIR, username)):
+            self.show_message("Username already exists!")
+            return
+
+        self.start_account_job(self.accounts.create, username, password, self.create_button, self.account_created)
+
+    def account_created(self, username, result, error):
+        if not self.finish_account_job(self.create_button):
+            return
+        if isinstance(error, AccountExists):
+            self.show_message("Username already exists!")
+            return
+        if error is not None:
+            self.show_message(f"Failed to create account: {str(error)}")
+            return
+
+        os.makedirs(os.path.join(USER_DIR, username), exist_ok=True)
+
+        self.show_message("Account created successfully!", True)
+        self.init_login_screen()
+
+    def start_account_job(self, work, username, password, button, finished):
+        if self.account_job is not None:
+            return
+        job = AccountJob(work, username, password)
+        job.signals.finished.connect(finished)
+        self.account_job = job
+        button.setEnabled(False)
+        self.account_pool.start(job)
+
+    def finish_account_job(self, button):
+        if self.account_job is None or self.sender() is not self.account_job.signals:
+            return False
+        self.account_job = None
+        button.setEnabled(True)
+        return True
+
+    def login(self):
+        username = self.username_input.text().strip()
+        password = self.password_input.text().strip()  # FIXED
+
+        self.start_account_job(self.accounts.verify, username, password, self.login_button, self.logged_in)
+
+    def logged_in(self, username, verified, error):
+        if not self.finish_account_job(self.login_button):
+            return
+        if error is not None:
+            self.show_message(f"Login failed: {str(error)}")
+            return
+
+        if verified is None:
+            self.show_message("User not found! Please sign up.")
+            return
+
+        if not verified:
+            self.show_message("Incorrect password!")
+            return
+
+        with open(CURRENT_USER_FILE, "w") as f:
+            json.dump({"username": username}, f)
+
+        self.show_message("Login successful!", True)
+        self.start_session(username)
+
+    # ======================================================
+    # SESSION
+    # ======================================================
+    # USER_DIR/<user>/session.json keeps the folder, the open tabs and a
+    # snapshot of the listed explorer folders. Unsaved text is cached next
+    # to it, so nothing is lost between launches.
+    def start_session(self, username):
+        self.current_user = username
+        session = self.load_session()
+        folder = session.get("folder")
+        if folder and os.path.isdir(folder):
+            self.current_folder = folder
+            self.open_editor()
+        else:
+            self.open_studio()
+
+    def session_dir(self):
+        return os.path.join(USER_DIR, self.current_user)
+
+    def load_session(self):
+        if self.current_user is None:
+            return {}
+        try:
+            with open(os.path.join(self.session_dir(), SESSION_FILE_NAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_session(self):
+        if self.current_user is None:
+            return
+        session = {"lang": self.lang_select.currentText(), "buffers": []}
+        if hasattr(self, "current_folder"):
+            session["folder"] = self.current_folder
+            session["explorer"] = self.explorer_snapshot()
+        cache_dir = os.path.join(self.session_dir(), BUFFER_CACHE_NAME)
+        cached = set()
+        self.store_view_state(self.active_tab)
+        for tab in self.all_tabs():
+            if tab.model is not None:
+                if tab.dirty():
+                    tab.cache = tab.cache or os.urandom(8).hex() + ".txt"
+                    try:
+                        os.makedirs(cache_dir, exist_ok=True)
+                        tab.model.snapshot().write_to(os.path.join(cache_dir, tab.cache))
+                    except OSError:
+                        tab.cache = None
+                else:
+                    tab.cache = None
+            if tab.path is None and tab.cache is None:
+                continue
+            if tab is self.active_tab:
+                session["active"] = len(session["buffers"])
+            buffer = {"path": tab.path, "lang": tab.lang, "cursor": tab.cursor, "anchor": tab.anchor, "scroll": tab.scroll}
+            if tab.cache:
+                buffer["cache"] = tab.cache
+                cached.add(tab.cache)
+            session["buffers"].append(buffer)
+        try:
+            if os.path.isdir(cache_dir):
+                for name in os.listdir(cache_dir):
+                    if name not in cached:
+                        os.remove(os.path.join(cache_dir, name))
+            path = os.path.join(self.session_dir(), SESSION_FILE_NAME)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(session, f)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass
+
+    def explorer_snapshot(self):
+        folders = {}
+        expanded = []
+        for path, item in self.folder_items.items():
+            if path in self.active_scans:
+                continue
+            rel = os.path.relpath(path, self.current_folder)
+            folders[rel] = [[child.text(0), child.text(1) == "Folder"]
+                            for child in (item.child(i) for i in range(item.childCount()))]
+            if item is not self.explorer.invisibleRootItem() and item.isExpanded():
+                expanded.append(rel)
+        return {"folders": folders, "expanded": expanded}
+
+    def restore_explorer(self, root, snapshot):
+        folders = snapshot.get("folders", {})
+        if os.curdir not in folders:
+            return False
 
-        create_btn = QPushButton("Create Account")
-        create_btn.setStyleSheet(self.button_style())
-        create_btn.clicked.connect(self.create_account)
-        layout.addWidget(create_btn)
+        def fill(rel, parent_item):
+            path = os.path.normpath(os.path.join(root, rel))
+            self.folder_items[path] = parent_item
+            self.watcher.addPath(path)
+            entries = folders[rel]
+            items = [self.make_explorer_item(name, is_dir) for name, is_dir in entries]
+            parent_item.addChildren(items)
+            for item, (name, is_dir) in zip(items, entries):
+                child = os.path.normpath(os.path.join(rel, name))
+                if is_dir and child in folders:
+                    item.setData(0, Qt.UserRole, True)
+                    fill(child, item)
 
-        back_btn = QPushButton("Back to Login")
-        back_btn.setStyleSheet(self.button_style(True))
-        back_btn.clicked.connect(self.init_login_screen)
-        layout.addWidget(back_btn)
+        fill(os.curdir, self.explorer.invisibleRootItem())
+        for rel in snapshot.get("expanded", []):
+            item = self.folder_items.get(os.path.normpath(os.path.join(root, rel)))
+            if item is not None:
+                item.setExpanded(True)
+        return True
 
-        self.setLayout(layout)
+    def restore_buffers(self, session):
+        # Tabs come back unloaded; each reads its file (or cached unsaved
+        # text) the first time it is shown
+        if session.get("lang"):
+            self.lang_select.setCurrentText(session["lang"])
+        placeholder = self.current_tab()
+        active = None
+        for i, buffer in enumerate(session.get("buffers", [])):
+            path = buffer.get("path")
+            if not buffer.get("cache") and not (path and os.path.isfile(path)):
+                continue
+            tab = EditorTab(path, buffer.get("lang") or self.lang_select.currentText())
+            tab.cache = buffer.get("cache")
+            tab.cursor = buffer.get("cursor", 0)
+            tab.anchor = buffer.get("anchor", tab.cursor)
+            tab.scroll = buffer.get("scroll", 0)
+            self.add_tab(tab, activate=False)
+            if active is None or i == session.get("active"):
+                active = tab
+        if active is not None:
+            self.tab_bar.setCurrentIndex(self.tab_index(active))
+            self.drop_placeholder_tab(placeholder)
 
-    def create_account(self):
-        username = self.new_username.text().strip()
-        password = self.new_password.text().strip()
+    # ======================================================
+    # EDITOR TABS
+    # ======================================================
+    # Every tab owns an EditorDocument once it is shown. Tabs restored from
+    # the session stay unloaded until first activated, and clean background
+    # tabs are dropped back to their path (least recently used first) while
+    # the loaded documents exceed tab_memory_mb.
+    def all_tabs(self):
+        return [self.tab_bar.tabData(i) for i in range(self.tab_bar.count())]
 
-        if not username or not password:
-            self.show_message("Please enter both username and password.")
-            return
+    def current_tab(self):
+        return self.tab_bar.tabData(self.tab_bar.currentIndex())
 
-        user_path = os.path.join(USER_DIR, username)
-        if os.path.exists(user_path):
-            self.show_message("Username already exists!")
-            return
+    def tab_index(self, tab):
+        for i in range(self.tab_bar.count()):
+            if self.tab_bar.tabData(i) is tab:
+                return i
+        return -1
 
-        os.makedirs(user_path)
+    def add_tab(self, tab, activate=True):
+        index = self.tab_bar.addTab(tab.title())
+        self.tab_bar.setTabData(index, tab)
+        self.update_tab_title(tab)
+        if activate:
+            if self.tab_bar.currentIndex() == index:
+                # The first tab becomes current before its data is set
+                self.activate_tab(index)
+            else:
+                self.tab_bar.setCurrentIndex(index)
+        return index
 
-        with open(os.path.join(user_path, "account.json"), "w") as f:
-            json.dump({"username": username, "password": password}, f)
+    def update_tab_title(self, tab):
+        index = self.tab_index(tab)
+        if index >= 0:
+            self.tab_bar.setTabText(index, tab.title() + (" ●" if tab.dirty() else ""))
+            self.tab_bar.setTabToolTip(index, tab.path or "")
 
-        self.show_message("Account created successfully!", True)
-        self.init_login_screen()
+    def load_tab(self, tab):
+        if tab.model is not None or tab.large:
+            return True
+        text = "" if tab.path is None else None
+        if tab.cache:
+            try:
+                with open(os.path.join(self.session_dir(), BUFFER_CACHE_NAME, tab.cache), "r", encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                tab.cache = None
+        if text is None:
+            try:
+                if os.path.getsize(tab.path) > self.settings["large_file_mb"] * 1024 * 1024:
+                    tab.large = True
+                    return True
+                with open(tab.path, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except UnicodeDecodeError:
+                # Not valid UTF-8: show it read-only with the bad bytes replaced
+                tab.large = True
+                return True
+            except Exception as e:
+                self.show_message(f"Failed to load file: {str(e)}")
+                return False
+        tab.model = EditorDocument(text, tab.lang)
+        # Text restored from the session cache is still unsaved
+        tab.model.document.setModified(tab.cache is not None)
+        tab.model.document.modificationChanged.connect(lambda _: self.update_tab_title(tab))
+        tab.model.document.contentsChanged.connect(self.schedule_autosave)
+        tab.model.document.contentsChanged.connect(self.schedule_preview)
+        tab.model.document.contentsChanged.connect(self.document_changed)
+        self.schedule_diagnostics(tab)
+        return True
 
-    def login(self):
-        username = self.username_input.text().strip()
-        password = self.password_input.text().strip()  # FIXED
+    def store_view_state(self, tab):
+        if tab is not None and tab.model is not None and self.code_editor.model is tab.model:
+            cursor = self.code_editor.textCursor()
+            tab.cursor = cursor.position()
+            tab.anchor = cursor.anchor()
+            tab.scroll = self.code_editor.verticalScrollBar().value()
+
+    def activate_tab(self, index):
+        tab = self.tab_bar.tabData(index)
+        if tab is None:
+            return
+        self.store_view_state(self.active_tab)
+        self.active_tab = tab
+        self.tab_clock += 1
+        tab.used = self.tab_clock
+        if not self.load_tab(tab):
+            self.close_tab(self.tab_index(tab), force=True)
+            return
+        self.lang_select.blockSignals(True)
+        self.lang_select.setCurrentText(tab.lang)
+        self.lang_select.blockSignals(False)
+        if tab.large:
+            if self.large_viewer.path != tab.path:
+                try:
+                    self.large_viewer.open(tab.path)
+                except Exception as e:
+                    self.show_message(f"Failed to load file: {str(e)}")
+            self.editor_stack.setCurrentWidget(self.large_viewer)
+        else:
+            self.code_editor.set_model(tab.model)
+            self.editor_stack.setCurrentWidget(self.code_editor)
+            self.restore_view_state(tab)
+            self.apply_diagnostics(tab)
+        self.enforce_tab_memory()
+        self.fire_extension_event(f"onLanguage:{tab.lang}")
 
-        user_folder = os.path.join(USER_DIR, username)
-        account_file = os.path.join(user_folder, "account.json")
+    def restore_view_state(self, tab):
+        length = tab.model.document.characterCount() - 1
+        cursor = self.code_editor.textCursor()
+        cursor.setPosition(min(tab.anchor, length))
+        cursor.setPosition(min(tab.cursor, length), QTextCursor.KeepAnchor)
+        self.code_editor.setTextCursor(cursor)
+        # The scroll range is only known after the first layout
+        scroll = tab.scroll
+        QTimer.singleShot(0, lambda: self.code_editor.model is tab.model and
+                          self.code_editor.verticalScrollBar().setValue(scroll))
 
-        if not os.path.exists(account_file):
-            self.show_message("User not found! Please sign up.")
+    def enforce_tab_memory(self):
+        budget = self.settings["tab_memory_mb"] * 1024 * 1024
+        loaded = [tab for tab in self.all_tabs() if tab.model is not None]
+        total = sum(tab.model.memory() for tab in loaded)
+        if total <= budget:
             return
+        for tab in sorted(loaded, key=lambda t: t.used):
+            if total <= budget:
+                break
+            if tab is self.active_tab or tab.dirty() or tab.path is None:
+                continue
+            total -= tab.model.memory()
+            self.store_view_state(tab)
+            tab.model = None
 
-        with open(account_file, "r") as f:
-            data = json.load(f)
+    def change_language(self, lang):
+        tab = self.current_tab()
+        if tab is not None:
+            tab.lang = lang
+            if tab.model is not None:
+                tab.model.highlighter.set_language(lang)
+                self.schedule_diagnostics(tab)
+            self.fire_extension_event(f"onLanguage:{lang}")
 
-        if data.get("password") != password:
-            self.show_message("Incorrect password!")
+    def close_tab(self, index, force=False):
+        tab = self.tab_bar.tabData(index)
+        if tab is None:
             return
+        if not force and tab.dirty():
+            answer = QMessageBox.question(self, "CE Studio", f"Discard unsaved changes to {tab.title()}?")
+            if answer != QMessageBox.Yes:
+                return
+        if tab is self.active_tab:
+            self.active_tab = None
+        job = self.diagnostics_jobs.pop(tab, None)
+        if job is not None:
+            job.cancel()
+        self.pending_diagnostics.discard(tab)
+        if tab.large and self.large_viewer.path == tab.path:
+            self.large_viewer.close_file()
+        self.tab_bar.removeTab(index)
+        if self.tab_bar.count() == 0:
+            self.add_tab(EditorTab(None, self.lang_select.currentText()))
 
-        with open(CURRENT_USER_FILE, "w") as f:
-            json.dump({"username": username}, f)
+    def open_tab(self, path, activate=True):
+        path = os.path.normpath(path)
+        for tab in self.all_tabs():
+            if tab.path == path:
+                if activate:
+                    self.tab_bar.setCurrentIndex(self.tab_index(tab))
+                return tab
+        lang = EXTENSION_LANGUAGES.get(os.path.splitext(path)[1]) or self.lang_select.currentText()
+        tab = EditorTab(path, lang)
+        if activate:
+            if not self.load_tab(tab):
+                return None
+            placeholder = self.current_tab()
+            self.add_tab(tab)
+            self.drop_placeholder_tab(placeholder)
+        else:
+            self.add_tab(tab, activate=False)
+        return tab
 
-        self.show_message("Login successful!", True)
-        self.open_studio()
+    def drop_placeholder_tab(self, tab):
+        # An untouched empty Untitled tab is replaced rather than kept
+        if tab is not None and tab.path is None and not tab.dirty() and \
+                tab.model is not None and len(tab.model.buffer) == 0 and self.tab_bar.count() > 1:
+            self.close_tab(self.tab_index(tab), force=True)
 
     # ======================================================
     # MAIN MENU
     # ======================================================
 
     def open_studio(self):
-        self.clear_layout()
+        self.show_screen("studio", self.build_studio_screen)
+        self.cancel_scans()
 
+    def build_studio_screen(self):
         main_layout = QVBoxLayout()
         top_bar = QHBoxLayout()
 
@@ -219,40 +3612,198 @@ class CEStudioApp(QWidget):
 
         main_layout.addLayout(top_bar)
 
-        welcome = QLabel("Welcome to CE Studio!", self)
+        welcome = QLabel("Welcome to CE Studio!")
         welcome.setAlignment(Qt.AlignCenter)
         welcome.setStyleSheet("font-size: 20px; font-weight: bold; margin-top: 50px;")
         main_layout.addWidget(welcome)
 
-        self.setLayout(main_layout)
+        screen = QWidget()
+        screen.setLayout(main_layout)
+        return screen
 
     # ======================================================
     # MARKETPLACE
     # ======================================================
     def open_marketplace(self):
-        dlg = QDialog(self)
-        dlg.setWindowTitle("CE Studio Marketplace")
-        dlg.setGeometry(400, 200, 400, 250)
+        MarketplaceDialog(self, self).exec_()
 
-        layout = QVBoxLayout()
-        label = QLabel("Marketplace Coming Soon!")
-        label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(label)
+    # ======================================================
+    # EXTENSIONS
+    # ======================================================
+    # Events that fired are remembered, so extensions installed later (or a
+    # restarted host) catch up on the languages already opened
+    def fire_extension_event(self, event):
+        if event not in self.extension_events:
+            self.extension_events.append(event)
+        for name, manifest in self.extensions.items():
+            events = manifest["activationEvents"]
+            if name in self.extension_times or name in self.extension_errors:
+                continue
+            if event in events or "*" in events:
+                self.activate_extension(manifest)
 
-        close = QPushButton("Close")
-        close.clicked.connect(dlg.accept)
-        layout.addWidget(close)
+    def ensure_extension_host(self):
+        if self.extension_host is None and self.extension_restarts <= EXTENSION_HOST_RESTARTS:
+            host = ExtensionHost(self)
+            host.ready.connect(self.extension_host_ready)
+            host.activated.connect(self.extension_activated)
+            host.message.connect(self.extension_message)
+            host.result.connect(self.extension_result)
+            host.log.connect(self.write_extension_log)
+            host.stopped.connect(self.extension_host_stopped)
+            self.extension_host = host
+        return self.extension_host
+
+    def activate_extension(self, manifest):
+        host = self.ensure_extension_host()
+        if host is None:
+            return
+        self.extension_times[manifest["name"]] = None
+        host.send({"type": "activate", "name": manifest["name"], "path": manifest["path"], "main": manifest["main"]})
+
+    def extension_activation_text(self, name):
+        if name in self.extension_errors:
+            return "failed to activate"
+        if name not in self.extension_times:
+            return "not activated"
+        ms = self.extension_times[name]
+        return "activating..." if ms is None else f"activated in {ms:.1f} ms"
+
+    def extension_host_ready(self, ms):
+        if self.sender() is self.extension_host:
+            self.extension_host_ms = ms
+            self.write_extension_log(f"[Extension host started in {ms:.0f} ms]")
+
+    def extension_activated(self, name, ms, error):
+        if self.sender() is not self.extension_host:
+            return
+        self.extension_times[name] = ms
+        if error:
+            self.extension_errors[name] = error
+            self.write_extension_log(f"[{name} failed to activate]\n{error}")
+            self.show_message(f"Extension {name} failed to activate. See the Extensions log.")
+        else:
+            self.write_extension_log(f"[{name} activated in {ms:.1f} ms]")
+
+    def extension_message(self, name, text):
+        if self.sender() is self.extension_host:
+            self.show_message(f"{name}: {text}", True)
+
+    def run_extension_command(self, command):
+        self.fire_extension_event(f"onCommand:{command}")
+        host = self.ensure_extension_host()
+        if host is None:
+            self.show_message("Extensions are off: the extension host kept crashing.")
+            return
+        tab = self.current_tab()
+        loaded = tab is not None and tab.model is not None and not self.large_file_active()
+        args = {
+            "folder": getattr(self, "current_folder", None),
+            "path": tab.path if tab is not None else None,
+            "lang": self.lang_select.currentText(),
+            "text": self.code_editor.snapshot().text() if loaded else None,
+        }
+        self.extension_request_id += 1
+        request = self.extension_request_id
+        self.extension_requests[request] = command
+        host.send({"type": "command", "id": request, "command": command, "args": args})
+        QTimer.singleShot(EXTENSION_COMMAND_TIMEOUT * 1000, lambda: self.extension_command_timeout(host, request))
+
+    def extension_command_timeout(self, host, request):
+        if host is self.extension_host and request in self.extension_requests:
+            command = self.extension_requests.pop(request)
+            self.show_message(f"{command} did not finish in {EXTENSION_COMMAND_TIMEOUT}s. Restarting extensions.")
+            self.restart_extensions()
+
+    def extension_result(self, request, value, error):
+        if self.sender() is not self.extension_host:
+            return
+        command = self.extension_requests.pop(request, None)
+        if command is None:
+            return
+        if error:
+            self.write_extension_log(f"[{command} failed]\n{error}")
+            self.show_message(f"{command} failed: {error.strip().splitlines()[-1]}")
+        elif value:
+            self.show_message(value, True)
+
+    def extension_host_stopped(self, code):
+        if self.sender() is not self.extension_host:
+            return
+        self.extension_host = None
+        self.extension_restarts += 1
+        self.write_extension_log(f"[Extension host exited with code {code}]")
+        # Activations run in the order they were sent, so the first one still
+        # pending took the host down with it; it is not activated again
+        pending = [name for name, ms in self.extension_times.items() if ms is None]
+        if pending:
+            self.extension_errors[pending[0]] = f"The extension host exited with code {code} during activation"
+            self.write_extension_log(f"[{pending[0]} crashed the extension host and was disabled]")
+        self.extension_times = {}
+        self.extension_requests = {}
+        if self.extension_restarts > EXTENSION_HOST_RESTARTS:
+            self.show_message("The extension host keeps crashing; extensions are off until CE Studio restarts.")
+            return
+        for event in list(self.extension_events):
+            self.fire_extension_event(event)
 
-        dlg.setLayout(layout)
-        dlg.exec_()
+    def restart_extensions(self):
+        self.stop_extensions()
+        self.extensions = installed_extensions()
+        self.extension_restarts = 0
+        for event in list(self.extension_events):
+            self.fire_extension_event(event)
+
+    def stop_extensions(self):
+        host, self.extension_host = self.extension_host, None
+        self.extension_times = {}
+        self.extension_errors = {}
+        self.extension_requests = {}
+        if host is not None:
+            host.close()
+            host.deleteLater()
+
+    def write_extension_log(self, text):
+        if "editor" in self.screens:
+            self.extension_log.appendPlainText(text.rstrip("\n"))
+
+    def show_command_palette(self):
+        if not self.editor_open:
+            return
+        commands = {}
+        for manifest in self.extensions.values():
+            for entry in manifest["commands"]:
+                if isinstance(entry, dict) and entry.get("command"):
+                    commands[f"{entry.get('title') or entry['command']} ({manifest['name']})"] = entry["command"]
+        if not commands:
+            self.show_message("No installed extension adds a command.")
+            return
+        label, ok = QInputDialog.getItem(self, "Run Command", "Command:", sorted(commands), 0, False)
+        if ok:
+            self.run_extension_command(commands[label])
 
     # ======================================================
     # EDITOR UI
     # ======================================================
 
     def open_editor(self):
-        self.clear_layout()
+        created = self.show_screen("editor", self.build_editor_screen)
+        self.cancel_scans()
+        self.start_interpreter_pool()
+        self.editor_open = True
+        self.fire_extension_event("onStartup")
+
+        if created:
+            session = self.load_session()
+            if hasattr(self, "current_folder"):
+                snapshot = session.get("explorer") if session.get("folder") == self.current_folder else None
+                self.open_folder(self.current_folder, snapshot)
+            self.restore_buffers(session)
+        elif hasattr(self, "current_folder"):
+            # Back from the menu: the tree is still built, only re-check it
+            self.open_folder(self.current_folder, self.explorer_snapshot())
 
+    def build_editor_screen(self):
         main_splitter = QSplitter(Qt.Horizontal)
 
         # EXPLORER PANEL
@@ -262,9 +3813,16 @@ class CEStudioApp(QWidget):
         self.explorer = QTreeWidget()
         self.explorer.setHeaderLabels(["Name", "Type"])
         self.explorer.setColumnWidth(0, 200)
+        self.explorer.setUniformRowHeights(True)
+        self.explorer.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.explorer.itemDoubleClicked.connect(self.open_file_from_tree)  # <-- clickable
+        self.explorer.itemExpanded.connect(self.expand_folder_item)
         explorer_layout.addWidget(self.explorer)
 
+        self.scan_status = QLabel("")
+        self.scan_status.setStyleSheet("color: #aaa; font-size: 11px;")
+        explorer_layout.addWidget(self.scan_status)
+
         load_btn = QPushButton("Load Folder")
         load_btn.setStyleSheet(self.button_style())
         load_btn.clicked.connect(self.load_folder)
@@ -275,8 +3833,55 @@ class CEStudioApp(QWidget):
         add_file_btn.clicked.connect(self.add_file_to_folder)
         explorer_layout.addWidget(add_file_btn)
 
+        run_selected_btn = QPushButton("Run Selected")
+        run_selected_btn.setStyleSheet(self.button_style())
+        run_selected_btn.clicked.connect(self.run_selected_files)
+        explorer_layout.addWidget(run_selected_btn)
+
+        excludes_btn = QPushButton("Exclude Patterns")
+        excludes_btn.setStyleSheet(self.button_style(True))
+        excludes_btn.clicked.connect(self.edit_explorer_excludes)
+        explorer_layout.addWidget(excludes_btn)
+
         explorer_widget.setLayout(explorer_layout)
-        main_splitter.addWidget(explorer_widget)
+
+        # SEARCH PANEL
+        search_widget = QWidget()
+        search_layout = QVBoxLayout()
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search in files (@name for symbols)")
+        self.search_input.setStyleSheet(self.input_style())
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
+        self.search_input.returnPressed.connect(self.start_search)
+        search_layout.addWidget(self.search_input)
+
+        search_options = QHBoxLayout()
+        self.search_regex = QCheckBox("Regex")
+        self.search_regex.toggled.connect(self.start_search)
+        search_options.addWidget(self.search_regex)
+        self.search_case = QCheckBox("Match case")
+        self.search_case.toggled.connect(self.start_search)
+        search_options.addWidget(self.search_case)
+        search_layout.addLayout(search_options)
+
+        self.search_results = QTreeWidget()
+        self.search_results.setHeaderHidden(True)
+        self.search_results.setUniformRowHeights(True)
+        self.search_results.itemActivated.connect(self.open_search_result)
+        search_layout.addWidget(self.search_results)
+
+        self.search_status = QLabel("")
+        self.search_status.setStyleSheet("color: #aaa; font-size: 11px;")
+        self.search_status.setWordWrap(True)
+        search_layout.addWidget(self.search_status)
+
+        search_widget.setLayout(search_layout)
+
+        self.side_tabs = QTabWidget()
+        self.side_tabs.addTab(explorer_widget, "Explorer")
+        self.side_tabs.addTab(search_widget, "Search")
+        main_splitter.addWidget(self.side_tabs)
 
         # EDITOR + TERMINAL PANEL
         editor_splitter = QSplitter(Qt.Vertical)
@@ -296,37 +3901,120 @@ class CEStudioApp(QWidget):
         self.lang_select.setStyleSheet("padding: 5px; font-size: 14px;")
         editor_layout.addWidget(self.lang_select)
 
-        self.code_editor = QTextEdit()
+        self.code_editor = CodeEditor()
         self.code_editor.setStyleSheet("""
             background-color: #1e1e1e;
             color: #ffffff;
             font-family: Consolas, monospace;
             font-size: 14px;
         """)
-        editor_layout.addWidget(self.code_editor)
+        self.lang_select.currentTextChanged.connect(self.change_language)
+        self.large_viewer = LargeFileViewer()
+        self.editor_stack = QStackedWidget()
+        self.editor_stack.addWidget(self.code_editor)
+        self.editor_stack.addWidget(self.large_viewer)
+
+        self.tab_bar = QTabBar()
+        self.tab_bar.setTabsClosable(True)
+        self.tab_bar.setMovable(True)
+        self.tab_bar.setExpanding(False)
+        self.tab_bar.setDocumentMode(True)
+        self.tab_bar.currentChanged.connect(self.activate_tab)
+        self.tab_bar.tabCloseRequested.connect(self.close_tab)
+        self.active_tab = None
+        self.tab_clock = 0
+        editor_layout.addWidget(self.tab_bar)
+        editor_layout.addWidget(self.editor_stack)
 
         button_row = QHBoxLayout()
 
         run_btn = QPushButton("Run")
         run_btn.setStyleSheet(self.button_style())
-        run_btn.clicked.connect(self.run_code)
+        run_btn.clicked.connect(lambda: self.run_code())
         button_row.addWidget(run_btn)
 
+        profile_btn = QPushButton("Profile")
+        profile_btn.setStyleSheet(self.button_style())
+        profile_btn.clicked.connect(lambda: self.run_code(profile=True))
+        button_row.addWidget(profile_btn)
+
+        stop_btn = QPushButton("Stop")
+        stop_btn.setStyleSheet(self.button_style(True))
+        stop_btn.clicked.connect(self.stop_run)
+        button_row.addWidget(stop_btn)
+
         save_btn = QPushButton("Save")
         save_btn.setStyleSheet(self.button_style())
         save_btn.clicked.connect(self.save_code)
         button_row.addWidget(save_btn)
 
+        save_all_btn = QPushButton("Save All")
+        save_all_btn.setStyleSheet(self.button_style())
+        save_all_btn.clicked.connect(self.save_all)
+        button_row.addWidget(save_all_btn)
+
         load_btn = QPushButton("Load")
         load_btn.setStyleSheet(self.button_style())
         load_btn.clicked.connect(self.load_code)
         button_row.addWidget(load_btn)
 
+        self.reuse_results = QCheckBox("Reuse cached results")
+        self.reuse_results.setToolTip("Show the last successful run of identical code instead of running it again")
+        button_row.addWidget(self.reuse_results)
+
         editor_layout.addLayout(button_row)
 
+        status_row = QHBoxLayout()
+        self.diagnostics_status = QLabel("")
+        status_row.addWidget(self.diagnostics_status, 1)
+        self.save_status = QLabel("")
+        status_row.addWidget(self.save_status)
+        editor_layout.addLayout(status_row)
+        self.code_editor.cursorPositionChanged.connect(self.update_diagnostics_status)
+        self.add_tab(EditorTab(None, self.lang_select.currentText()))
+
         editor_widget.setLayout(editor_layout)
         editor_splitter.addWidget(editor_widget)
 
+        bottom_tabs = QTabWidget()
+
+        # OUTPUT SECTION
+        self.run_output = QPlainTextEdit()
+        self.run_output.setReadOnly(True)
+        self.run_output.setMaximumBlockCount(TERMINAL_MAX_BLOCKS)
+        self.run_output.setStyleSheet("""
+            background-color: #111;
+            color: white;
+            font-family: Consolas;
+            font-size: 12px;
+        """)
+        self.run_batcher = OutputBatcher(self.run_output)
+        bottom_tabs.addTab(self.run_output, "Output")
+
+        # HISTORY SECTION
+        history_splitter = QSplitter(Qt.Horizontal)
+        self.history_table = QTableWidget(0, 8)
+        self.history_table.setHorizontalHeaderLabels(
+            ["Time", "Language", "Mode", "Result", "Duration (s)", "CPU (s)", "Peak RSS (MB)", "Code"]
+        )
+        self.history_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.history_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.history_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.history_table.verticalHeader().setVisible(False)
+        self.history_table.setColumnWidth(0, 140)
+        self.history_table.itemSelectionChanged.connect(self.show_history_entry)
+        self.history_table.itemDoubleClicked.connect(self.open_history_profile)
+        history_splitter.addWidget(self.history_table)
+        self.history_output = QPlainTextEdit()
+        self.history_output.setReadOnly(True)
+        self.history_output.setStyleSheet("background-color: #111; font-family: Consolas; font-size: 12px;")
+        history_splitter.addWidget(self.history_output)
+        bottom_tabs.addTab(history_splitter, "History")
+        self.run_history = None
+        if self.current_user is not None:
+            self.run_history = RunHistory(os.path.join(self.session_dir(), HISTORY_FILE_NAME))
+            self.load_history()
+
         # TERMINAL SECTION
         terminal_widget = QWidget()
         terminal_layout = QVBoxLayout()
@@ -334,8 +4022,11 @@ class CEStudioApp(QWidget):
         self.terminal_label = QLabel("Terminal: No folder loaded")
         terminal_layout.addWidget(self.terminal_label)
 
-        self.terminal_output = QTextEdit()
+        self.terminal_output = QPlainTextEdit()
         self.terminal_output.setReadOnly(True)
+        self.terminal_output.setMaximumBlockCount(TERMINAL_MAX_BLOCKS)
+        self.terminal_output.installEventFilter(self)
+        self.terminal_batcher = OutputBatcher(self.terminal_output)
         self.terminal_output.setStyleSheet("""
             background-color: #111;
             color: #00ff00;
@@ -352,17 +4043,39 @@ class CEStudioApp(QWidget):
             padding: 5px;
         """)
         self.terminal_input.returnPressed.connect(self.run_terminal_command)
-        terminal_layout.addWidget(self.terminal_input)
+        self.terminal_input.installEventFilter(self)
+
+        terminal_row = QHBoxLayout()
+        terminal_row.addWidget(self.terminal_input)
+
+        interrupt_btn = QPushButton("Ctrl+C")
+        interrupt_btn.setStyleSheet(self.button_style(True))
+        interrupt_btn.clicked.connect(self.interrupt_terminal)
+        terminal_row.addWidget(interrupt_btn)
+
+        terminal_layout.addLayout(terminal_row)
 
         terminal_widget.setLayout(terminal_layout)
-        editor_splitter.addWidget(terminal_widget)
+        bottom_tabs.addTab(terminal_widget, "Terminal")
+
+        # EXTENSIONS LOG
+        self.extension_log = QPlainTextEdit()
+        self.extension_log.setReadOnly(True)
+        self.extension_log.setMaximumBlockCount(TERMINAL_MAX_BLOCKS)
+        self.extension_log.setStyleSheet("background-color: #111; font-family: Consolas; font-size: 12px;")
+        bottom_tabs.addTab(self.extension_log, "Extensions")
+        self.bottom_tabs = bottom_tabs
+
+        editor_splitter.addWidget(bottom_tabs)
 
         main_splitter.addWidget(editor_splitter)
 
         layout = QVBoxLayout()
         layout.addWidget(main_splitter)
 
-        self.setLayout(layout)
+        screen = QWidget()
+        screen.setLayout(layout)
+        return screen
 
     # ======================================================
     # EXPLORER FUNCTIONS
@@ -371,21 +4084,199 @@ class CEStudioApp(QWidget):
     def load_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Select Folder")
         if folder_path:
-            self.current_folder = folder_path
-            self.terminal_label.setText(f"Terminal: {folder_path}")
-            self.explorer.clear()
+            self.open_folder(folder_path)
+
+    def open_folder(self, folder_path, snapshot=None):
+        self.cancel_scans()
+        folder_path = os.path.normpath(folder_path)
+        if getattr(self, "current_folder", None) != folder_path:
+            self.close_terminal_session()
+            self.close_preview()
+        self.current_folder = folder_path
+        self.terminal_label.setText(f"Terminal: {folder_path}")
+        self.explorer.clear()
+        self.folder_items = {}
+        if snapshot and self.restore_explorer(folder_path, snapshot):
+            # Shown from the last session at once; every listed folder is
+            # then re-listed in the background and the tree patched in place
+            generation = self.scan_generation
+            QTimer.singleShot(SESSION_VALIDATE_MS, lambda: self.validate_explorer(generation))
+        else:
             self.add_folder_to_tree(folder_path, self.explorer.invisibleRootItem())
+        self.open_search_index(folder_path)
 
     def add_folder_to_tree(self, path, parent_item):
-        for item_name in os.listdir(path):
-            item_path = os.path.join(path, item_name)
-            if os.path.isdir(item_path):
-                folder_item = QTreeWidgetItem([item_name, "Folder"])
-                parent_item.addChild(folder_item)
-                self.add_folder_to_tree(item_path, folder_item)
-            else:
-                file_item = QTreeWidgetItem([item_name, os.path.splitext(item_name)[1]])
-                parent_item.addChild(file_item)
+        # Only one level is listed; sub folders are filled in when expanded.
+        # The listing itself runs on the scan pool and arrives in batches.
+        self.folder_items[path] = parent_item
+        self.watcher.addPath(path)
+        self.start_scan(path)
+
+    def start_scan(self, path):
+        scanner = FolderScanner(self.scan_generation, path, self.settings["explorer_excludes"])
+        scanner.signals.batch.connect(self.add_scan_batch)
+        scanner.signals.finished.connect(self.finish_scan)
+        self.active_scans[path] = scanner
+        self.scan_pool.start(scanner)
+        self.update_scan_status()
+
+    def make_explorer_item(self, name, is_dir):
+        if is_dir:
+            item = QTreeWidgetItem([name, "Folder"])
+            item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+        else:
+            item = QTreeWidgetItem([name, os.path.splitext(name)[1]])
+        return item
+
+    def add_scan_batch(self, generation, path, entries):
+        scanner = self.active_scans.get(path)
+        if scanner is not None and scanner.generation == generation:
+            scanner.batch_done()
+        parent_item = self.folder_items.get(path)
+        if generation != self.scan_generation or parent_item is None:
+            return
+        refresh = self.refresh_state.get(path)
+        if refresh is not None:
+            entries = self.merge_refresh_batch(path, refresh, entries)
+        items = [self.make_explorer_item(name, is_dir) for name, is_dir in entries]
+        parent_item.addChildren(items)
+        self.scanned_entries += len(items)
+        self.update_scan_status()
+
+    def finish_scan(self, generation, path, count):
+        if generation != self.scan_generation:
+            return
+        self.active_scans.pop(path, None)
+        parent_item = self.folder_items.get(path)
+        refresh = self.refresh_state.pop(path, None)
+        if parent_item is not None:
+            if refresh is not None:
+                for name, item in refresh["existing"].items():
+                    if name not in refresh["seen"]:
+                        self.remove_explorer_item(parent_item, item, os.path.join(path, name))
+            if count == 0:
+                parent_item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicatorWhenChildless)
+            elif count <= SCAN_SORT_LIMIT and (refresh is None or refresh["added"]):
+                # Batches arrive in directory order; put folders first once complete
+                children = parent_item.takeChildren()
+                children.sort(key=lambda c: (c.text(1) != "Folder", c.text(0).lower()))
+                parent_item.addChildren(children)
+        if path in self.pending_refresh:
+            self.refresh_timer.start()
+        self.update_scan_status()
+
+    def cancel_scans(self):
+        for scanner in self.active_scans.values():
+            scanner.cancel()
+        self.active_scans = {}
+        self.scan_generation += 1
+        self.scanned_entries = 0
+        self.refresh_state = {}
+        self.pending_refresh = set()
+        watched = self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+
+    # ======================================================
+    # EXPLORER WATCHING
+    # ======================================================
+
+    def validate_explorer(self, generation):
+        if generation == self.scan_generation:
+            self.pending_refresh.update(self.folder_items)
+            self.refresh_timer.start()
+
+    def queue_explorer_refresh(self, path):
+        path = os.path.normpath(path)
+        self.queue_index_update(path)
+        if path in self.folder_items:
+            self.pending_refresh.add(path)
+            self.refresh_timer.start()
+
+    def flush_explorer_refresh(self):
+        pending, self.pending_refresh = self.pending_refresh, set()
+        for path in pending:
+            parent_item = self.folder_items.get(path)
+            if parent_item is None:
+                continue
+            if path in self.active_scans:
+                # Picked up again once the running listing finishes
+                self.pending_refresh.add(path)
+                continue
+            existing = {}
+            for i in range(parent_item.childCount()):
+                child = parent_item.child(i)
+                existing[child.text(0)] = child
+            self.refresh_state[path] = {"existing": existing, "seen": set(), "added": False}
+            self.start_scan(path)
+
+    def merge_refresh_batch(self, path, refresh, entries):
+        new_entries = []
+        for name, is_dir in entries:
+            refresh["seen"].add(name)
+            item = refresh["existing"].get(name)
+            if item is not None:
+                if (item.text(1) == "Folder") == is_dir:
+                    continue
+                # Same name, different kind: replace the node
+                self.remove_explorer_item(self.folder_items[path], item, os.path.join(path, name))
+                del refresh["existing"][name]
+            new_entries.append((name, is_dir))
+        if new_entries:
+            refresh["added"] = True
+        return new_entries
+
+    def remove_explorer_item(self, parent_item, item, item_path):
+        parent_item.removeChild(item)
+        if item.text(1) != "Folder":
+            return
+        prefix = item_path + os.sep
+        removed = [p for p in self.folder_items if p == item_path or p.startswith(prefix)]
+        for p in removed:
+            del self.folder_items[p]
+            self.refresh_state.pop(p, None)
+        if removed:
+            self.watcher.removePaths(removed)
+
+    def update_scan_status(self):
+        if self.active_scans:
+            self.scan_status.setText(
+                f"Scanning {len(self.active_scans)} folder(s)... {self.scanned_entries:,} entries"
+            )
+        else:
+            self.scan_status.setText("")
+            self.scanned_entries = 0
+
+    def expand_folder_item(self, item):
+        if item.data(0, Qt.UserRole):
+            return
+        item.setData(0, Qt.UserRole, True)
+        self.add_folder_to_tree(self.get_full_path_from_item(item), item)
+
+    def edit_explorer_excludes(self):
+        current = ", ".join(self.settings["explorer_excludes"])
+        text, ok = QInputDialog.getText(self, "Exclude Patterns", "Glob patterns (comma separated):", text=current)
+        if not ok:
+            return
+        self.settings["explorer_excludes"] = [p.strip() for p in text.split(",") if p.strip()]
+        save_settings(self.settings)
+        if hasattr(self, "current_folder"):
+            self.open_folder(self.current_folder)
+
+    def run_selected_files(self):
+        if not hasattr(self, "current_folder"):
+            self.show_message("Load a folder first!")
+            return
+
+        paths = [self.get_full_path_from_item(item) for item in self.explorer.selectedItems()]
+        if not paths:
+            self.show_message("Select files or folders in the explorer first.")
+            return
+
+        matrix = RunMatrix(paths, self.settings, self.interpreter_pool)
+        dialog = RunMatrixDialog(self, matrix, self.current_folder)
+        dialog.show()
+        self.run_pool.start(matrix)
 
     def add_file_to_folder(self):
         if not hasattr(self, "current_folder"):
@@ -395,29 +4286,450 @@ class CEStudioApp(QWidget):
         file_name, ok = QInputDialog.getText(self, "Add File", "File name (with extension):")
         if ok and file_name:
             new_path = os.path.join(self.current_folder, file_name)
-            with open(new_path, "w", encoding="utf-8") as f:
-                f.write("")
-            self.load_folder()
+            if os.path.exists(new_path):
+                self.show_message("That file already exists!")
+                return
+            batch = {"paths": {new_path}, "count": 1, "bytes": 0, "errors": [],
+                     "start": time.perf_counter(), "notify": False}
+            self.queue_save(new_path, BufferSnapshot((), 0), batch=batch)
+
+    # ======================================================
+    # SAVING
+    # ======================================================
+    # One write per file is in flight at a time. Saves asked for meanwhile
+    # collapse into a single follow-up write of the latest text, so a burst
+    # of autosaves costs at most two writes.
+    def queue_save(self, path, snapshot=None, tab=None, batch=None):
+        batches = [batch] if batch is not None else []
+        current = self.saving.get(path)
+        if current is not None:
+            if tab is not None and current[0] is tab and current[1] == tab.model.version:
+                # The write in flight already has this text
+                current[2].extend(batches)
+                return
+            pending = self.pending_saves.get(path)
+            if pending is not None:
+                batches = pending[2] + batches
+            self.pending_saves[path] = (snapshot, tab, batches)
+            return
+        if tab is not None:
+            snapshot = tab.model.snapshot()
+        job = SaveJob(path, snapshot)
+        job.signals.saved.connect(self.save_finished)
+        self.saving[path] = (tab, tab.model.version if tab is not None else None, batches)
+        self.save_pool.start(job)
+
+    def save_finished(self, path, size, error):
+        if path not in self.saving:
+            return
+        tab, version, batches = self.saving.pop(path)
+        if not error and tab is not None and tab.model is not None and tab.path == path and \
+                tab.model.version == version:
+            tab.model.document.setModified(False)
+            tab.cache = None
+        for batch in batches:
+            batch["paths"].discard(path)
+            batch["bytes"] += size
+            if error:
+                batch["errors"].append(f"{path}: {error}")
+            if not batch["paths"]:
+                self.finish_save_batch(batch)
+        if error and not batches:
+            self.save_status.setText(f"Autosave failed: {os.path.basename(path)}: {error}")
+        self.schedule_preview()
+        self.queue_explorer_refresh(os.path.dirname(path))
+        pending = self.pending_saves.pop(path, None)
+        if pending is not None:
+            snapshot, tab, batches = pending
+            if tab is not None and tab.model is None:
+                # Unloaded meanwhile, which only happens once it was clean
+                for batch in batches:
+                    batch["paths"].discard(path)
+                    if not batch["paths"]:
+                        self.finish_save_batch(batch)
+                return
+            self.queue_save(path, snapshot, tab)
+            self.saving[path][2].extend(batches)
+
+    def start_save_batch(self, tabs, notify=False):
+        batch = {"paths": {tab.path for tab in tabs}, "count": len(tabs), "bytes": 0, "errors": [],
+                 "start": time.perf_counter(), "notify": notify}
+        for tab in tabs:
+            self.queue_save(tab.path, tab=tab, batch=batch)
+
+    def finish_save_batch(self, batch):
+        if batch["errors"]:
+            self.show_message("Failed to save:\n" + "\n".join(batch["errors"]))
+            return
+        elapsed = max(time.perf_counter() - batch["start"], 1e-6)
+        self.save_status.setText(
+            f"Saved {batch['count']} file(s), {format_size(batch['bytes'])} in {elapsed * 1000:.0f} ms "
+            f"({format_size(batch['bytes'] / elapsed)}/s)"
+        )
+        if batch["notify"]:
+            self.show_message("File saved!", True)
+
+    def save_all(self):
+        tabs = [tab for tab in self.all_tabs() if tab.dirty() and tab.path is not None and not tab.large
+                and self.load_tab(tab)]
+        untitled = sum(1 for tab in self.all_tabs() if tab.dirty() and tab.path is None)
+        if untitled:
+            self.show_message(f"{untitled} untitled tab(s) skipped; use Save on them first.")
+        if tabs:
+            self.start_save_batch(tabs)
+        elif not untitled:
+            self.save_status.setText("Nothing to save")
+
+    def schedule_autosave(self):
+        if self.settings["autosave_ms"] > 0:
+            self.autosave_timer.start(self.settings["autosave_ms"])
+
+    def autosave(self):
+        for tab in self.all_tabs():
+            if tab.model is not None and tab.path is not None and tab.dirty():
+                self.queue_save(tab.path, tab=tab)
+
+    # ======================================================
+    # DIAGNOSTICS
+    # ======================================================
+    def document_changed(self):
+        # Looked up from the sender rather than bound to the tab, so a
+        # document being torn down never hands back a closed tab
+        document = self.sender()
+        for tab in self.all_tabs():
+            if tab.model is not None and tab.model.document is document:
+                self.schedule_diagnostics(tab)
+                return
+
+    def schedule_diagnostics(self, tab):
+        job = self.diagnostics_jobs.pop(tab, None)
+        if job is not None:
+            job.cancel()
+        self.pending_diagnostics.add(tab)
+        self.diagnostics_timer.start()
+
+    def run_diagnostics(self):
+        pending, self.pending_diagnostics = self.pending_diagnostics, set()
+        for tab in pending:
+            if tab.model is None or self.tab_index(tab) < 0:
+                continue
+            if not can_check(tab.lang):
+                self.show_diagnostics(tab, [])
+                continue
+            snapshot = tab.model.snapshot()
+            digest = snapshot.digest()
+            cached = self.diagnostics_cache.get((tab.lang, digest))
+            if cached is not None:
+                self.show_diagnostics(tab, cached)
+                continue
+            job = DiagnosticsJob(tab, tab.lang, snapshot, digest)
+            job.signals.finished.connect(self.diagnostics_finished)
+            self.diagnostics_jobs[tab] = job
+            self.diagnostics_pool.start(job)
+
+    def diagnostics_finished(self, tab, lang, digest, diagnostics):
+        if diagnostics is None:
+            # The checker failed or timed out; nothing worth caching
+            diagnostics = []
+        else:
+            if len(self.diagnostics_cache) >= DIAGNOSTICS_CACHE_SIZE:
+                del self.diagnostics_cache[next(iter(self.diagnostics_cache))]
+            self.diagnostics_cache[(lang, digest)] = diagnostics
+        job = self.diagnostics_jobs.get(tab)
+        if job is not None and self.sender() is job.signals:
+            del self.diagnostics_jobs[tab]
+            self.show_diagnostics(tab, diagnostics)
+
+    def cancel_diagnostics(self):
+        for job in self.diagnostics_jobs.values():
+            job.cancel()
+        self.diagnostics_jobs = {}
+        self.pending_diagnostics = set()
+        self.diagnostics_timer.stop()
+
+    def show_diagnostics(self, tab, diagnostics):
+        tab.diagnostics = diagnostics
+        if tab is self.active_tab:
+            self.apply_diagnostics(tab)
+        if tab.path is not None:
+            self.mark_explorer_file(tab.path, diagnostics)
+
+    def apply_diagnostics(self, tab):
+        selections = []
+        document = tab.model.document if tab.model is not None else None
+        for line, column, severity, message in tab.diagnostics if document is not None else []:
+            block = document.findBlockByNumber(line - 1)
+            text = block.text()
+            if not block.isValid() or not text.strip():
+                continue
+            if column > 0:
+                # Underline the word the tool pointed at
+                start = min(column - 1, len(text) - 1)
+                match = WORD_PATTERN.match(text, start)
+                end = match.end() if match else start + 1
+            else:
+                start, end = len(text) - len(text.lstrip()), len(text)
+            selection = QTextEdit.ExtraSelection()
+            selection.cursor = QTextCursor(block)
+            selection.cursor.setPosition(block.position() + start)
+            selection.cursor.setPosition(block.position() + end, QTextCursor.KeepAnchor)
+            selection.format.setUnderlineStyle(QTextCharFormat.WaveUnderline)
+            selection.format.setUnderlineColor(QColor(DIAGNOSTIC_COLORS[severity]))
+            selections.append(selection)
+        self.code_editor.setExtraSelections(selections)
+        self.update_diagnostics_status()
+
+    def update_diagnostics_status(self):
+        tab = self.active_tab
+        if tab is None or tab.model is None or not tab.diagnostics:
+            self.diagnostics_status.setText("")
+            return
+        line = self.code_editor.textCursor().blockNumber() + 1
+        here = [d for d in tab.diagnostics if d[0] == line]
+        if here:
+            self.diagnostics_status.setText(f"Line {line}: {here[0][3]}")
+            return
+        errors = sum(1 for d in tab.diagnostics if d[2] == "error")
+        warnings = len(tab.diagnostics) - errors
+        self.diagnostics_status.setText(f"{errors} error(s), {warnings} warning(s)")
+
+    def mark_explorer_file(self, path, diagnostics):
+        parent = self.folder_items.get(os.path.dirname(path))
+        if parent is None:
+            return
+        name = os.path.basename(path)
+        severities = {d[2] for d in diagnostics}
+        severity = "error" if "error" in severities else "warning" if severities else None
+        for i in range(parent.childCount()):
+            item = parent.child(i)
+            if item.text(0) == name:
+                item.setData(0, Qt.ForegroundRole, QColor(DIAGNOSTIC_COLORS[severity]) if severity else None)
+                item.setToolTip(0, f"{len(diagnostics)} problem(s)" if diagnostics else "")
+                break
+
+    # ======================================================
+    # LIVE PREVIEW
+    # ======================================================
+    def preview_code(self, tab, lang):
+        root = getattr(self, "current_folder", None)
+        if self.preview_server is not None and self.preview_server.root != root:
+            self.close_preview()
+        if self.preview_server is None:
+            try:
+                self.preview_server = PreviewServer(root)
+            except OSError as e:
+                self.show_message(f"Could not start the preview server: {e}")
+                return
+        rel = self.preview_path(tab.path)
+        if rel is not None and lang == "HTML":
+            target, changed = rel, rel
+        elif rel is not None and self.preview_server.resolve("/") is not None:
+            # Stylesheets and scripts are shown through the folder's page
+            target, changed = "/", rel
+        else:
+            self.preview_scratch = (tab, lang, None)
+            target = PREVIEW_SCRATCH
+            changed = PREVIEW_SCRATCH + {"CSS": ".css", "JavaScript": ".js"}.get(lang, "")
+        self.refresh_preview()
+        url = self.preview_server.url(target)
+        if url in self.preview_opened and self.preview_server.has_clients():
+            self.preview_server.notify(changed)
+        else:
+            import webbrowser
+            self.preview_opened.add(url)
+            webbrowser.open(url)
+
+    def preview_path(self, path):
+        root = getattr(self, "current_folder", None)
+        if path is None or root is None or not path.startswith(root + os.sep):
+            return None
+        return "/" + os.path.relpath(path, root).replace(os.sep, "/")
+
+    def schedule_preview(self):
+        if self.preview_server is not None:
+            self.preview_timer.start()
+
+    def refresh_preview(self):
+        # Serve unsaved tabs from memory and tell open pages what changed;
+        # only tabs edited since the last refresh are encoded again
+        server = self.preview_server
+        if server is None:
+            return
+        published, self.preview_published = self.preview_published, {}
+        changed = []
+        for tab in self.all_tabs():
+            rel = self.preview_path(tab.path)
+            if rel is None or tab.model is None or not tab.dirty():
+                continue
+            version, data = published.pop(rel, (None, None))
+            if version != tab.model.version:
+                version, data = tab.model.version, tab.model.snapshot().text().encode("utf-8")
+                changed.append(rel)
+            self.preview_published[rel] = (version, data)
+        # Whatever is left was saved or closed; the file on disk is current
+        changed.extend(published)
+        server.set_overlays({rel: data for rel, (version, data) in self.preview_published.items()})
+        if self.preview_scratch is not None:
+            tab, lang, version = self.preview_scratch
+            if tab.model is not None and tab.model.version != version:
+                server.set_scratch(lang, tab.model.snapshot().text())
+                self.preview_scratch = (tab, lang, tab.model.version)
+                changed.append(PREVIEW_SCRATCH + {"CSS": ".css", "JavaScript": ".js"}.get(lang, ""))
+        for rel in changed:
+            server.notify(rel)
+
+    def close_preview(self):
+        if self.preview_server is not None:
+            self.preview_server.close()
+            self.preview_server = None
+        self.preview_timer.stop()
+        self.preview_published = {}
+        self.preview_scratch = None
+        self.preview_opened = set()
+
+    # ======================================================
+    # FIND IN FILES
+    # ======================================================
+    def open_search_index(self, folder_path):
+        if self.index_job is not None:
+            self.index_job.cancel()
+        self.pending_index = set()
+        self.path_index = None
+        self.search_index = SearchIndex(folder_path, self.settings["explorer_excludes"])
+        self.start_index_job()
+        self.start_search()
+
+    def start_index_job(self, folders=None):
+        job = IndexJob(self.search_index, folders)
+        job.signals.progress.connect(self.index_progress)
+        job.signals.finished.connect(self.index_finished)
+        job.signals.path_index.connect(self.set_path_index)
+        job.signals.paths_changed.connect(self.update_path_index)
+        self.index_job = job
+        self.search_pool.start(job)
+
+    def index_progress(self, message):
+        if self.index_job is not None and self.sender() is self.index_job.signals:
+            self.search_status.setText(message)
+
+    def index_finished(self, message):
+        if self.index_job is None or self.sender() is not self.index_job.signals:
+            return
+        full = self.index_job.folders is None
+        self.index_job = None
+        self.search_status.setText(message)
+        if self.pending_index:
+            self.index_timer.start()
+        if full and self.search_input.text():
+            self.start_search()
+
+    def set_path_index(self, path_index):
+        if self.index_job is not None and self.sender() is self.index_job.signals:
+            self.path_index = path_index
+
+    def update_path_index(self, added, removed):
+        if self.path_index is not None and self.index_job is not None and self.sender() is self.index_job.signals:
+            self.path_index = self.path_index.apply(added, removed)
+
+    def show_quick_open(self):
+        if self.search_index is None or not hasattr(self, "code_editor"):
+            self.show_message("Load a folder first!")
+            return
+        if self.path_index is None:
+            self.show_message("Still listing the folder, try again in a moment.")
+            return
+        QuickOpenDialog(self, self.path_index, self.open_quick_open_path).exec_()
+
+    def open_quick_open_path(self, path):
+        self.open_file(os.path.join(self.search_index.root, path))
+
+    def queue_index_update(self, path):
+        if self.search_index is not None:
+            self.pending_index.add(path)
+            self.index_timer.start()
+
+    def flush_index_update(self):
+        if self.index_job is not None:
+            # Picked up once the running update finishes
+            return
+        folders, self.pending_index = sorted(self.pending_index), set()
+        if folders:
+            self.start_index_job(folders)
+
+    def start_search(self):
+        self.search_timer.stop()
+        self.cancel_search()
+        self.search_results.clear()
+        self.search_file_items = {}
+        query = self.search_input.text()
+        if not query.strip() or query == "@":
+            self.search_status.clear()
+            return
+        if self.search_index is None:
+            self.search_status.setText("Load a folder to search it.")
+            return
+        job = SearchJob(self.search_generation, self.search_index, query,
+                        self.search_regex.isChecked(), self.search_case.isChecked())
+        job.signals.hits.connect(self.add_search_hits)
+        job.signals.finished.connect(self.search_finished)
+        self.search_job = job
+        self.search_status.setText("Searching...")
+        self.search_pool.start(job)
+
+    def cancel_search(self):
+        self.search_generation += 1
+        if self.search_job is not None:
+            self.search_job.cancel()
+            self.search_job = None
+
+    def add_search_hits(self, generation, hits):
+        if generation != self.search_generation:
+            return
+        self.search_results.setUpdatesEnabled(False)
+        for path, line, text, start, end in hits:
+            parent = self.search_file_items.get(path)
+            if parent is None:
+                parent = QTreeWidgetItem([path])
+                parent.setData(0, Qt.UserRole, (path, None, 0, 0))
+                self.search_results.addTopLevelItem(parent)
+                parent.setExpanded(True)
+                self.search_file_items[path] = parent
+            item = QTreeWidgetItem([f"{line}: {text.strip()}"])
+            item.setData(0, Qt.UserRole, (path, line, start, end))
+            item.setToolTip(0, text)
+            parent.addChild(item)
+        self.search_results.setUpdatesEnabled(True)
+
+    def search_finished(self, generation, message):
+        if generation == self.search_generation:
+            self.search_job = None
+            self.search_status.setText(message)
+
+    def open_search_result(self, item, column):
+        path, line, start, end = item.data(0, Qt.UserRole)
+        if line is None:
+            return
+        if self.open_file(os.path.join(self.search_index.root, path)) and \
+                self.editor_stack.currentWidget() is self.code_editor:
+            self.code_editor.goto_line(line, start, end)
 
     # ======================================================
     # CLICKABLE EXPLORER FUNCTIONS
     # ======================================================
     def open_file_from_tree(self, item, column):
         file_path = self.get_full_path_from_item(item)
-        if os.path.isfile(file_path):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                self.code_editor.setPlainText(content)
-                # Set language automatically
-                ext = os.path.splitext(file_path)[1]
-                for lang, lang_ext in LANGUAGE_EXTENSIONS.items():
-                    if lang_ext == ext:
-                        self.lang_select.setCurrentText(lang)
-                        break
-                self.show_message(f"Loaded {os.path.basename(file_path)}", True)
-            except Exception as e:
-                self.show_message(f"Failed to load file: {str(e)}")
+        if os.path.isfile(file_path) and self.open_file(file_path):
+            self.show_message(f"Loaded {os.path.basename(file_path)}", True)
+
+    def open_file(self, file_path):
+        return self.open_tab(file_path) is not None
+
+    def large_file_active(self):
+        tab = self.current_tab()
+        if tab is not None and tab.large:
+            self.show_message("Large files are opened read-only. Open a smaller file to run or save.")
+            return True
+        return False
 
     def get_full_path_from_item(self, item):
         parts = []
@@ -430,75 +4742,175 @@ class CEStudioApp(QWidget):
     # RUN / SAVE / LOAD CODE
     # ======================================================
 
-    def run_code(self):
-        code = self.code_editor.toPlainText()
+    def run_code(self, profile=False):
+        if self.large_file_active():
+            return
+        snapshot = self.code_editor.snapshot()
         lang = self.lang_select.currentText()
 
         if lang in WEB_LANGUAGES:
-            html_file = os.path.join(CESTUDIO_FOLDER, "temp_preview.html")
-            html = f"""
-<!DOCTYPE html>
-<html>
-<head><meta charset="UTF-8"></head>
-<body>
-{code if lang == "HTML" else ""}
-<script>{code if lang == "JavaScript" else ""}</script>
-</body>
-</html>
-"""
-            with open(html_file, "w", encoding="utf-8") as f:
-                f.write(html)
-            webbrowser.open(f"file://{html_file}")
+            self.preview_code(self.current_tab(), lang)
             return
 
-        if lang == "Python":
-            buffer = io.StringIO()
+        self.stop_run()
+        self.run_output.clear()
+        self.bottom_tabs.setCurrentWidget(self.run_output)
+
+        if not can_run(lang):
+            self.run_output.setPlainText(f"Running {lang} not supported yet.")
+            return
+        if profile and lang != "Python":
+            self.run_output.setPlainText(f"Profiling {lang} is not supported yet, only Python.")
+            return
+
+        digest = None
+        if self.reuse_results.isChecked() and self.run_history is not None:
+            import sqlite3
+            digest = snapshot.digest()
             try:
-                with contextlib.redirect_stdout(buffer), contextlib.redirect_stderr(buffer):
-                    exec(code, {})
-            except Exception:
-                buffer.write(traceback.format_exc())
-            out = buffer.getvalue()
-        else:
-            out = f"Running {lang} not supported yet."
+                entry = self.run_history.cached(lang, digest, "profile" if profile else "run")
+            except (OSError, sqlite3.Error):
+                entry = None
+            if entry is not None:
+                self.show_cached_run(entry)
+                return
 
-        dlg = QDialog(self)
-        dlg.setWindowTitle("Output")
-        layout = QVBoxLayout()
-        txt = QTextEdit()
-        txt.setReadOnly(True)
-        txt.setPlainText(out)
-        layout.addWidget(txt)
-        close = QPushButton("Close")
-        close.clicked.connect(dlg.accept)
-        layout.addWidget(close)
-        dlg.setLayout(layout)
-        dlg.resize(600, 400)
-        dlg.exec_()
+        runner = CodeRunner(
+            lang, snapshot, getattr(self, "current_folder", None), self.settings,
+            self.interpreter_pool, self.run_history, profile, digest
+        )
+        runner.signals.output.connect(self.write_run_output)
+        runner.signals.finished.connect(self.run_finished)
+        self.active_run = runner
+        self.run_pool.start(runner)
 
-    def save_code(self):
-        code = self.code_editor.toPlainText()
-        lang = self.lang_select.currentText()
-        ext = LANGUAGE_EXTENSIONS.get(lang, ".txt")
+    def write_run_output(self, text, is_err):
+        if self.active_run is not None and self.sender() is self.active_run.signals:
+            self.run_batcher.write(text)
+
+    def run_finished(self, stats):
+        if self.active_run is None or self.sender() is not self.active_run.signals:
+            return
+        self.active_run = None
+        if stats.get("history") is not None:
+            self.add_history_row(stats["history"])
+        self.run_batcher.write("\n" + format_run_stats(stats) + "\n")
+        if stats.get("profile") is not None:
+            self.show_profile(stats["profile"], "Profile")
 
-        file, _ = QFileDialog.getSaveFileName(self, "Save", "", f"*{ext}")
-        if file:
+    def stop_run(self):
+        if self.active_run is not None:
+            self.active_run.stop()
+
+    def start_interpreter_pool(self):
+        if self.interpreter_pool is None and self.settings["pool_size"] > 0 and InterpreterPool.supported():
+            self.interpreter_pool = InterpreterPool(self.settings)
+            self.interpreter_pool.start()
+
+    def save_code(self):
+        if self.large_file_active():
+            return
+        tab = self.current_tab()
+        if tab.path is None:
+            lang = self.lang_select.currentText()
+            ext = LANGUAGE_EXTENSIONS.get(lang, ".txt")
+            file, _ = QFileDialog.getSaveFileName(self, "Save", "", f"*{ext}")
+            if not file:
+                return
             if not file.endswith(ext):
                 file += ext
-            with open(file, "w", encoding="utf-8") as f:
-                f.write(code)
-            self.show_message("File saved!", True)
+            tab.path = os.path.normpath(file)
+            tab.lang = lang
+            self.update_tab_title(tab)
+        self.start_save_batch([tab], notify=True)
 
     def load_code(self):
         lang = self.lang_select.currentText()
         ext = LANGUAGE_EXTENSIONS.get(lang, "*")
 
         file, _ = QFileDialog.getOpenFileName(self, "Load", "", f"*{ext}")
-        if file:
-            with open(file, "r", encoding="utf-8") as f:
-                self.code_editor.setPlainText(f.read())
+        if file and self.open_file(file):
             self.show_message("File loaded!", True)
 
+    # ======================================================
+    # RUN HISTORY
+    # ======================================================
+    # Only the summary columns are loaded into the table; the output and
+    # profile of a run are read back when its row is selected
+    def load_history(self):
+        import sqlite3
+        try:
+            entries = self.run_history.recent()
+        except (OSError, sqlite3.Error) as e:
+            self.history_output.setPlainText(f"Failed to read the run history: {e}")
+            return
+        for entry in reversed(entries):
+            self.add_history_row(entry)
+
+    def add_history_row(self, entry):
+        when = QTableWidgetItem(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["started"])))
+        when.setData(Qt.UserRole, entry["id"])
+        values = [
+            entry["lang"], entry["mode"], entry["status"],
+            None if entry["wall_time"] is None else round(entry["wall_time"], 3),
+            None if entry["cpu_time"] is None else round(entry["cpu_time"], 3),
+            None if entry["peak_rss"] is None else round(entry["peak_rss"] / (1024 * 1024), 1),
+            entry["digest"][:12],
+        ]
+        self.history_table.setSortingEnabled(False)
+        self.history_table.insertRow(0)
+        self.history_table.setItem(0, 0, when)
+        for column, value in enumerate(values, 1):
+            item = QTableWidgetItem()
+            item.setData(Qt.DisplayRole, "-" if value is None else value)
+            self.history_table.setItem(0, column, item)
+        while self.history_table.rowCount() > HISTORY_SHOWN:
+            self.history_table.removeRow(self.history_table.rowCount() - 1)
+        self.history_table.setSortingEnabled(True)
+
+    def selected_history_entry(self):
+        import sqlite3
+        rows = self.history_table.selectionModel().selectedRows()
+        if not rows or self.run_history is None:
+            return None
+        try:
+            return self.run_history.get(self.history_table.item(rows[0].row(), 0).data(Qt.UserRole))
+        except (OSError, sqlite3.Error) as e:
+            self.history_output.setPlainText(f"Failed to read the run history: {e}")
+            return None
+
+    def show_history_entry(self):
+        entry = self.selected_history_entry()
+        if entry is None:
+            return
+        text = entry["output"]
+        if entry["truncated"]:
+            text += f"\n[Output truncated to {HISTORY_OUTPUT_LIMIT // 1024} KB]"
+        if entry["status"] != "error":
+            text += "\n" + format_run_stats(entry_stats(entry))
+        if entry["profile"]:
+            text += "\n[Double-click to open the profile]"
+        self.history_output.setPlainText(text)
+
+    def open_history_profile(self, item):
+        entry = self.selected_history_entry()
+        if entry is not None and entry["profile"]:
+            self.show_profile(entry["profile"], f"Profile from {self.history_table.item(item.row(), 0).text()}")
+
+    def show_cached_run(self, entry):
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["started"]))
+        self.run_output.setPlainText(entry["output"])
+        self.run_output.appendPlainText(f"[Cached result from {when}] " + format_run_stats(entry_stats(entry)))
+        if entry["profile"]:
+            self.show_profile(entry["profile"], f"Profile from {when}")
+
+    def show_profile(self, profile, title):
+        if profile_tree(profile).spent <= 0:
+            self.show_message(f"{title}: no samples, the program used no measurable CPU time.")
+            return
+        dialog = ProfileDialog(self, profile, title)
+        dialog.show()
+
     # ======================================================
     # TERMINAL
     # ======================================================
@@ -508,22 +4920,83 @@ class CEStudioApp(QWidget):
             self.show_message("Load a folder first!")
             return
 
-        cmd = self.terminal_input.text().strip()
-        if not cmd:
+        # Everything typed goes to the shell's stdin, including empty lines
+        # for programs that are waiting on input
+        cmd = self.terminal_input.text()
+
+        if self.terminal_session is None:
+            try:
+                self.start_terminal_session()
+            except Exception as e:
+                self.terminal_batcher.write(f"{e}\n")
+                return
+
+        if not self.terminal_session.echoes:
+            self.terminal_batcher.write(f"> {cmd}\n")
+        self.terminal_session.write(cmd + "\n")
+
+        self.terminal_input.clear()
+
+    def start_terminal_session(self):
+        session = TerminalSession(self.current_folder, self)
+        session.output.connect(self.write_terminal)
+        session.exited.connect(self.terminal_session_exited)
+        session.start()
+        self.terminal_session = session
+
+    def write_terminal(self, text):
+        if self.sender() is self.terminal_session:
+            self.terminal_batcher.write(text)
+
+    def terminal_session_exited(self, code):
+        if self.sender() is not self.terminal_session:
             return
+        self.terminal_batcher.write(f"\n[Shell exited with code {code}]\n")
+        self.terminal_session = None
 
-        self.terminal_output.append(f"> {cmd}")
+    def interrupt_terminal(self):
+        if self.terminal_session is not None:
+            self.terminal_session.interrupt()
 
-        try:
-            result = subprocess.run(
-                cmd, shell=True, cwd=self.current_folder,
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    def close_terminal_session(self):
+        if self.terminal_session is not None:
+            self.terminal_session.close()
+            self.terminal_session = None
+
+    def eventFilter(self, obj, event):
+        # Ctrl+C with nothing selected interrupts the running command
+        if (
+            event.type() == QEvent.KeyPress
+            and event.key() == Qt.Key_C
+            and event.modifiers() == Qt.ControlModifier
+            and obj in (self.terminal_input, self.terminal_output)
+        ):
+            has_selection = (
+                obj.hasSelectedText() if obj is self.terminal_input
+                else obj.textCursor().hasSelection()
             )
-            self.terminal_output.append(result.stdout + result.stderr)
-        except Exception as e:
-            self.terminal_output.append(str(e))
+            if not has_selection:
+                self.interrupt_terminal()
+                return True
+        return super().eventFilter(obj, event)
 
-        self.terminal_input.clear()
+    def closeEvent(self, event):
+        if self.editor_open:
+            self.save_session()
+        self.stop_run()
+        self.close_terminal_session()
+        self.save_pool.waitForDone()
+        self.close_preview()
+        self.cancel_diagnostics()
+        self.stop_extensions()
+        if hasattr(self, "large_viewer"):
+            self.large_viewer.close_file()
+        if self.index_job is not None:
+            self.index_job.cancel()
+        self.cancel_search()
+        if self.interpreter_pool is not None:
+            self.interpreter_pool.close()
+        super().closeEvent(event)
 
     # ======================================================
     # LOGOUT
@@ -532,6 +5005,38 @@ class CEStudioApp(QWidget):
         if os.path.exists(CURRENT_USER_FILE):
             os.remove(CURRENT_USER_FILE)
         self.init_login_screen()
+        self.close_editor_screen()
+        self.current_user = None
+        if hasattr(self, "current_folder"):
+            del self.current_folder
+
+    def close_editor_screen(self):
+        # The next user starts from a freshly built editor
+        if "editor" not in self.screens:
+            return
+        self.close_terminal_session()
+        self.large_viewer.close_file()
+        self.cancel_scans()
+        if self.index_job is not None:
+            self.index_job.cancel()
+            self.index_job = None
+        self.cancel_search()
+        self.index_timer.stop()
+        self.search_timer.stop()
+        self.search_index = None
+        self.path_index = None
+        self.pending_index = set()
+        self.autosave_timer.stop()
+        self.close_preview()
+        self.cancel_diagnostics()
+        self.stop_extensions()
+        self.extension_events = []
+        self.stop_run()
+        self.active_run = None
+        self.save_pool.waitForDone()
+        self.saving = {}
+        self.pending_saves = {}
+        self.discard_screen("editor")
 
     # ======================================================
     # UTILS
@@ -584,16 +5089,40 @@ class CEStudioApp(QWidget):
         msg.setIcon(QMessageBox.Information if success else QMessageBox.Warning)
         msg.exec_()
 
-    def clear_layout(self):
-        if self.layout() is not None:
-            QWidget().setLayout(self.layout())
+    def show_screen(self, name, build):
+        if self.editor_open:
+            self.save_session()
+            self.editor_open = False
+        screen = self.screens.get(name)
+        created = screen is None
+        if created:
+            screen = build()
+            self.screens[name] = screen
+            self.stack.addWidget(screen)
+        self.stack.setCurrentWidget(screen)
+        return created
+
+    def discard_screen(self, name):
+        screen = self.screens.pop(name, None)
+        if screen is not None:
+            self.stack.removeWidget(screen)
+            screen.deleteLater()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if STARTUP_PROFILE.pending:
+            STARTUP_PROFILE.mark("first paint")
+            STARTUP_PROFILE.report()
 
 
 # ======================================================
 # RUN APP
 # ======================================================
 if __name__ == "__main__":
+    STARTUP_PROFILE.mark("imports")
     app = QApplication(sys.argv)
+    STARTUP_PROFILE.mark("qapplication")
     window = CEStudioApp()
     window.show()
+    STARTUP_PROFILE.mark("show")
     sys.exit(app.exec_())
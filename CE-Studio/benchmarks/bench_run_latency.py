@@ -0,0 +1,79 @@
+# Compares Run latency of a cold interpreter start against the warm pool.
+#
+#   python benchmarks/bench_run_latency.py --runs 30 --preload numpy
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import cestudio as app
+
+
+def measure(label, run_once, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        stats = run_once()
+        times.append(time.perf_counter() - start)
+        if stats["exit_code"] != 0:
+            sys.exit(f"{label} run failed with exit code {stats['exit_code']}")
+    times.sort()
+    median = statistics.median(times) * 1000
+    p90 = times[int(len(times) * 0.9) - 1] * 1000
+    print(f"{label:<5} median {median:7.1f} ms   p90 {p90:7.1f} ms   min {times[0] * 1000:7.1f} ms")
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--preload", nargs="*", default=[], help="modules the warm workers import up front")
+    args = parser.parse_args()
+
+    if not app.InterpreterPool.supported():
+        sys.exit("The warm interpreter pool needs a POSIX system.")
+
+    settings = app.load_settings()
+    settings["pool_size"] = 1
+    settings["pool_preload"] = args.preload
+    settings["pool_max_runs"] = args.runs + 10
+    limits = app.run_limits(settings)
+
+    work_dir = tempfile.mkdtemp()
+    pool = None
+    try:
+        source = os.path.join(work_dir, "main.py")
+        with open(source, "w", encoding="utf-8") as f:
+            for name in args.preload:
+                f.write(f"import {name}\n")
+            f.write("print('hello')\n")
+
+        cold = measure("cold", lambda: app.run_python_file(source, work_dir, limits, None), args.runs)
+
+        pool = app.InterpreterPool(settings)
+        pool.start()
+
+        def warm_run():
+            worker = pool.acquire()
+            try:
+                return worker.run(source, work_dir, limits, None)
+            finally:
+                pool.release(worker)
+
+        warm_run()  # wait for the worker to finish its imports
+        warm = measure("warm", warm_run, args.runs)
+    finally:
+        if pool is not None:
+            pool.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"speedup {cold / warm:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
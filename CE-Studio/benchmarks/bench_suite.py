@@ -0,0 +1,399 @@
+# Performance regression suite for the editor's hot paths. Every benchmark
+# runs offscreen in its own process, so each one gets a clean heap and its
+# own peak RSS. Results go to JSON; with --baseline, any metric that got
+# worse by more than --tolerance fails the run with exit code 1.
+#
+#   python benchmarks/bench_suite.py --output results.json
+#   python benchmarks/bench_suite.py --baseline results.json --only file_open run
+#
+# The synthetic folders are built once and kept under the temp folder; the
+# 1M file folder takes a while to create the first time.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(HERE, "..")
+APP_FILE = os.path.join(APP_DIR, "CE Studio.py")
+TREE_FOLDER = os.path.join(tempfile.gettempdir(), "cestudio-bench-trees")
+
+BENCHMARKS = ["folder_load", "file_open", "terminal", "run", "startup"]
+TREE_SIZES = [1000, 100000, 1000000]
+FILE_SIZES_KB = [100, 1024, 4096, 65536]
+TERMINAL_MB = 10
+CHILD_TIMEOUT = 600
+
+# Differences below these are noise, whatever the percentage
+MIN_DELTA = {"ms": 2.0, "mb": 5.0, "mb_s": 1.0}
+
+
+# ======================================================
+# RUNS IN THE BENCHMARK PROCESS
+# ======================================================
+def load_app():
+    import importlib.util
+    sys.path.insert(0, APP_DIR)
+    spec = importlib.util.spec_from_file_location("ce_studio", APP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    from PyQt5.QtWidgets import QApplication
+    qt_app = QApplication.instance() or QApplication([])
+    module.CEStudioApp.show_message = lambda self, text, success=False: None
+    return module, qt_app
+
+
+def close_window(qt_app, window):
+    # Torn down while the QApplication still exists; leaving the window to
+    # interpreter exit destroys Qt objects in any order and can segfault
+    window.close()
+    qt_app.processEvents()
+
+
+def wait_until(qt_app, condition, timeout=120):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark timed out")
+        qt_app.processEvents()
+        time.sleep(0.0005)
+
+
+def bench_folder_load(root):
+    # The explorer lists one level at a time, expanding a folder included,
+    # so the tree is a single folder holding every entry
+    app, qt_app = load_app()
+    window = app.CEStudioApp()
+    window.open_editor()
+    window.current_folder = root
+    explorer = window.explorer.invisibleRootItem()
+
+    start = time.perf_counter()
+    window.add_folder_to_tree(root, explorer)
+    wait_until(qt_app, lambda: root not in window.active_scans)
+    load_ms = (time.perf_counter() - start) * 1000
+    if explorer.childCount() != len(os.listdir(root)):
+        raise RuntimeError(f"listed {explorer.childCount():,} of the folder's entries")
+    close_window(qt_app, window)
+    return {"load_ms": load_ms}
+
+
+def bench_file_open(path, runs):
+    app, qt_app = load_app()
+    window = app.CEStudioApp()
+    window.open_editor()
+    window.show()
+    qt_app.processEvents()
+
+    # Each open gets a fresh tab; an open tab would just be switched to
+    opens = []
+    large = False
+    for _ in range(runs):
+        start = time.perf_counter()
+        window.open_file(path)
+        qt_app.processEvents()
+        opens.append((time.perf_counter() - start) * 1000)
+        tab = window.current_tab()
+        large = tab.large
+        window.close_tab(window.tab_index(tab), force=True)
+        qt_app.processEvents()
+    metrics = {"open_ms": statistics.median(opens)}
+    if not large:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        sets = []
+        for _ in range(runs):
+            editor = app.CodeEditor()
+            start = time.perf_counter()
+            editor.setPlainText(text)
+            sets.append((time.perf_counter() - start) * 1000)
+            editor.deleteLater()
+            qt_app.processEvents()
+        metrics["set_plain_text_ms"] = statistics.median(sets)
+    close_window(qt_app, window)
+    return metrics
+
+
+def bench_terminal(folder):
+    app, qt_app = load_app()
+    window = app.CEStudioApp()
+    window.open_editor()
+    window.open_folder(folder)
+    lines = TERMINAL_MB * 1024 * 1024 // 100
+    with open(os.path.join(folder, "flood.py"), "w", encoding="utf-8") as f:
+        f.write("import sys\nsys.stdout.write(('x' * 99 + '\\n') * int(sys.argv[1]))\n")
+    # The shell computes the marker, so the echoed command line never matches
+    marker = "bench_42_done"
+    document = window.terminal_output.document()
+
+    def done():
+        block = document.lastBlock()
+        for _ in range(3):
+            if block.text().startswith(marker):
+                return True
+            block = block.previous()
+        return False
+
+    window.terminal_input.setText("echo ready")
+    window.run_terminal_command()
+    wait_until(qt_app, lambda: "ready" in document.lastBlock().previous().text() + document.lastBlock().text())
+
+    window.terminal_input.setText(f'"{sys.executable}" flood.py {lines}; echo bench_$((40+2))_done')
+    start = time.perf_counter()
+    window.run_terminal_command()
+    wait_until(qt_app, done)
+    seconds = time.perf_counter() - start
+    window.close_terminal_session()
+    close_window(qt_app, window)
+    return {"throughput_mb_s": TERMINAL_MB / seconds, "flood_ms": seconds * 1000}
+
+
+def bench_run(folder, runs):
+    app, qt_app = load_app()
+    window = app.CEStudioApp()
+    window.open_editor()
+    window.current_folder = folder
+    window.reuse_results.setChecked(False)
+    source = os.path.join(folder, "main.py")
+    with open(source, "w", encoding="utf-8") as f:
+        f.write("print('hello')\n")
+    window.open_file(source)
+    pool = window.interpreter_pool
+    if pool is not None:
+        wait_until(qt_app, lambda: pool.idle, timeout=30)
+
+    times = []
+    for _ in range(runs + 1):
+        start = time.perf_counter()
+        window.run_code()
+        wait_until(qt_app, lambda: window.active_run is None and "exit code" in window.run_output.toPlainText())
+        times.append((time.perf_counter() - start) * 1000)
+    times = sorted(times[1:])  # the first run waits for the worker's imports
+    close_window(qt_app, window)
+    return {"median_ms": statistics.median(times), "p90_ms": times[int(len(times) * 0.9) - 1]}
+
+
+def run_child(name, arg, runs):
+    if name == "folder_load":
+        metrics = bench_folder_load(arg)
+    elif name == "file_open":
+        metrics = bench_file_open(arg, runs)
+    elif name == "terminal":
+        metrics = bench_terminal(arg)
+    else:
+        metrics = bench_run(arg, runs)
+    print(json.dumps(metrics))
+
+
+# ======================================================
+# RUNS IN THE SUITE PROCESS
+# ======================================================
+def child_env(appdata):
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env["APPDATA"] = appdata
+    return env
+
+
+def wait_child(proc):
+    # wait4 also reports the child's peak RSS, even when it was killed
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        scale = 1 if sys.platform == "darwin" else 1024
+        return usage.ru_maxrss * scale / (1024 * 1024)
+    proc.wait()
+    return None
+
+
+def measure(name, arg, runs):
+    appdata = tempfile.mkdtemp(prefix="cestudio-bench-")
+    try:
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", name, arg, "--runs", str(runs)],
+                                stdout=subprocess.PIPE, env=child_env(appdata))
+        timer = threading.Timer(CHILD_TIMEOUT, proc.kill)
+        timer.start()
+        output = proc.stdout.read()
+        peak_rss = wait_child(proc)
+        timer.cancel()
+    finally:
+        shutil.rmtree(appdata, ignore_errors=True)
+    if proc.returncode != 0 or not output.strip():
+        raise RuntimeError(f"{name} {os.path.basename(arg)} failed with exit code {proc.returncode}")
+    metrics = json.loads(output.decode().strip().splitlines()[-1])
+    if peak_rss is not None:
+        metrics["peak_rss_mb"] = peak_rss
+    return metrics
+
+
+def read_startup_entry(log_file):
+    try:
+        with open(log_file, "r", encoding="utf-8") as f:
+            line = f.readline()
+    except OSError:
+        return None
+    return json.loads(line) if line.endswith("\n") else None
+
+
+def measure_startup(runs):
+    # Time from spawning the app to its first paint, as --profile-startup logs it
+    launches = []
+    totals = []
+    peaks = []
+    for _ in range(runs):
+        appdata = tempfile.mkdtemp(prefix="cestudio-bench-")
+        log_file = os.path.join(appdata, "CEStudio", "startup_profile.jsonl")
+        try:
+            start = time.perf_counter()
+            proc = subprocess.Popen([sys.executable, APP_FILE, "--profile-startup"], env=child_env(appdata),
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            deadline = start + 60
+            entry = None
+            while entry is None and proc.poll() is None and time.perf_counter() < deadline:
+                time.sleep(0.002)
+                entry = read_startup_entry(log_file)
+            launched = time.perf_counter() - start
+            proc.terminate()
+            peak_rss = wait_child(proc)
+            if entry is None:
+                raise RuntimeError("the app exited or hung before its first paint")
+        finally:
+            shutil.rmtree(appdata, ignore_errors=True)
+        launches.append(launched * 1000)
+        totals.append(entry["total_ms"])
+        if peak_rss is not None:
+            peaks.append(peak_rss)
+    metrics = {"launch_ms": statistics.median(launches), "first_paint_ms": statistics.median(totals)}
+    if peaks:
+        metrics["peak_rss_mb"] = max(peaks)
+    return metrics
+
+
+def make_tree(files):
+    # One flat folder of empty files; the marker sits next to it so it is
+    # not listed with them
+    root = os.path.join(TREE_FOLDER, f"flat{files}")
+    marker = root + ".complete"
+    if os.path.exists(marker):
+        return root
+    shutil.rmtree(root, ignore_errors=True)
+    print(f"creating a folder of {files:,} files in {root}...", file=sys.stderr)
+    os.makedirs(root)
+    for i in range(files):
+        open(os.path.join(root, f"file{i}.py"), "wb").close()
+    open(marker, "wb").close()
+    return root
+
+
+def make_source(folder, size_kb):
+    path = os.path.join(folder, f"source_{size_kb}kb.py")
+    # Written a chunk at a time: children inherit this process's peak RSS
+    chunk = "value = compute(alpha, beta) + 42  # benchmark line for the editor\n" * 1024
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(max(1, size_kb * 1024 // len(chunk))):
+            f.write(chunk)
+    return path
+
+
+def run_suite(args):
+    results = {}
+    work = tempfile.mkdtemp(prefix="cestudio-bench-")
+    try:
+        if "folder_load" in args.only:
+            for files in args.tree_sizes:
+                results[f"folder_load/{files}"] = measure("folder_load", make_tree(files), args.runs)
+                report(f"folder_load/{files}", results)
+        if "file_open" in args.only:
+            for size_kb in args.file_sizes:
+                results[f"file_open/{size_kb}kb"] = measure("file_open", make_source(work, size_kb), args.runs)
+                report(f"file_open/{size_kb}kb", results)
+        if "terminal" in args.only:
+            results["terminal"] = measure("terminal", work, args.runs)
+            report("terminal", results)
+        if "run" in args.only:
+            results["run"] = measure("run", work, args.runs)
+            report("run", results)
+        if "startup" in args.only:
+            results["startup"] = measure_startup(args.runs)
+            report("startup", results)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def report(name, results):
+    metrics = "   ".join(f"{key} {value:,.1f}" for key, value in results[name].items())
+    print(f"{name:<22} {metrics}", file=sys.stderr)
+
+
+def metric_unit(key):
+    for unit in ("mb_s", "ms", "mb"):
+        if key.endswith("_" + unit):
+            return unit
+    return None
+
+
+def compare(results, baseline, tolerance):
+    # Throughput has to stay up, everything else has to stay down
+    regressions = []
+    for name, metrics in results.items():
+        for key, value in metrics.items():
+            old = baseline.get(name, {}).get(key)
+            unit = metric_unit(key)
+            if old is None or unit is None:
+                continue
+            worse = old - value if unit == "mb_s" else value - old
+            if worse > MIN_DELTA[unit] and worse > abs(old) * tolerance:
+                change = f"{worse / abs(old):.0%} worse" if old else "was 0"
+                regressions.append(f"{name} {key}: {old:,.1f} -> {value:,.1f} ({change})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--tree-sizes", nargs="+", type=int, default=TREE_SIZES, help="files in each synthetic folder")
+    parser.add_argument("--file-sizes", nargs="+", type=int, default=FILE_SIZES_KB, help="opened file sizes in KB")
+    parser.add_argument("--runs", type=int, default=10, help="repeats for the file open, Run and startup benchmarks")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 is 25%%")
+    parser.add_argument("--child", nargs=2, metavar=("NAME", "ARG"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], args.runs)
+        return
+
+    results = run_suite(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "time": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }, f, indent=2)
+    print(f"results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} PERFORMANCE REGRESSION(S) against {args.baseline}:", file=sys.stderr)
+            for line in regressions:
+                print(f"  REGRESSION  {line}", file=sys.stderr)
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1600 @@
+# Everything in CE Studio that does not need Qt: settings, language tables,
+# folder listing, the runners, the search index and diagnostics.
+# "CE Studio.py" builds the GUI on top of this module, and running it
+# directly is the headless mode for grading scripts and CI:
+#
+#   python cestudio.py run tests/ --jobs 8 > results.jsonl
+#   python cestudio.py check src/
+#   python cestudio.py index ~/project
+#
+# Every result is one JSON object per line on stdout.
+
+import os
+import re
+import io
+import sys
+import json
+import time
+import codecs
+import fnmatch
+from array import array
+
+# ======================================================
+# PATHS
+# ======================================================
+APPDATA = os.getenv("APPDATA") or os.path.join(os.path.expanduser("~"), ".config")
+CESTUDIO_FOLDER = os.path.join(APPDATA, "CEStudio")
+USER_DIR = os.path.join(CESTUDIO_FOLDER, "Users")
+CURRENT_USER_FILE = os.path.join(CESTUDIO_FOLDER, "current_user.json")
+SESSION_FILE_NAME = "session.json"
+BUFFER_CACHE_NAME = "buffers"
+SETTINGS_FILE = os.path.join(CESTUDIO_FOLDER, "settings.json")
+RUN_FOLDER = os.path.join(CESTUDIO_FOLDER, "runs")
+BUILD_CACHE_FOLDER = os.path.join(CESTUDIO_FOLDER, "build_cache")
+INDEX_FOLDER = os.path.join(CESTUDIO_FOLDER, "index")
+STARTUP_LOG_FILE = os.path.join(CESTUDIO_FOLDER, "startup_profile.jsonl")
+
+# ======================================================
+# SETTINGS
+# ======================================================
+DEFAULT_SETTINGS = {
+    "explorer_excludes": [".git", "node_modules", "__pycache__", ".venv", "venv", "*.pyc", ".DS_Store"],
+    "run_timeout": 30,
+    "run_memory_mb": 1024,
+    "run_cpu_seconds": 60,
+    "pool_size": 2,
+    "pool_preload": [],
+    "pool_max_runs": 50,
+    "pool_max_rss_mb": 512,
+    "build_timeout": 120,
+    "build_cache_mb": 512,
+    "build_flags": {},
+    "large_file_mb": 8,
+    "tab_memory_mb": 256,
+    "autosave_ms": 1000,
+    "password_hash_ms": 250,
+    "extension_index": "",
+}
+
+
+def load_settings():
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+            settings.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return settings
+
+
+def save_settings(settings):
+    with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
+        json.dump(settings, f, indent=2)
+
+# ======================================================
+# LANGUAGE CONFIG
+# ======================================================
+LANGUAGE_EXTENSIONS = {
+    "Python": ".py",
+    "JavaScript": ".js",
+    "HTML": ".html",
+    "CSS": ".css",
+    "Java": ".java",
+    "C": ".c",
+    "C++": ".cpp",
+    "C#": ".cs",
+    "Go": ".go",
+    "Rust": ".rs",
+    "Kotlin": ".kt",
+    "Ruby": ".rb",
+    "PHP": ".php",
+    "TypeScript": ".ts",
+    "Scala": ".scala",
+    "Perl": ".pl",
+    "Lua": ".lua",
+}
+
+WEB_LANGUAGES = ["HTML", "CSS", "JavaScript"]
+EXTENSION_LANGUAGES = {ext: lang for lang, ext in LANGUAGE_EXTENSIONS.items()}
+
+# ======================================================
+# TOOLCHAINS
+# ======================================================
+# {source} is the source file, {out} the cached build folder, {name} the
+# program/class name and {exe} the platform's executable suffix.
+# limit_memory is off for runtimes that reserve far more address space
+# than they use (JVM, node), where RLIMIT_AS would stop them starting.
+TOOLCHAINS = {
+    "C": {
+        "compiler": "gcc", "flags": ["-O2"],
+        "build": ["gcc", "{flags}", "{source}", "-o", "{out}/main{exe}"],
+        "run": ["{out}/main{exe}"],
+    },
+    "C++": {
+        "compiler": "g++", "flags": ["-O2", "-std=c++17"],
+        "build": ["g++", "{flags}", "{source}", "-o", "{out}/main{exe}"],
+        "run": ["{out}/main{exe}"],
+    },
+    "Rust": {
+        "compiler": "rustc", "flags": ["-O"],
+        "build": ["rustc", "{flags}", "{source}", "-o", "{out}/main{exe}"],
+        "run": ["{out}/main{exe}"],
+    },
+    "Go": {
+        "compiler": "go", "flags": [], "version": ["go", "version"],
+        "build": ["go", "build", "{flags}", "-o", "{out}/main{exe}", "{source}"],
+        "run": ["{out}/main{exe}"],
+    },
+    "Java": {
+        "compiler": "javac", "flags": [], "version": ["javac", "-version"], "limit_memory": False,
+        "build": ["javac", "{flags}", "-d", "{out}", "{source}"],
+        "run": ["java", "-cp", "{out}", "{name}"],
+    },
+    "Kotlin": {
+        "compiler": "kotlinc", "flags": [], "version": ["kotlinc", "-version"], "limit_memory": False,
+        "build": ["kotlinc", "{flags}", "{source}", "-include-runtime", "-d", "{out}/main.jar"],
+        "run": ["java", "-jar", "{out}/main.jar"],
+    },
+    "Scala": {
+        "compiler": "scalac", "flags": [], "version": ["scalac", "-version"], "limit_memory": False,
+        "build": ["scalac", "{flags}", "-d", "{out}", "{source}"],
+        "run": ["scala", "-cp", "{out}", "{name}"],
+    },
+    "C#": {
+        "compiler": "mcs", "flags": [],
+        "build": ["mcs", "{flags}", "-out:{out}/main.exe", "{source}"],
+        "run": ["mono", "{out}/main.exe"],
+    },
+    "TypeScript": {
+        "compiler": "tsc", "flags": [], "limit_memory": False,
+        "build": ["tsc", "{flags}", "--outDir", "{out}", "{source}"],
+        "run": ["node", "{out}/{stem}.js"],
+    },
+}
+
+INTERPRETERS = {
+    "Ruby": ["ruby"],
+    "PHP": ["php"],
+    "Perl": ["perl"],
+    "Lua": ["lua"],
+}
+
+CLASS_NAME_PATTERNS = {
+    "Java": re.compile(r"public\s+(?:final\s+|abstract\s+)*class\s+(\w+)"),
+    "Scala": re.compile(r"object\s+(\w+)"),
+}
+
+# ======================================================
+# FOLDER LISTING
+# ======================================================
+def is_excluded(name, excludes):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in excludes)
+
+
+def iter_directory(path, excludes=()):
+    # os.scandir reuses the d_type from readdir, so no extra stat per entry
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if is_excluded(entry.name, excludes):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                yield entry.name, is_dir
+    except OSError:
+        return
+
+
+def list_directory(path, excludes=()):
+    entries = list(iter_directory(path, excludes))
+    entries.sort(key=lambda e: (not e[1], e[0].lower()))
+    return entries
+
+
+# ======================================================
+# CODE RUNNER
+# ======================================================
+# Runs in the child interpreter: applies the rlimits, then either runs the
+# user's file as __main__ (optionally under the sampling profiler) or runs a
+# native command under the same limits.
+# Peak RSS is reported from here because the ru_maxrss that wait4 returns
+# to the IDE still includes the IDE's own size from before the exec. A
+# native command inherits this interpreter's size the same way, so while it
+# runs its own VmHWM is read from /proc; elsewhere the figure includes the
+# ~10 MB of this launcher.
+PROFILE_INTERVAL = 0.001
+RUN_BOOTSTRAP = """
+import os, sys, json
+limits = json.loads(sys.argv[1])
+stats_file = sys.argv[2]
+try:
+    import resource
+    if limits.get("memory"):
+        resource.setrlimit(resource.RLIMIT_AS, (limits["memory"], limits["memory"]))
+    if limits.get("cpu"):
+        resource.setrlimit(resource.RLIMIT_CPU, (limits["cpu"], limits["cpu"] + 1))
+except (ImportError, ValueError, OSError):
+    pass
+maxrss_scale = 1 if sys.platform == "darwin" else 1024
+
+def report(peak_rss):
+    with open(stats_file, "w") as f:
+        json.dump({"peak_rss": peak_rss}, f)
+
+def read_peak(status_file):
+    try:
+        with open(status_file) as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+if sys.argv[3] == "--exec":
+    import subprocess, threading
+    child = subprocess.Popen(sys.argv[4:])
+    launcher_peak = read_peak("/proc/self/status")
+    sampled = []
+    exited = threading.Event()
+
+    def sample_peak():
+        # Stops at the zombie, which has no VmHWM, before the pid is reaped
+        while not exited.is_set():
+            peak = read_peak(f"/proc/{child.pid}/status")
+            if peak is None:
+                return
+            sampled.append(peak)
+            exited.wait(0.005)
+
+    sampler = threading.Thread(target=sample_peak, daemon=True)
+    sampler.start()
+    if hasattr(os, "wait4"):
+        if hasattr(os, "waitid"):
+            os.waitid(os.P_PID, child.pid, os.WEXITED | os.WNOWAIT)
+        exited.set()
+        sampler.join()
+        _, status, usage = os.wait4(child.pid, 0)
+        peak_rss = usage.ru_maxrss * maxrss_scale
+        if sampled and launcher_peak is not None and peak_rss <= launcher_peak:
+            # Never grew past the inherited size: only the samples are its own
+            peak_rss = sampled[-1]
+        report(peak_rss)
+        code = os.waitstatus_to_exitcode(status)
+    else:
+        code = child.wait()
+        report(None)
+    sys.exit(code if code >= 0 else 128 - code)
+
+import atexit, runpy
+
+def report_self():
+    peak_rss = read_peak("/proc/self/status")
+    if peak_rss is None and "resource" in globals():
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * maxrss_scale
+    report(peak_rss)
+
+atexit.register(report_self)
+
+if sys.argv[3] == "--profile":
+    # Sampling profiler: every interval of CPU time the main thread's stack
+    # is recorded, trimmed to start at the user's module. Each stack is
+    # credited with the CPU time used since the previous sample, since the
+    # timer can fire less often than asked for.
+    import signal, threading, time
+    profile_file = sys.argv[4]
+    interval = float(sys.argv[5])
+    del sys.argv[3:6]
+    source = sys.argv[3]
+    stacks = {}
+    last_sample = time.process_time()
+
+    def sample(frame):
+        global last_sample
+        now = time.process_time()
+        spent, last_sample = now - last_sample, now
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        for i, entry in enumerate(stack):
+            if entry[1] == source:
+                stack = tuple(stack[i:])
+                stacks[stack] = stacks.get(stack, 0) + spent
+                break
+
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGPROF, lambda signum, frame: sample(frame))
+        signal.setitimer(signal.ITIMER_PROF, interval, interval)
+
+        def stop_sampling():
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+    else:
+        main_thread = threading.main_thread().ident
+        stopped = threading.Event()
+
+        def sample_loop():
+            while not stopped.wait(interval):
+                frame = sys._current_frames().get(main_thread)
+                if frame is not None:
+                    sample(frame)
+
+        threading.Thread(target=sample_loop, daemon=True).start()
+        stop_sampling = stopped.set
+
+    def dump_profile():
+        stop_sampling()
+        with open(profile_file, "w") as f:
+            json.dump({"interval": interval, "stacks": [[stack, n] for stack, n in stacks.items()]}, f)
+
+    atexit.register(dump_profile)
+
+sys.argv = sys.argv[3:]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def python_executable():
+    # A frozen build's sys.executable is CE Studio itself
+    import shutil
+    if getattr(sys, "frozen", False):
+        return shutil.which("python3") or shutil.which("python") or "python"
+    return sys.executable
+
+
+def run_limits(settings):
+    return {
+        "memory": settings["run_memory_mb"] * 1024 * 1024,
+        "cpu": settings["run_cpu_seconds"],
+    }
+
+
+def kill_process_tree(proc):
+    import signal
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except OSError:
+        pass
+
+
+def pump_stream(stream, is_err, on_output):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        data = stream.read1(65536)
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text and on_output:
+            on_output(text, is_err)
+    stream.close()
+
+
+def wait_process(proc):
+    # wait4 gives per-child CPU time and peak RSS; Windows only gets wall time
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        scale = 1 if sys.platform == "darwin" else 1024
+        return usage.ru_utime + usage.ru_stime, usage.ru_maxrss * scale
+    proc.wait()
+    return None, None
+
+
+def run_process(argv, cwd=None, env=None, timeout=None, on_output=None, on_start=None):
+    import subprocess
+    import threading
+    start = time.perf_counter()
+    if os.name == "posix":
+        kwargs = {"start_new_session": True}
+    else:
+        kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    proc = subprocess.Popen(
+        argv, cwd=cwd, env=env, stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs
+    )
+    if on_start:
+        on_start(proc)
+    readers = [
+        threading.Thread(target=pump_stream, args=(proc.stdout, False, on_output), daemon=True),
+        threading.Thread(target=pump_stream, args=(proc.stderr, True, on_output), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    timed_out = threading.Event()
+    timer = None
+    if timeout:
+        def expire():
+            timed_out.set()
+            kill_process_tree(proc)
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+    cpu_time, peak_rss = wait_process(proc)
+    if timer:
+        timer.cancel()
+    for reader in readers:
+        reader.join()
+    return {
+        "exit_code": proc.returncode,
+        "wall_time": time.perf_counter() - start,
+        "cpu_time": cpu_time,
+        "peak_rss": peak_rss,
+        "timed_out": timed_out.is_set(),
+    }
+
+
+def run_bootstrapped(args, cwd, limits, timeout, env=None, on_output=None, on_start=None):
+    import tempfile
+    os.makedirs(RUN_FOLDER, exist_ok=True)
+    fd, stats_file = tempfile.mkstemp(dir=RUN_FOLDER, suffix=".json")
+    os.close(fd)
+    try:
+        argv = [python_executable(), "-c", RUN_BOOTSTRAP, json.dumps(limits), stats_file] + args
+        stats = run_process(argv, cwd=cwd, env=env, timeout=timeout, on_output=on_output, on_start=on_start)
+        stats["peak_rss"] = read_reported_peak(stats_file)
+    finally:
+        os.remove(stats_file)
+    return stats
+
+
+def run_python_file(source, cwd, limits, timeout, on_output=None, on_start=None, profile_file=None):
+    env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+    args = [source]
+    if profile_file:
+        args = ["--profile", profile_file, str(PROFILE_INTERVAL)] + args
+    return run_bootstrapped(args, cwd, limits, timeout, env, on_output, on_start)
+
+
+def run_limited(cmd, cwd, limits, timeout, on_output=None, on_start=None):
+    return run_bootstrapped(["--exec"] + cmd, cwd, limits, timeout, None, on_output, on_start)
+
+
+def read_reported_peak(stats_file):
+    try:
+        with open(stats_file, "r") as f:
+            return json.load(f).get("peak_rss")
+    except (OSError, ValueError):
+        return None
+
+
+def format_run_stats(stats):
+    if stats.get("error"):
+        return f"[{stats['error']}]"
+    parts = [f"Finished in {stats['wall_time']:.2f}s"]
+    if stats["cpu_time"] is not None:
+        parts.append(f"CPU {stats['cpu_time']:.2f}s")
+    if stats["peak_rss"] is not None:
+        peak = f"Peak RSS {stats['peak_rss'] / (1024 * 1024):.1f} MB"
+        if stats.get("shared_rss"):
+            peak += f" (incl. {stats['shared_rss'] / (1024 * 1024):.1f} MB shared with the warm worker)"
+        parts.append(peak)
+    if stats.get("build_failed"):
+        parts[0] = f"Build failed in {stats['wall_time']:.2f}s"
+    if stats["timed_out"]:
+        parts.append("killed: timed out")
+    elif stats.get("stopped"):
+        parts.append("stopped")
+    else:
+        parts.append(f"exit code {stats['exit_code']}")
+    return "[" + " | ".join(parts) + "]"
+
+
+# ======================================================
+# BUILD CACHE
+# ======================================================
+class ToolchainError(Exception):
+    pass
+
+
+compiler_versions = {}
+# Filled on the first build, so importing this module does not need
+# threading; setdefault is atomic, so every run thread gets the same lock
+build_cache_locks = {}
+
+
+def can_run(lang):
+    return lang == "Python" or lang in TOOLCHAINS or lang in INTERPRETERS
+
+
+def program_name(lang, code):
+    pattern = CLASS_NAME_PATTERNS.get(lang)
+    if pattern is not None:
+        match = pattern.search(code)
+        if match:
+            return match.group(1)
+    return "Main" if lang in CLASS_NAME_PATTERNS else "main"
+
+
+def compiler_version(toolchain):
+    import shutil
+    import subprocess
+    compiler = toolchain["compiler"]
+    if compiler not in compiler_versions:
+        if shutil.which(compiler) is None:
+            raise ToolchainError(f"{compiler} was not found. Install it and make sure it is on PATH.")
+        cmd = toolchain.get("version", [compiler, "--version"])
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        compiler_versions[compiler] = result.stdout.decode("utf-8", "replace").strip()
+    return compiler_versions[compiler]
+
+
+def expand_command(template, **values):
+    cmd = []
+    for part in template:
+        if part == "{flags}":
+            cmd.extend(values["flags"])
+        else:
+            cmd.append(part.format(**values))
+    return cmd
+
+
+def build_key(lang, source_bytes, flags, version, output_name=""):
+    import hashlib
+    digest = hashlib.sha256()
+    for part in (lang, json.dumps(flags), version, output_name):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(source_bytes)
+    return digest.hexdigest()
+
+
+def folder_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def evict_build_cache(budget):
+    # Least recently used first; an entry's mtime is bumped on every hit
+    import shutil
+    entries = []
+    total = 0
+    for entry in os.scandir(BUILD_CACHE_FOLDER):
+        try:
+            with open(os.path.join(entry.path, ".size"), "r") as f:
+                size = int(f.read())
+            used = entry.stat().st_mtime
+        except (OSError, ValueError):
+            continue
+        entries.append((used, size, entry.path))
+        total += size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= budget:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def build_cached(lang, source, name, work_dir, settings, on_output=None, on_start=None):
+    import shutil
+    import tempfile
+    import threading
+    toolchain = TOOLCHAINS[lang]
+    flags = settings["build_flags"].get(lang, toolchain["flags"])
+    with open(source, "rb") as f:
+        source_bytes = f.read()
+    values = {"source": source, "name": name, "flags": flags, "exe": ".exe" if os.name == "nt" else "",
+              "stem": os.path.splitext(os.path.basename(source))[0]}
+    # tsc names its output after the source file, so then the name is part of the key
+    output_name = values["stem"] if any("{stem}" in part for part in toolchain["run"]) else ""
+    key = build_key(lang, source_bytes, flags, compiler_version(toolchain), output_name)
+    out = os.path.join(BUILD_CACHE_FOLDER, key)
+    if os.path.isdir(out):
+        os.utime(out)
+        return expand_command(toolchain["run"], out=out, **values), None
+
+    # Build into a private folder and move it into place only on success
+    os.makedirs(BUILD_CACHE_FOLDER, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=BUILD_CACHE_FOLDER, prefix=".build-")
+    cmd = expand_command(toolchain["build"], out=staging, **values)
+    stats = run_process(
+        cmd, cwd=work_dir, timeout=settings["build_timeout"], on_output=on_output, on_start=on_start
+    )
+    stats["peak_rss"] = None
+    if stats["exit_code"] != 0:
+        shutil.rmtree(staging, ignore_errors=True)
+        return None, stats
+    with open(os.path.join(staging, ".size"), "w") as f:
+        f.write(str(folder_size(staging)))
+    try:
+        os.rename(staging, out)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)  # built concurrently by another run
+    with build_cache_locks.setdefault("evict", threading.Lock()):
+        evict_build_cache(settings["build_cache_mb"] * 1024 * 1024)
+    return expand_command(toolchain["run"], out=out, **values), stats
+
+
+# ======================================================
+# WARM INTERPRETER POOL
+# ======================================================
+# A warm worker imports the preload modules once, then forks a fresh child
+# for every run. The IDE hands over the child's stdout/stderr pipes with
+# SCM_RIGHTS, so output streams exactly like a cold run. POSIX only.
+# A forked child's peak RSS counts the pages it inherited from the worker,
+# preloaded modules included. The child reports its VmHWM as it exits, as
+# RUN_BOOTSTRAP does, and the RSS it started with as shared_rss, so the
+# stats can say how much of the peak the worker brought along.
+POOL_WORKER = """
+import os, sys, json, socket, select, traceback
+sock = socket.socket(fileno=int(sys.argv[1]))
+for name in json.loads(sys.argv[2]):
+    try:
+        __import__(name)
+    except Exception:
+        pass
+maxrss_scale = 1 if sys.platform == "darwin" else 1024
+
+def send(message):
+    sock.send(json.dumps(message).encode())
+
+def read_status(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def own_rss():
+    rss = read_status("VmRSS")
+    if rss is None:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * maxrss_scale
+    return rss
+
+def child_memory(peak_read):
+    # The child writes its RSS as it starts and its VmHWM as it exits;
+    # neither is there when /proc is missing or it was killed
+    values = []
+    if select.select([peak_read], [], [], 0)[0]:
+        values = [int(value) for value in os.read(peak_read, 64).split()]
+    return values + [None] * (2 - len(values))
+
+def run_child(request, fds, peak_write):
+    os.setsid()
+    shared_rss = read_status("VmRSS")
+    if shared_rss is not None:
+        os.write(peak_write, f"{shared_rss}\\n".encode())
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(fds[0], 1)
+    os.dup2(fds[1], 2)
+    for fd in fds + [devnull]:
+        os.close(fd)
+    sock.close()
+    import io, runpy, atexit, resource
+    limits = request["limits"]
+    if limits.get("memory"):
+        resource.setrlimit(resource.RLIMIT_AS, (limits["memory"], limits["memory"]))
+    if limits.get("cpu"):
+        resource.setrlimit(resource.RLIMIT_CPU, (limits["cpu"], limits["cpu"] + 1))
+    sys.stdout = io.TextIOWrapper(open(1, "wb", 0), encoding="utf-8", write_through=True)
+    sys.stderr = io.TextIOWrapper(open(2, "wb", 0), encoding="utf-8", write_through=True)
+    os.chdir(request["cwd"])
+    sys.argv = [request["path"]]
+    code = 0
+    try:
+        runpy.run_path(request["path"], run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    atexit._run_exitfuncs()
+    peak = read_status("VmHWM")
+    if peak is not None and shared_rss is not None:
+        os.write(peak_write, f"{peak}\\n".encode())
+    os._exit(code)
+
+while True:
+    ready, _, _ = select.select([sock, sys.stdin], [], [])
+    if sys.stdin in ready:
+        break  # the IDE went away
+    data, fds, _, _ = socket.recv_fds(sock, 65536, 2)
+    request = json.loads(data)
+    peak_read, peak_write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(peak_read)
+            run_child(request, fds, peak_write)
+        finally:
+            os._exit(1)
+    for fd in fds + [peak_write]:
+        os.close(fd)
+    send({"pid": pid})
+    _, status, usage = os.wait4(pid, 0)
+    shared_rss, peak_rss = child_memory(peak_read)
+    os.close(peak_read)
+    send({
+        "exit_code": os.waitstatus_to_exitcode(status),
+        "cpu_time": usage.ru_utime + usage.ru_stime,
+        "peak_rss": peak_rss or usage.ru_maxrss * maxrss_scale,
+        "shared_rss": shared_rss,
+        "worker_rss": own_rss(),
+    })
+"""
+
+
+class WorkerDied(Exception):
+    pass
+
+
+class ForkedChild:
+    # Enough of a Popen for kill_process_tree: the child leads its own session
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+
+
+class WarmWorker:
+    def __init__(self, preload):
+        import socket
+        import subprocess
+        self.sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.proc = subprocess.Popen(
+            [python_executable(), "-c", POOL_WORKER, str(child_sock.fileno()), json.dumps(preload)],
+            pass_fds=[child_sock.fileno()], stdin=subprocess.PIPE
+        )
+        child_sock.close()
+        self.runs = 0
+        self.rss = 0
+
+    def receive(self):
+        import select
+        while True:
+            ready, _, _ = select.select([self.sock], [], [], 0.5)
+            if ready:
+                return json.loads(self.sock.recv(65536))
+            if self.proc.poll() is not None:
+                raise WorkerDied()
+
+    def run(self, source, cwd, limits, timeout, on_output=None, on_start=None):
+        import socket
+        import threading
+        start = time.perf_counter()
+        out_read, out_write = os.pipe()
+        err_read, err_write = os.pipe()
+        try:
+            request = {"path": source, "cwd": cwd, "limits": limits}
+            socket.send_fds(self.sock, [json.dumps(request).encode()], [out_write, err_write])
+        except OSError:
+            for fd in (out_read, out_write, err_read, err_write):
+                os.close(fd)
+            raise WorkerDied()
+        os.close(out_write)
+        os.close(err_write)
+        readers = [
+            threading.Thread(target=pump_stream, args=(open(out_read, "rb"), False, on_output), daemon=True),
+            threading.Thread(target=pump_stream, args=(open(err_read, "rb"), True, on_output), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        child = ForkedChild(self.receive()["pid"])
+        if on_start:
+            on_start(child)
+        timed_out = threading.Event()
+        timer = None
+        if timeout:
+            def expire():
+                timed_out.set()
+                kill_process_tree(child)
+            timer = threading.Timer(timeout, expire)
+            timer.start()
+        try:
+            result = self.receive()
+        except WorkerDied:
+            kill_process_tree(child)
+            raise
+        finally:
+            if timer:
+                timer.cancel()
+        child.returncode = result["exit_code"]
+        for reader in readers:
+            reader.join()
+        self.runs += 1
+        self.rss = result["worker_rss"]
+        return {
+            "exit_code": result["exit_code"],
+            "wall_time": time.perf_counter() - start,
+            "cpu_time": result["cpu_time"],
+            "peak_rss": result["peak_rss"],
+            "shared_rss": result["shared_rss"],
+            "timed_out": timed_out.is_set(),
+        }
+
+    def close(self):
+        try:
+            self.proc.kill()
+            self.proc.wait()
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class InterpreterPool:
+    def __init__(self, settings):
+        import threading
+        self.size = settings["pool_size"]
+        self.preload = list(settings["pool_preload"])
+        self.max_runs = settings["pool_max_runs"]
+        self.max_rss = settings["pool_max_rss_mb"] * 1024 * 1024
+        self.lock = threading.Lock()
+        self.idle = []
+        self.closed = False
+
+    @staticmethod
+    def supported():
+        import socket
+        return os.name == "posix" and hasattr(socket, "send_fds")
+
+    def start(self):
+        for _ in range(self.size):
+            self.spawn()
+
+    def spawn(self):
+        try:
+            worker = WarmWorker(self.preload)
+        except OSError:
+            return
+        with self.lock:
+            if self.closed:
+                worker.close()
+            else:
+                self.idle.append(worker)
+
+    def acquire(self):
+        with self.lock:
+            return self.idle.pop() if self.idle else None
+
+    def release(self, worker, healthy=True):
+        # Recycle after N runs or once the worker itself has grown
+        if healthy and worker.runs < self.max_runs and worker.rss < self.max_rss:
+            with self.lock:
+                if not self.closed:
+                    self.idle.append(worker)
+                    return
+        worker.close()
+        if not self.closed:
+            self.spawn()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for worker in idle:
+            worker.close()
+
+
+# ======================================================
+# RUNNING SOURCE FILES
+# ======================================================
+def run_python(source, cwd, limits, timeout, pool=None, on_output=None, on_start=None):
+    worker = pool.acquire() if pool is not None else None
+    if worker is not None:
+        started = []
+
+        def start(proc):
+            started.append(proc)
+            if on_start:
+                on_start(proc)
+
+        try:
+            stats = worker.run(source, cwd, limits, timeout, on_output, start)
+        except WorkerDied:
+            pool.release(worker, healthy=False)
+            if started:
+                return {"error": "The interpreter worker died during the run"}
+        else:
+            pool.release(worker)
+            return stats
+    return run_python_file(source, cwd, limits, timeout, on_output, on_start)
+
+
+def run_native(cmd, lang, cwd, limits, timeout, on_output=None, on_start=None):
+    import shutil
+    if not os.path.isabs(cmd[0]) and shutil.which(cmd[0]) is None:
+        raise ToolchainError(f"{cmd[0]} was not found. Install it and make sure it is on PATH.")
+    if not TOOLCHAINS.get(lang, {}).get("limit_memory", True):
+        limits = dict(limits, memory=0)
+    return run_limited(cmd, cwd, limits, timeout, on_output, on_start)
+
+
+def run_source(lang, source, work_dir, cwd, settings, pool=None, on_output=None, on_start=None):
+    # work_dir is scratch space for builds; the program itself runs in cwd
+    limits = run_limits(settings)
+    timeout = settings["run_timeout"]
+    if lang == "Python":
+        return run_python(source, cwd, limits, timeout, pool, on_output, on_start)
+    if lang in INTERPRETERS:
+        return run_native(INTERPRETERS[lang] + [source], lang, cwd, limits, timeout, on_output, on_start)
+
+    with open(source, "r", encoding="utf-8", errors="replace") as f:
+        name = program_name(lang, f.read())
+    cmd, build_stats = build_cached(lang, source, name, work_dir, settings, on_output, on_start)
+    if cmd is None:
+        build_stats["build_failed"] = True
+        return build_stats
+    if on_output:
+        if build_stats is None:
+            on_output("[Using cached build]\n", False)
+        else:
+            on_output(f"[Built in {build_stats['wall_time']:.2f}s]\n", False)
+    return run_native(cmd, lang, cwd, limits, timeout, on_output, on_start)
+
+
+# ======================================================
+# RUN MATRIX
+# ======================================================
+MATRIX_OUTPUT_LIMIT = 64 * 1024
+
+
+def collect_source_files(paths, excludes, accept):
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs[:] = [d for d in dirs if not is_excluded(d, excludes)]
+                found.update(os.path.join(root, n) for n in names if not is_excluded(n, excludes))
+        else:
+            found.add(path)
+    files = []
+    for path in sorted(found):
+        lang = EXTENSION_LANGUAGES.get(os.path.splitext(path)[1])
+        if lang is not None and accept(lang):
+            files.append((path, lang))
+    return files
+
+
+def run_file(path, lang, settings, pool=None, on_start=None):
+    import shutil
+    import tempfile
+    chunks = []
+    size = 0
+
+    def collect(text, is_err):
+        nonlocal size
+        if size < MATRIX_OUTPUT_LIMIT:
+            chunks.append(text[:MATRIX_OUTPUT_LIMIT - size])
+            size += len(text)
+
+    os.makedirs(RUN_FOLDER, exist_ok=True)
+    work_dir = tempfile.mkdtemp(dir=RUN_FOLDER)
+    try:
+        stats = run_source(lang, path, work_dir, os.path.dirname(path), settings, pool, collect, on_start)
+    except ToolchainError as e:
+        stats = {"error": str(e)}
+    except Exception as e:
+        stats = {"error": f"Failed to run: {e}"}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = "".join(chunks)
+    if stats.get("error"):
+        output += stats["error"]
+    elif stats["timed_out"]:
+        output += "\n[killed: timed out]"
+    return {
+        "path": path,
+        "lang": lang,
+        "exit_code": stats.get("exit_code"),
+        "wall_time": stats.get("wall_time", 0.0),
+        "cpu_time": stats.get("cpu_time"),
+        "peak_rss": stats.get("peak_rss"),
+        "shared_rss": stats.get("shared_rss"),
+        "timed_out": stats.get("timed_out", False),
+        "passed": not stats.get("error") and not stats["timed_out"] and stats["exit_code"] == 0,
+        "output": output,
+    }
+
+
+# ======================================================
+# SEARCH INDEX
+# ======================================================
+# One SQLite file per project folder. Text files are split into lowercase
+# byte trigrams and each trigram's posting lists the ids of the files that
+# contain it, so a query only opens files holding all of its trigrams.
+# Files are re-read only when their mtime or size changed, and re-indexed
+# only when their content hash changed.
+INDEX_MAX_FILE_BYTES = 2 * 1024 * 1024
+INDEX_BATCH_FILES = 2000
+SEARCH_MAX_FILE_HITS = 100
+SEARCH_MAX_HITS = 5000
+SEARCH_BATCH_HITS = 200
+SEARCH_LINE_CHARS = 300
+SYMBOL_LIMIT = 200
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY, path TEXT UNIQUE, mtime REAL, size INTEGER,
+    digest TEXT, grams BLOB, binary INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_unindexed ON files (path) WHERE grams IS NULL;
+CREATE TABLE IF NOT EXISTS postings (gram BLOB PRIMARY KEY, ids BLOB) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS symbols (name TEXT COLLATE NOCASE, kind TEXT, file INTEGER, line INTEGER);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+CREATE INDEX IF NOT EXISTS symbols_file ON symbols (file);
+"""
+
+C_FUNCTION = r"^(?!\s)(?:[\w\*&:<>,]+[\s\*&]+)+()(\w+)\s*\([^;]*$"
+SYMBOL_PATTERNS = {
+    ".py": [r"^\s*(?:async\s+)?(def|class)\s+(\w+)"],
+    ".js": [r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?(function|class)\s*\*?\s*(\w+)",
+            r"^\s*(?:export\s+)?(const|let|var)\s+(\w+)\s*=\s*(?:async\s+)?(?:function|\([^)]*\)\s*=>|\w+\s*=>)"],
+    ".ts": [r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?(?:async\s+)?(function|class|interface|type|enum)\s*\*?\s*(\w+)"],
+    ".java": [r"^\s*(?:[\w@]+\s+)*(class|interface|enum|record)\s+(\w+)"],
+    ".c": [r"^\s*(?:typedef\s+)?(struct|enum|union)\s+(\w+)", C_FUNCTION],
+    ".cpp": [r"^\s*(?:template\s*<[^>]*>\s*)?(class|struct|enum|union|namespace)\s+(\w+)", C_FUNCTION],
+    ".cs": [r"^\s*(?:[\w]+\s+)*(class|interface|struct|enum|record)\s+(\w+)"],
+    ".go": [r"^(func)\s+(?:\([^)]*\)\s*)?(\w+)", r"^(type)\s+(\w+)"],
+    ".rs": [r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?(?:unsafe\s+)?(fn|struct|enum|trait|mod|type)\s+(\w+)"],
+    ".kt": [r"^\s*(?:[\w]+\s+)*(fun|class|interface|object)\s+(?:<[^>]*>\s*)?(?:\w+\.)?(\w+)"],
+    ".scala": [r"^\s*(?:[\w]+\s+)*(def|class|trait|object)\s+(\w+)"],
+    ".rb": [r"^\s*(def|class|module)\s+(?:self\.)?(\w+[?!]?)"],
+    ".php": [r"^\s*(?:[\w]+\s+)*(function|class|interface|trait)\s+&?(\w+)"],
+    ".pl": [r"^\s*(sub|package)\s+([\w:]+)"],
+    ".lua": [r"^\s*(?:local\s+)?(function)\s+([\w.:]+)"],
+}
+SYMBOL_PATTERNS[".h"] = SYMBOL_PATTERNS[".c"]
+SYMBOL_PATTERNS[".hpp"] = SYMBOL_PATTERNS[".cpp"]
+SYMBOL_PATTERNS = {ext: [re.compile(p, re.MULTILINE) for p in patterns] for ext, patterns in SYMBOL_PATTERNS.items()}
+
+
+def file_trigrams(data):
+    data = data.lower()
+    return {data[i:i + 3] for i in range(len(data) - 2)}
+
+
+def unpack_trigrams(blob):
+    return {blob[i:i + 3] for i in range(0, len(blob or b""), 3)}
+
+
+def file_symbols(path, text):
+    symbols = []
+    for pattern in SYMBOL_PATTERNS.get(os.path.splitext(path)[1].lower(), ()):
+        line = 1
+        last = 0
+        for match in pattern.finditer(text):
+            line += text.count("\n", last, match.start())
+            last = match.start()
+            symbols.append((match.group(2), match.group(1) or "function", line))
+    return symbols
+
+
+def required_literals(pattern, flags):
+    # Literal runs every match must contain. Anything that is not a plain
+    # literal (classes, alternations, optional parts) ends the current run.
+    try:
+        from re import _parser as sre_parse
+    except ImportError:  # Python < 3.11
+        import sre_parse
+    runs = []
+
+    def walk(items):
+        run = []
+        for op, arg in items:
+            if op is sre_parse.LITERAL:
+                run.append(chr(arg))
+                continue
+            runs.append("".join(run))
+            run = []
+            if op is sre_parse.SUBPATTERN:
+                walk(arg[-1])
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and arg[0] >= 1:
+                walk(arg[2])
+        runs.append("".join(run))
+
+    walk(sre_parse.parse(pattern, flags))
+    return [run for run in runs if len(run) >= 3]
+
+
+def query_trigrams(literals, match_case):
+    grams = set()
+    for literal in literals:
+        data = literal.encode("utf-8").lower()
+        for i in range(len(data) - 2):
+            gram = data[i:i + 3]
+            # Only ASCII is lowercased in the index, so other bytes can't be
+            # used when the case of the query doesn't matter
+            if match_case or gram.isascii():
+                grams.add(gram)
+    return grams
+
+
+class SearchIndex:
+    def __init__(self, root, excludes):
+        import hashlib
+        import threading
+        self.root = root
+        self.excludes = list(excludes)
+        name = hashlib.sha1(root.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(INDEX_FOLDER, name + ".sqlite")
+        self.write_lock = threading.Lock()
+
+    def connect(self):
+        import sqlite3
+        os.makedirs(INDEX_FOLDER, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(INDEX_SCHEMA)
+        return conn
+
+    def walk(self, top):
+        stack = [top]
+        while stack:
+            folder = stack.pop()
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if is_excluded(entry.name, self.excludes):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file():
+                                stat = entry.stat()
+                                yield os.path.relpath(entry.path, self.root), stat.st_mtime, stat.st_size
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def update(self, folders=None, cancelled=lambda: False, progress=None, on_paths=None):
+        if folders is None:
+            folders = [self.root]
+        prefixes = []
+        for folder in folders:
+            rel = os.path.relpath(folder, self.root)
+            if rel == os.curdir:
+                prefixes = [""]
+            elif rel != os.pardir and not rel.startswith(os.pardir + os.sep):
+                prefixes.append(rel + os.sep)
+        if not prefixes:
+            return 0, 0
+        with self.write_lock:
+            conn = self.connect()
+            try:
+                known = {}
+                for fid, path, mtime, size in conn.execute("SELECT id, path, mtime, size FROM files"):
+                    known[path] = (fid, mtime, size)
+                seen = set()
+                changed = []
+                for prefix in prefixes:
+                    for path, mtime, size in self.walk(os.path.join(self.root, prefix)):
+                        if cancelled():
+                            return 0, 0
+                        seen.add(path)
+                        old = known.get(path)
+                        if old is None or old[1] != mtime or old[2] != size:
+                            changed.append((path, mtime, size, old[0] if old else None))
+                removed = [
+                    path for path in known
+                    if path not in seen and any((path + os.sep).startswith(prefix) for prefix in prefixes)
+                ]
+                if on_paths is not None:
+                    if prefixes == [""]:
+                        on_paths(seen, None)
+                    else:
+                        on_paths([path for path in seen if path not in known], removed)
+                for start in range(0, len(changed), INDEX_BATCH_FILES):
+                    if cancelled():
+                        break
+                    self.index_batch(conn, changed[start:start + INDEX_BATCH_FILES])
+                    if progress is not None:
+                        progress(min(start + INDEX_BATCH_FILES, len(changed)), len(changed))
+                self.remove_files(conn, [known[path][0] for path in removed])
+                return len(changed), len(removed)
+            finally:
+                conn.close()
+
+    def index_batch(self, conn, batch):
+        import hashlib
+        adds = {}
+        removes = {}
+        for path, mtime, size, fid in batch:
+            try:
+                with open(os.path.join(self.root, path), "rb") as f:
+                    data = f.read(INDEX_MAX_FILE_BYTES + 1)
+            except OSError:
+                continue
+            digest = hashlib.sha1(data).hexdigest()
+            old_grams = set()
+            if fid is not None:
+                old_digest, old_blob = conn.execute("SELECT digest, grams FROM files WHERE id = ?", (fid,)).fetchone()
+                if old_digest == digest:
+                    conn.execute("UPDATE files SET mtime = ?, size = ? WHERE id = ?", (mtime, size, fid))
+                    continue
+                old_grams = unpack_trigrams(old_blob)
+            binary = b"\0" in data[:8192]
+            # Files over the size cap keep no trigrams and are always scanned
+            big = len(data) > INDEX_MAX_FILE_BYTES
+            grams = set() if binary or big else file_trigrams(data)
+            blob = None if big and not binary else b"".join(sorted(grams))
+            row = (mtime, size, digest, blob, int(binary))
+            if fid is None:
+                fid = conn.execute(
+                    "INSERT INTO files (mtime, size, digest, grams, binary, path) VALUES (?, ?, ?, ?, ?, ?)",
+                    row + (path,)
+                ).lastrowid
+            else:
+                conn.execute("UPDATE files SET mtime = ?, size = ?, digest = ?, grams = ?, binary = ? WHERE id = ?",
+                             row + (fid,))
+                conn.execute("DELETE FROM symbols WHERE file = ?", (fid,))
+            for gram in grams - old_grams:
+                adds.setdefault(gram, []).append(fid)
+            for gram in old_grams - grams:
+                removes.setdefault(gram, set()).add(fid)
+            if not binary:
+                symbols = file_symbols(path, data.decode("utf-8", errors="replace"))
+                conn.executemany("INSERT INTO symbols (name, kind, file, line) VALUES (?, ?, ?, ?)",
+                                 [(name, kind, fid, line) for name, kind, line in symbols])
+        self.write_postings(conn, adds, removes)
+        conn.commit()
+
+    def remove_files(self, conn, ids):
+        removes = {}
+        for fid in ids:
+            row = conn.execute("SELECT grams FROM files WHERE id = ?", (fid,)).fetchone()
+            for gram in unpack_trigrams(row[0]):
+                removes.setdefault(gram, set()).add(fid)
+            conn.execute("DELETE FROM files WHERE id = ?", (fid,))
+            conn.execute("DELETE FROM symbols WHERE file = ?", (fid,))
+        self.write_postings(conn, {}, removes)
+        conn.commit()
+
+    def write_postings(self, conn, adds, removes):
+        for gram in adds.keys() | removes.keys():
+            row = conn.execute("SELECT ids FROM postings WHERE gram = ?", (gram,)).fetchone()
+            ids = array("I")
+            if row is not None:
+                ids.frombytes(row[0])
+            dropped = removes.get(gram)
+            if dropped:
+                ids = array("I", (fid for fid in ids if fid not in dropped))
+            ids.extend(adds.get(gram, ()))
+            if ids:
+                conn.execute("INSERT OR REPLACE INTO postings (gram, ids) VALUES (?, ?)", (gram, ids.tobytes()))
+            elif row is not None:
+                conn.execute("DELETE FROM postings WHERE gram = ?", (gram,))
+
+    def candidate_paths(self, conn, grams):
+        if not grams:
+            return [path for (path,) in conn.execute("SELECT path FROM files WHERE binary = 0 ORDER BY path")]
+        postings = []
+        for gram in grams:
+            row = conn.execute("SELECT ids FROM postings WHERE gram = ?", (gram,)).fetchone()
+            ids = array("I")
+            if row is not None:
+                ids.frombytes(row[0])
+            postings.append(ids)
+        postings.sort(key=len)
+        ids = set(postings[0])
+        for posting in postings[1:]:
+            if not ids:
+                break
+            ids.intersection_update(posting)
+        ids = list(ids)
+        paths = [path for (path,) in conn.execute("SELECT path FROM files WHERE grams IS NULL")]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            query = f"SELECT path FROM files WHERE id IN ({','.join('?' * len(chunk))})"
+            paths.extend(path for (path,) in conn.execute(query, chunk))
+        return sorted(paths)
+
+    def search(self, query, is_regex, match_case, on_hits, cancelled=lambda: False):
+        flags = re.MULTILINE | (0 if match_case else re.IGNORECASE)
+        pattern = re.compile(query if is_regex else re.escape(query), flags)
+        literals = required_literals(query, flags) if is_regex else [query]
+        conn = self.connect()
+        try:
+            paths = self.candidate_paths(conn, query_trigrams(literals, match_case))
+        finally:
+            conn.close()
+        total = 0
+        batch = []
+        for path in paths:
+            if cancelled():
+                break
+            try:
+                with open(os.path.join(self.root, path), "rb") as f:
+                    text = f.read().decode("utf-8", errors="replace")
+            except OSError:
+                continue
+            line = 1
+            last = 0
+            file_hits = 0
+            for match in pattern.finditer(text):
+                line += text.count("\n", last, match.start())
+                last = match.start()
+                line_start = text.rfind("\n", 0, match.start()) + 1
+                line_end = text.find("\n", match.start())
+                if line_end < 0:
+                    line_end = len(text)
+                batch.append((path, line, text[line_start:line_end][:SEARCH_LINE_CHARS],
+                              match.start() - line_start, min(match.end(), line_end) - line_start))
+                file_hits += 1
+                total += 1
+                if file_hits >= SEARCH_MAX_FILE_HITS or total >= SEARCH_MAX_HITS:
+                    break
+            if len(batch) >= SEARCH_BATCH_HITS:
+                on_hits(batch)
+                batch = []
+            if total >= SEARCH_MAX_HITS:
+                break
+        if batch:
+            on_hits(batch)
+        return total
+
+    def find_symbols(self, prefix):
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                "SELECT files.path, symbols.line, symbols.kind, symbols.name FROM symbols "
+                "JOIN files ON files.id = symbols.file WHERE symbols.name >= ? AND symbols.name < ? "
+                "ORDER BY length(symbols.name), symbols.name LIMIT ?",
+                (prefix, prefix + "\uffff", SYMBOL_LIMIT)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [(path, line, f"{kind} {name}", len(kind) + 1, len(kind) + 1 + len(name))
+                for path, line, kind, name in rows]
+
+
+# ======================================================
+# DIAGNOSTICS
+# ======================================================
+DIAGNOSTICS_TIMEOUT = 15
+DIAGNOSTIC_CHECKERS = {
+    "C": ["gcc", "-fsyntax-only", "-x", "c", "-iquote", "{dir}", "{source}"],
+    "C++": ["g++", "-fsyntax-only", "-std=c++17", "-x", "c++", "-iquote", "{dir}", "{source}"],
+    "JavaScript": ["node", "--check", "{source}"],
+    "Go": ["gofmt", "-e", "-l", "{source}"],
+    "Ruby": ["ruby", "-wc", "{source}"],
+    "PHP": ["php", "-l", "{source}"],
+}
+DIAGNOSTIC_LINE = re.compile(
+    r"^(?P<file>.+?):(?P<line>\d+)(?::(?P<col>\d+))?(?::|$)\s*"
+    r"(?:(?P<severity>fatal error|error|warning|note)\s*:\s*)?(?P<message>.*)$"
+)
+# php -l puts the location last: "PHP Parse error:  msg in FILE on line N"
+PHP_DIAGNOSTIC_LINE = re.compile(
+    r"^(?:PHP )?(?P<severity>Parse error|Fatal error|Warning|Deprecated):\s*"
+    r"(?P<message>.*) in (?P<file>.+) on line (?P<line>\d+)(?P<col>)$"
+)
+ERROR_NAME_LINE = re.compile(r"^\w*Error: (.+)$")
+
+
+def can_check(lang):
+    import shutil
+    if lang == "Python":
+        return True
+    checker = DIAGNOSTIC_CHECKERS.get(lang)
+    return checker is not None and shutil.which(checker[0]) is not None
+
+
+def parse_diagnostics(output, source, severity="error"):
+    # Diagnostics are (line, column, severity, message); column is 0 when the
+    # tool does not report one
+    diagnostics = []
+    lines = output.splitlines()
+    for i, text in enumerate(lines):
+        match = DIAGNOSTIC_LINE.match(text) or PHP_DIAGNOSTIC_LINE.match(text)
+        if match is None or os.path.basename(match.group("file")) != os.path.basename(source):
+            continue
+        message = match.group("message").strip()
+        if not message:
+            # node prints the location alone, the error name comes later
+            message = next((m.group(1) for m in map(ERROR_NAME_LINE.match, lines[i + 1:]) if m), "Syntax error")
+        kind = (match.group("severity") or severity).lower()
+        if kind == "note":
+            # gcc's notes explain the diagnostic above them
+            continue
+        if kind in ("fatal error", "parse error"):
+            kind = "error"
+        elif kind == "deprecated" or not match.group("severity") and "warning" in message.lower():
+            kind = "warning"
+        diagnostic = (int(match.group("line")), int(match.group("col") or 0), kind, message)
+        # php -l reports to both stderr and stdout when log_errors is on
+        if diagnostic not in diagnostics:
+            diagnostics.append(diagnostic)
+    return diagnostics
+
+
+def check_python(code, name):
+    try:
+        from pyflakes import api as pyflakes
+        from pyflakes.reporter import Reporter
+    except ImportError:  # optional; compile() still finds syntax errors
+        pyflakes = None
+    if pyflakes is None:
+        try:
+            compile(code, name, "exec")
+        except SyntaxError as e:
+            return [(e.lineno or 1, e.offset or 0, "error", e.msg)]
+        except ValueError as e:  # null bytes
+            return [(1, 0, "error", str(e))]
+        return []
+    warnings = io.StringIO()
+    errors = io.StringIO()
+    pyflakes.check(code, name, Reporter(warnings, errors))
+    return parse_diagnostics(errors.getvalue(), name) + parse_diagnostics(warnings.getvalue(), name, "warning")
+
+
+def check_file(lang, source, folder=None, on_start=None):
+    # None when the checker timed out
+    if lang == "Python":
+        with open(source, "r", encoding="utf-8", errors="replace") as f:
+            return check_python(f.read(), source)
+    folder = folder or os.path.dirname(source)
+    argv = [arg.format(source=source, dir=folder) for arg in DIAGNOSTIC_CHECKERS[lang]]
+    output = []
+    stats = run_process(argv, cwd=folder, timeout=DIAGNOSTICS_TIMEOUT,
+                        on_output=lambda text, is_err: output.append(text), on_start=on_start)
+    if stats["timed_out"]:
+        return None
+    return parse_diagnostics("".join(output), source)
+
+
+# ======================================================
+# COMMAND LINE
+# ======================================================
+def emit(record):
+    sys.stdout.write(json.dumps(record) + "\n")
+    sys.stdout.flush()
+
+
+def run_concurrently(jobs, work, items):
+    # Calls work(*item, on_start) on jobs threads and yields the results as
+    # they finish; Ctrl+C kills every child process still running
+    import threading
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    futures = []
+    procs = set()
+    lock = threading.Lock()
+
+    def started(proc):
+        with lock:
+            procs.add(proc)
+
+    try:
+        futures = [executor.submit(work, *item, started) for item in items]
+        for future in as_completed(futures):
+            yield future.result()
+    except KeyboardInterrupt:
+        for future in futures:
+            future.cancel()
+        with lock:
+            for proc in procs:
+                kill_process_tree(proc)
+        raise
+    finally:
+        executor.shutdown(wait=True)
+
+
+def cli_run(args, settings):
+    if args.timeout is not None:
+        settings["run_timeout"] = args.timeout
+    files = collect_source_files(args.paths, settings["explorer_excludes"], can_run)
+    pool = None
+    if args.warm and InterpreterPool.supported():
+        settings["pool_size"] = args.jobs
+        pool = InterpreterPool(settings)
+        pool.start()
+    start = time.perf_counter()
+    passed = 0
+    try:
+        work = lambda path, lang, on_start: run_file(path, lang, settings, pool, on_start)
+        for result in run_concurrently(args.jobs, work, files):
+            passed += result["passed"]
+            emit(dict(type="result", **result))
+    finally:
+        if pool is not None:
+            pool.close()
+    emit({"type": "summary", "files": len(files), "passed": passed, "failed": len(files) - passed,
+          "wall_time": time.perf_counter() - start})
+    return 0 if passed == len(files) else 1
+
+
+def cli_check(args, settings):
+    import subprocess
+    files = collect_source_files(args.paths, settings["explorer_excludes"], can_check)
+    start = time.perf_counter()
+    errors = warnings = 0
+
+    def work(path, lang, on_start):
+        try:
+            return path, lang, check_file(lang, path, on_start=on_start)
+        except (OSError, subprocess.SubprocessError) as e:
+            return path, lang, [(1, 0, "error", f"Failed to check: {e}")]
+
+    for path, lang, diagnostics in run_concurrently(args.jobs, work, files):
+        record = {"type": "diagnostics", "path": path, "lang": lang, "timed_out": diagnostics is None,
+                  "diagnostics": [{"line": line, "column": column, "severity": severity, "message": message}
+                                  for line, column, severity, message in diagnostics or ()]}
+        errors += sum(d["severity"] == "error" for d in record["diagnostics"])
+        warnings += sum(d["severity"] == "warning" for d in record["diagnostics"])
+        emit(record)
+    emit({"type": "summary", "files": len(files), "errors": errors, "warnings": warnings,
+          "wall_time": time.perf_counter() - start})
+    return 1 if errors else 0
+
+
+def cli_index(args, settings):
+    status = 0
+    for root in args.paths:
+        if not os.path.isdir(root):
+            emit({"type": "error", "path": root, "message": "Not a folder"})
+            status = 1
+            continue
+        start = time.perf_counter()
+        index = SearchIndex(root, settings["explorer_excludes"])
+        progress = None
+        if args.progress:
+            progress = lambda done, total: emit({"type": "progress", "path": root, "done": done, "total": total})
+        changed, removed = index.update(progress=progress)
+        emit({"type": "index", "path": root, "index": index.path, "changed": changed, "removed": removed,
+              "wall_time": time.perf_counter() - start})
+    return status
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="cestudio", description="CE Studio without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    jobs = os.cpu_count() or 1
+
+    run = commands.add_parser("run", help="run source files and report one result per file")
+    run.add_argument("paths", nargs="+", help="files or folders")
+    run.add_argument("-j", "--jobs", type=int, default=jobs, help=f"files run at once (default {jobs})")
+    run.add_argument("--timeout", type=float, help="seconds before a run is killed")
+    run.add_argument("--warm", action="store_true", help="run Python files on the warm interpreter pool")
+    run.set_defaults(handler=cli_run)
+
+    check = commands.add_parser("check", help="report diagnostics for source files")
+    check.add_argument("paths", nargs="+", help="files or folders")
+    check.add_argument("-j", "--jobs", type=int, default=jobs, help=f"files checked at once (default {jobs})")
+    check.set_defaults(handler=cli_check)
+
+    index = commands.add_parser("index", help="build or update the search index of folders")
+    index.add_argument("paths", nargs="+", help="folders")
+    index.add_argument("--progress", action="store_true", help="report progress while indexing")
+    index.set_defaults(handler=cli_index)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "jobs", 1) < 1:
+        parser.error("--jobs must be at least 1")
+    # Programs run in their own folder, so relative paths would not resolve
+    args.paths = [os.path.abspath(path) for path in args.paths]
+    try:
+        return args.handler(args, load_settings())
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
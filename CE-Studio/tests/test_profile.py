@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import importlib.util
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(HERE, "..")
+
+
+@pytest.fixture(scope="module")
+def app():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ["APPDATA"] = tempfile.mkdtemp(prefix="cestudio-test-")
+    sys.path.insert(0, APP_DIR)
+    spec = importlib.util.spec_from_file_location("ce_studio", os.path.join(APP_DIR, "CE Studio.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def frame(name):
+    return [name, "main.py", 1]
+
+
+def test_profile_tree_drops_zero_time_stacks(app):
+    profile = {"interval": 0.005, "stacks": [
+        [[frame("<module>"), frame("work")], 0.02],
+        [[frame("<module>"), frame("sleep")], 0.0],
+    ]}
+    root = app.profile_tree(profile)
+    assert root.spent == pytest.approx(0.02)
+    module = root.children[tuple(frame("<module>"))]
+    assert list(module.children) == [tuple(frame("work"))]
+
+
+def test_layout_of_zero_time_profile(app):
+    profile = {"interval": 0.005, "stacks": [[[frame("<module>"), frame("sleep")], 0.0]]}
+    root = app.profile_tree(profile)
+    assert root.spent == 0
+    assert app.flame_layout(root, 0.0, 800.0, 0, 30) == [(root, 0.0, 800.0, 0)]
+
+
+def test_layout_skips_children_of_zero_time_node(app):
+    root = app.FlameNode(("all", "", 0))
+    child = root.children[("f", "", 0)] = app.FlameNode(("f", "", 0), root)
+    child.spent = 0.0
+    assert [node for node, _, _, _ in app.flame_layout(root, 0.0, 800.0, 0, 30)] == [root]
+
+
+def test_layout_splits_width_by_time(app):
+    profile = {"interval": 0.005, "stacks": [
+        [[frame("<module>"), frame("a")], 0.03],
+        [[frame("<module>"), frame("b")], 0.01],
+    ]}
+    boxes = {node.frame[0]: (x, width, depth) for node, x, width, depth in
+             app.flame_layout(app.profile_tree(profile), 0.0, 400.0, 0, 30)}
+    assert boxes["all"] == (0.0, 400.0, 0)
+    assert boxes["<module>"] == (0.0, 400.0, 1)
+    assert boxes["a"] == (0.0, pytest.approx(300.0), 2)
+    assert boxes["b"] == (pytest.approx(300.0), pytest.approx(100.0), 2)